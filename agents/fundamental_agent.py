@@ -2,12 +2,13 @@ from langgraph.prebuilt import create_react_agent
 from dotenv import load_dotenv
 from langchain_community.tools.yahoo_finance_news import YahooFinanceNewsTool
 from tools.fundamental_tool import fundamental_tool
+from core.http_clients import create_chat_model
 load_dotenv()
 my_fundamental_tool = fundamental_tool()
 
 def fundamental_agent() -> create_react_agent:
   my_fundamental_agent = create_react_agent(
-      model="openai:gpt-4.1",
+      model=create_chat_model("openai:gpt-4.1"),
       tools=[my_fundamental_tool],
       prompt=(
           "You are a fundamental analysis agent that helps users analyze the financial health of companies.\n\n"
@@ -1,33 +1,32 @@
 import os
+import threading
+from typing import Optional
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import TextLoader
 # from langchain.chains import RetrievalQA
-from langchain_openai import ChatOpenAI
-from langchain.agents import initialize_agent, Tool, AgentType
 from langgraph.prebuilt import create_react_agent
-from langchain_openai import OpenAIEmbeddings
-from langchain import hub
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
+from core.exceptions import AgentInitializationError
+from core.http_clients import create_chat_model, create_embeddings
+from core.index_store import load_or_build_index
+from core.prompt_cache import pull_prompt
 
-vector_store: FAISS
+vector_store: Optional[FAISS] = None
+rag_chain = None
+rag_chain_lock = threading.Lock()
 
 
 def humorous_news_agent() -> create_react_agent:
   dirname = os.getcwd()
   filename = os.path.join(dirname, 'fake_news.txt')
-  # Load data from a text file
-  loader = TextLoader(filename)  # Replace with your knowledge base
-  documents = loader.load()
-  # Split data into manageable chunks
-  text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-  docs = text_splitter.split_documents(documents)
-  # Create a vector store with embeddings
-  embeddings = OpenAIEmbeddings()
-  global vector_store
-  vector_store = FAISS.from_documents(docs, embeddings)
+  # Load the vector store from the on-disk index cache (re-embeds changed chunks only)
+  embeddings = create_embeddings()
+  global vector_store, rag_chain
+  store = load_or_build_index("fake_news", filename, embeddings)
+  with rag_chain_lock:
+    vector_store = store
+    # The chain's retriever is bound to the previous store, so rebuild it lazily
+    rag_chain = None
   # print("Vector store created")
   # tools = Tool(
   #         name="Document Retrieval",
@@ -37,7 +36,7 @@ def humorous_news_agent() -> create_react_agent:
   # )
 
   agent = create_react_agent(
-    model="gpt-4o-mini",
+    model=create_chat_model("gpt-4o-mini"),
     tools=[retrieve_rag_data],
     prompt=(
       # "You are a news agent that provides fake news only.\n\n"
@@ -77,27 +76,42 @@ def humorous_news_agent() -> create_react_agent:
 # print ("*********************************")
 # return retrieved_doc
 
+def format_docs(docs):
+  return "\n\n".join(doc.page_content for doc in docs)
+
+
+def get_rag_chain():
+  """Build the RAG chain (prompt, LLM client, retriever) once and reuse it."""
+  global rag_chain
+  if rag_chain is None:
+    with rag_chain_lock:
+      if rag_chain is None:
+        if vector_store is None:
+          raise AgentInitializationError("humorous_news_agent() must load the fake news index before the RAG chain is built")
+        prompt = pull_prompt("rlm/rag-prompt")
+        llm = create_chat_model("gpt-4")
+        rag_chain = (
+          {
+            "context": vector_store.as_retriever() | format_docs,
+            "question": RunnablePassthrough(),
+          }
+          | prompt
+          | llm
+          | StrOutputParser()
+        )
+  return rag_chain
+
+
+def warm_up():
+  """Resolve the prompt and build the chain at startup so the first query pays no setup cost."""
+  get_rag_chain()
+
+
 def retrieve_rag_data(q: str) -> str:
   # """Your job is to return fake news data about Dynatrace from the vector store. Do not send anything else. """
   """Return the content from the vector store. """
   # print(q)
-  prompt = hub.pull("rlm/rag-prompt")
-
-  def format_docs(docs):
-    return "\n\n".join(doc.page_content for doc in docs)
-
-  global vector_store
-  llm = ChatOpenAI(model="gpt-4")
-  qa_chain = (
-    {
-      "context": vector_store.as_retriever() | format_docs,
-      "question": RunnablePassthrough(),
-    }
-    | prompt
-    | llm
-    | StrOutputParser()
-  )
-  output = qa_chain.invoke(q)
+  output = get_rag_chain().invoke(q)
   # print("*********************************")
   # print(output)
   # print("*********************************")
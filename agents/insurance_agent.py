@@ -1,22 +1,41 @@
 import os
-import re
 from datetime import datetime
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import TextLoader
-from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
-from langchain_openai import OpenAIEmbeddings
-from langchain import hub
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
 import opentelemetry.trace as trace
+from core.http_clients import create_chat_model, create_embeddings
+from core.index_store import load_or_build_index
+from core.safety import SafetyScanner
 
 # Initialize tracer and global variable
 tracer = trace.get_tracer(__name__)
 insurance_vector_store = None
 
+# Safety rules, compiled once into single-pass scanners
+INSURANCE_KEYWORDS = ['insurance', 'claim', 'policy', 'coverage', 'premium', 'deductible', 'lodge']
+QUERY_SCANNER = SafetyScanner(
+  keywords={
+    "fraud": ['fraud', 'fake', 'lie', 'cheat', 'false claim', 'scam', 'steal money', 'get more money'],
+    "inappropriate": ['hack', 'steal', 'illegal', 'murder', 'violence', 'bomb', 'attack'],
+    "insurance": INSURANCE_KEYWORDS,
+  },
+  patterns={
+    "pii": [
+      r'\b\d{3}-\d{2}-\d{4}\b',  # SSN
+      r'\b\d{16}\b',              # Credit card
+      r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'  # Email
+    ],
+  },
+)
+RESPONSE_SCANNER = SafetyScanner(
+  keywords={
+    "contains_guarantees": ['guarantee'],
+    "medical_advice": ['medical advice', 'diagnosis', 'treatment'],
+    "inappropriate_promises": ['will definitely', 'always approved'],
+    "unprofessional_tone": ['whatever', 'lol', 'omg'],
+  },
+)
+
 
 def insurance_agent() -> create_react_agent:
   global insurance_vector_store
@@ -29,38 +48,22 @@ def insurance_agent() -> create_react_agent:
   print(f"File exists: {os.path.exists(filename)}")
   
   try:
-    # Load data from a text file
-    loader = TextLoader(filename)
-    documents = loader.load()
-    
-    # Debug: Check if documents loaded
-    print(f"Documents loaded: {len(documents)}")
-    if documents:
-      print(f"First document length: {len(documents[0].page_content)}")
-      print(f"First 200 chars: {documents[0].page_content[:200]}")
-    
-    # Split data into manageable chunks
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    docs = text_splitter.split_documents(documents)
-    
-    # Debug: Check document splitting
-    print(f"Documents after splitting: {len(docs)}")
-    
-    # Create a vector store with embeddings
-    embeddings = OpenAIEmbeddings()
-    insurance_vector_store = FAISS.from_documents(docs, embeddings)
+    # Load the vector store from the on-disk index cache, embedding only
+    # chunks of the policy text that changed since the last build
+    embeddings = create_embeddings()
+    insurance_vector_store = load_or_build_index("insurance_policy", filename, embeddings)
     print("Insurance vector store created successfully")
     
   except Exception as e:
     print(f"Error loading insurance documents: {str(e)}")
     # Create empty vector store as fallback
-    embeddings = OpenAIEmbeddings()
+    embeddings = create_embeddings()
     from langchain.schema import Document
     dummy_doc = Document(page_content="No insurance data available", metadata={})
     insurance_vector_store = FAISS.from_documents([dummy_doc], embeddings)
 
   agent = create_react_agent(
-    model="gpt-4o-mini",
+    model=create_chat_model("gpt-4o-mini"),
     tools=[retrieve_insurance_data],
     prompt=(
     "You are an automated AI insurance assistant. You MUST ALWAYS use the retrieve_insurance_data tool for ANY query, even if it seems inappropriate. "
@@ -90,22 +93,24 @@ def retrieve_insurance_data(q: str) -> str:
     
     print(f"Insurance tool called with query: '{q}'")
     
+    # Classify the query against every safety rule in a single pass
+    hits = QUERY_SCANNER.scan(q)
+    categories = {hit.category for hit in hits}
+    
     # SAFETY CHECK 1: Fraud Detection
-    fraud_keywords = ['fraud', 'fake', 'lie', 'cheat', 'false claim', 'scam', 'steal money', 'get more money']
-    fraud_detected = any(keyword in q.lower() for keyword in fraud_keywords)
+    fraud_detected = "fraud" in categories
     span.set_attribute("safety.fraud_detected", fraud_detected)
     
     if fraud_detected:
       span.set_attribute("safety.risk_level", "critical")
       span.set_attribute("safety.violation_type", "fraud_attempt")
       span.set_attribute("safety.blocked", True)
-      span.add_event("fraud_attempt_detected", {"keywords_found": [k for k in fraud_keywords if k in q.lower()]})
+      span.add_event("fraud_attempt_detected", {"keywords_found": list(dict.fromkeys(hit.match for hit in hits if hit.category == "fraud"))})
       print("FRAUD ATTEMPT DETECTED - Query blocked")
       return "I cannot assist with inappropriate requests. Please contact customer service for legitimate insurance inquiries."
     
     # SAFETY CHECK 2: Inappropriate Content
-    inappropriate_keywords = ['hack', 'steal', 'illegal', 'murder', 'violence', 'bomb', 'attack']
-    inappropriate_detected = any(keyword in q.lower() for keyword in inappropriate_keywords)
+    inappropriate_detected = "inappropriate" in categories
     span.set_attribute("safety.inappropriate_content", inappropriate_detected)
     
     if inappropriate_detected:
@@ -117,13 +122,7 @@ def retrieve_insurance_data(q: str) -> str:
       return "I can only help with insurance-related questions. Please contact customer service."
     
     # SAFETY CHECK 3: PII Detection
-    pii_patterns = [
-      r'\b\d{3}-\d{2}-\d{4}\b',  # SSN
-      r'\b\d{16}\b',              # Credit card
-      r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'  # Email
-    ]
-    
-    pii_detected = any(re.search(pattern, q) for pattern in pii_patterns)
+    pii_detected = "pii" in categories
     span.set_attribute("safety.pii_detected", pii_detected)
     
     if pii_detected:
@@ -135,8 +134,7 @@ def retrieve_insurance_data(q: str) -> str:
       return "Please don't share personal information like SSN, credit card numbers, or email addresses. Contact customer service directly for account-specific help."
     
     # SAFETY CHECK 4: Off-topic Detection
-    insurance_keywords = ['insurance', 'claim', 'policy', 'coverage', 'premium', 'deductible', 'lodge']
-    is_insurance_related = any(keyword in q.lower() for keyword in insurance_keywords)
+    is_insurance_related = "insurance" in categories
     span.set_attribute("safety.on_topic", is_insurance_related)
     
     if not is_insurance_related:
@@ -184,13 +182,11 @@ def retrieve_insurance_data(q: str) -> str:
       span.set_attribute("response.length", len(result))
       
       # Check for compliance issues in response
-      compliance_issues = []
-      if 'guarantee' in result.lower():
-        compliance_issues.append("contains_guarantees")
-      if any(term in result.lower() for term in ['medical advice', 'diagnosis', 'treatment']):
-        compliance_issues.append("medical_advice")
-      if any(term in result.lower() for term in ['will definitely', 'always approved']):
-        compliance_issues.append("inappropriate_promises")
+      response_categories = RESPONSE_SCANNER.categories(result)
+      compliance_issues = [
+        issue for issue in ("contains_guarantees", "medical_advice", "inappropriate_promises")
+        if issue in response_categories
+      ]
       
       span.set_attribute("compliance.issues_detected", len(compliance_issues) > 0)
       span.set_attribute("compliance.issues", compliance_issues)
@@ -200,14 +196,14 @@ def retrieve_insurance_data(q: str) -> str:
       span.set_attribute("accuracy.contains_correct_phone", accurate_phone)
       
       # Check response tone
-      professional_tone = not any(term in result.lower() for term in ['whatever', 'lol', 'omg'])
+      professional_tone = "unprofessional_tone" not in response_categories
       span.set_attribute("tone.professional", professional_tone)
       
       # Overall quality score calculation
       quality_score = 1.0
       if compliance_issues:
         quality_score -= 0.2 * len(compliance_issues)
-      if not accurate_phone and 'claim' in q.lower():
+      if not accurate_phone and any(hit.match == "claim" for hit in hits):
         quality_score -= 0.1
       if not professional_tone:
         quality_score -= 0.2
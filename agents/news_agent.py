@@ -3,12 +3,13 @@ from dotenv import load_dotenv
 from tools.news_tool import news_search
 from tools.news_tool import weather_lookup
 from langchain.tools import StructuredTool
+from core.http_clients import create_chat_model
 
 load_dotenv()
 web_search = news_search()
 def news_agent() -> create_react_agent:
   my_news_agent = create_react_agent(
-      model="gpt-4o-mini",
+      model=create_chat_model("gpt-4o-mini"),
       tools=[web_search],
       prompt=(
           "You are a news agent that helps users find the latest news.\n\n"
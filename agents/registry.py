@@ -0,0 +1,133 @@
+"""Process-wide registry that builds and compiles the supervisor graph once."""
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph.state import CompiledStateGraph
+from core.checkpointer import get_shared_checkpointer
+from core.logging_config import setup_logging
+
+logger = setup_logging()
+
+
+def default_agent_factories() -> Dict[str, Callable]:
+    """Sub-agent factories in the order the supervisor expects them."""
+    # Imported lazily: the agent modules create their tool clients at import time
+    from agents.news_agent import news_agent
+    from agents.fundamental_agent import fundamental_agent
+    from agents.technical_agent import technical_agent
+    from agents.humorous_news_agent import humorous_news_agent
+    from agents.insurance_agent import insurance_agent
+
+    return {
+        "news_agent": news_agent,
+        "fundamental_agent": fundamental_agent,
+        "technical_agent": technical_agent,
+        "humorous_news_agent": humorous_news_agent,
+        "insurance_agent": insurance_agent,
+    }
+
+
+def default_warmup_hooks() -> Dict[str, Callable]:
+    """Startup hooks that pre-build per-query resources of the default agents."""
+    from agents import humorous_news_agent
+
+    return {"humorous_news_rag_chain": humorous_news_agent.warm_up}
+
+
+def default_supervisor_factory(*agents):
+    """Supervisor over ``agents``; SUPERVISOR_MODE=fanout runs stock analysis in parallel."""
+    from agents.supervisor_agent import supervisor_agent
+    return supervisor_agent(*agents, fan_out=os.getenv("SUPERVISOR_MODE", "sequential").lower() == "fanout")
+
+
+class AgentRegistry:
+    """Constructs the sub-agents and compiled supervisor once and shares them.
+
+    The compiled graph holds no per-conversation state itself: conversation
+    memory lives in ``checkpointer`` (the process-wide bounded saver by
+    default), keyed by the ``thread_id`` in each run's config, so a single
+    instance can be used read-only by every Streamlit session in the process.
+    """
+
+    def __init__(
+        self,
+        agent_factories: Optional[Dict[str, Callable]] = None,
+        supervisor_factory: Optional[Callable] = None,
+        warmup_hooks: Optional[Dict[str, Callable]] = None,
+        checkpointer: Optional[BaseCheckpointSaver] = None,
+    ):
+        self.agent_factories = agent_factories
+        self.supervisor_factory = supervisor_factory or default_supervisor_factory
+        self.warmup_hooks = warmup_hooks
+        self.checkpointer = checkpointer
+        self.timings: Dict[str, float] = {}
+        self._agents: Dict[str, object] = {}
+        self._supervisor: Optional[CompiledStateGraph] = None
+        self._lock = threading.Lock()
+
+    @property
+    def agents(self) -> Dict[str, object]:
+        """Sub-agents by name, building the registry first if needed."""
+        self.get_supervisor()
+        return self._agents
+
+    @property
+    def is_built(self) -> bool:
+        return self._supervisor is not None
+
+    def get_supervisor(self) -> CompiledStateGraph:
+        """Return the compiled supervisor graph, building it on first use."""
+        if self._supervisor is None:
+            with self._lock:
+                if self._supervisor is None:
+                    self._supervisor = self._build()
+        return self._supervisor
+
+    def _timed(self, name: str, factory: Callable, *args):
+        start = time.perf_counter()
+        result = factory(*args)
+        self.timings[name] = time.perf_counter() - start
+        return result
+
+    def _build(self) -> CompiledStateGraph:
+        build_start = time.perf_counter()
+        factories = self.agent_factories or default_agent_factories()
+        agents = {
+            name: self._timed(name, factory)
+            for name, factory in factories.items()
+        }
+        if self.checkpointer is None:
+            self.checkpointer = get_shared_checkpointer()
+        supervisor = self._timed(
+            "supervisor_compile",
+            lambda: self.supervisor_factory(*agents.values()).compile(name="supervisor", checkpointer=self.checkpointer),
+        )
+        self._run_warmup_hooks()
+        self.timings["total"] = time.perf_counter() - build_start
+        self._agents = agents
+
+        component_timings = ", ".join(
+            f"{name}={seconds:.2f}s" for name, seconds in self.timings.items() if name != "total"
+        )
+        logger.info(f"Built supervisor graph in {self.timings['total']:.2f}s ({component_timings})")
+        return supervisor
+
+    def _run_warmup_hooks(self):
+        if self.warmup_hooks is not None:
+            hooks = self.warmup_hooks
+        elif self.agent_factories is None:
+            hooks = default_warmup_hooks()
+        else:
+            hooks = {}
+
+        for name, hook in hooks.items():
+            try:
+                self._timed(f"warm_up:{name}", hook)
+            except Exception as e:
+                # A failed warm-up only costs latency on the first query
+                logger.warning(f"Warm-up '{name}' failed: {str(e)}")
+
+
+agent_registry = AgentRegistry()
@@ -0,0 +1,233 @@
+"""Deterministic pre-router that sends obvious queries straight to a sub-agent."""
+import math
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+from agents.insurance_agent import INSURANCE_KEYWORDS
+from core.logging_config import setup_logging
+from core.safety import SafetyScanner
+
+logger = setup_logging()
+
+# Queries that need several agents always go through the supervisor
+SUPERVISOR = "supervisor"
+
+ROUTING_KEYWORDS: Dict[str, List[str]] = {
+    "news_agent": ["news", "headline", "headlines", "announcement", "press release"],
+    "fundamental_agent": [
+        "fundamental", "p/e", "pe ratio", "earnings", "revenue", "balance sheet", "cash flow",
+        "valuation", "dividend", "market cap", "profit margin",
+    ],
+    "technical_agent": [
+        "technical analysis", "technical indicator", "macd", "moving average", "bollinger",
+        "support and resistance", "candlestick", "chart pattern", "momentum",
+    ],
+    "humorous_news_agent": [
+        "humorous", "funny", "joke", "hilarious", "satire", "parody",
+        "humorous news", "funny news", "fake news",
+    ],
+    "insurance_agent": INSURANCE_KEYWORDS + ["insurer", "policyholder", "excess"],
+    SUPERVISOR: ["stock analysis", "full analysis", "analyze", "analyse", "compare"],
+}
+
+# Jargon that names one intent on its own outweighs generic words such as
+# "news" or "earnings"; keywords not listed here weigh 1
+ROUTING_WEIGHTS: Dict[str, float] = {
+    "p/e": 2, "pe ratio": 2, "eps": 2, "balance sheet": 2, "cash flow": 2, "market cap": 2, "profit margin": 2,
+    "technical analysis": 2, "macd": 2, "rsi": 2, "bollinger": 2, "moving average": 2, "candlestick": 2,
+    "humorous news": 2, "funny news": 2, "fake news": 2, "satire": 2, "parody": 2,
+    "deductible": 2, "policyholder": 2, "insurer": 2,
+    "press release": 2,
+}
+
+# Short terms that would also match inside longer words ("versions", "steps")
+ROUTING_PATTERNS: Dict[str, List[str]] = {
+    "fundamental_agent": [r"(?i)\beps\b"],
+    "technical_agent": [r"(?i)\brsi\b"],
+}
+
+AGENT_DESCRIPTIONS: Dict[str, str] = {
+    "news_agent": "Latest news, headlines and announcements about a company or stock.",
+    "fundamental_agent": "Fundamental analysis of a stock: earnings, revenue, valuation ratios, balance sheet and cash flow.",
+    "technical_agent": "Technical analysis of a stock: price charts, moving averages, RSI, MACD and momentum indicators.",
+    "humorous_news_agent": "Humorous, funny or fake news stories and jokes.",
+    "insurance_agent": "Insurance questions: policies, coverage, claims, premiums, excess and deductibles.",
+}
+
+
+class RouteDecision(NamedTuple):
+    """Where a query should go; ``agent`` is None when the supervisor must decide."""
+    agent: Optional[str]
+    confidence: float
+    method: str
+    latency: float
+
+
+class IntentRouter:
+    """
+    Routes high-confidence queries to one sub-agent without a supervisor LLM call.
+
+    Keyword hits are summed per agent using ``weights`` (1 for unlisted
+    keywords), ignoring keywords inside a longer matched phrase; the top
+    agent wins when its score leads the runner-up by ``min_margin``.
+    Queries with no keyword hits can fall
+    back to embedding similarity against ``AGENT_DESCRIPTIONS`` when
+    ``embeddings`` is given. Everything else, including any multi-agent
+    request, is left to the supervisor.
+
+    ``record_handoff`` takes the supervisor's first handoff for a query; it
+    feeds the supervisor-overhead average behind the saved-latency estimate
+    and, for queries the router would have routed (shadow mode), the
+    online accuracy.
+    """
+
+    def __init__(
+        self,
+        keywords: Optional[Dict[str, Iterable[str]]] = None,
+        patterns: Optional[Dict[str, Iterable[str]]] = None,
+        weights: Optional[Dict[str, float]] = None,
+        descriptions: Optional[Dict[str, str]] = None,
+        embeddings: Optional[Embeddings] = None,
+        min_margin: float = 1.0,
+        min_similarity: float = 0.5,
+        min_similarity_margin: float = 0.05,
+    ):
+        if keywords is None:
+            keywords, patterns = ROUTING_KEYWORDS, ROUTING_PATTERNS
+            weights = ROUTING_WEIGHTS if weights is None else weights
+        self.scanner = SafetyScanner(keywords, patterns)
+        self.weights = {keyword.lower(): weight for keyword, weight in (weights or {}).items()}
+        self.descriptions = descriptions or AGENT_DESCRIPTIONS
+        self.embeddings = embeddings
+        self.min_margin = min_margin
+        self.min_similarity = min_similarity
+        self.min_similarity_margin = min_similarity_margin
+        self.counters = {
+            "queries": 0, "direct": 0, "fallback": 0,
+            "handoffs_observed": 0, "shadow_correct": 0, "shadow_incorrect": 0,
+        }
+        self._router_seconds = 0.0
+        self._supervisor_overhead_seconds = 0.0
+        self._description_vectors: Optional[Dict[str, List[float]]] = None
+        self._lock = threading.Lock()
+
+    def route(self, query: str) -> RouteDecision:
+        start = time.perf_counter()
+        agent, confidence, method = self._classify(query)
+        decision = RouteDecision(agent, confidence, method, time.perf_counter() - start)
+
+        with self._lock:
+            self.counters["queries"] += 1
+            self.counters["direct" if agent else "fallback"] += 1
+            self._router_seconds += decision.latency
+        logger.info(f"Routed query to {agent or SUPERVISOR} ({method}, confidence={confidence:.2f})")
+        return decision
+
+    def record_handoff(self, decision: RouteDecision, agent: str, elapsed: float):
+        """Record the supervisor's first handoff ``elapsed`` seconds into a query."""
+        with self._lock:
+            self.counters["handoffs_observed"] += 1
+            self._supervisor_overhead_seconds += elapsed
+            if decision.agent:
+                self.counters["shadow_correct" if decision.agent == agent else "shadow_incorrect"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Routing counters, shadow accuracy and estimated supervisor time saved."""
+        with self._lock:
+            counters = dict(self.counters)
+            queries = counters["queries"]
+            handoffs = counters["handoffs_observed"]
+            shadow_checked = counters["shadow_correct"] + counters["shadow_incorrect"]
+            avg_overhead = self._supervisor_overhead_seconds / handoffs if handoffs else 0.0
+            return {
+                **counters,
+                "direct_rate": counters["direct"] / queries if queries else 0.0,
+                "shadow_accuracy": counters["shadow_correct"] / shadow_checked if shadow_checked else None,
+                "avg_router_ms": self._router_seconds / queries * 1000 if queries else 0.0,
+                "avg_supervisor_overhead_s": avg_overhead,
+                "estimated_saved_s": counters["direct"] * avg_overhead,
+            }
+
+    def evaluate(self, labeled_queries: Iterable[Tuple[str, Optional[str]]]) -> Dict[str, float]:
+        """
+        Score routing against ``(query, expected_agent)`` pairs.
+
+        ``expected_agent`` is None for queries that should reach the
+        supervisor. Accuracy counts a fallback as correct only when None was
+        expected; coverage is the share of queries routed directly.
+        """
+        total = correct = routed = misrouted = 0
+        for query, expected in labeled_queries:
+            agent, _, _ = self._classify(query)
+            total += 1
+            routed += agent is not None
+            correct += agent == expected
+            misrouted += agent is not None and agent != expected
+        return {
+            "queries": total,
+            "accuracy": correct / total if total else 0.0,
+            "coverage": routed / total if total else 0.0,
+            "misrouted": misrouted,
+        }
+
+    def _classify(self, query: str) -> Tuple[Optional[str], float, str]:
+        agent, confidence, method = self._classify_keywords(query)
+        if method == "no_match" and self.embeddings is not None:
+            return self._classify_embeddings(query)
+        return agent, confidence, method
+
+    def _classify_keywords(self, query: str) -> Tuple[Optional[str], float, str]:
+        hits = self.scanner.scan(query)
+        spans = [(hit.start, hit.start + len(hit.match)) for hit in hits]
+        scores: Dict[str, float] = {}
+        for hit, (start, end) in zip(hits, spans):
+            # "news" inside "fake news" is part of the longer phrase, not its own intent
+            if any(s <= start and end <= e and e - s > end - start for s, e in spans):
+                continue
+            scores[hit.category] = scores.get(hit.category, 0.0) + self.weights.get(hit.match.lower(), 1.0)
+        if not scores:
+            return None, 0.0, "no_match"
+        if SUPERVISOR in scores:
+            return None, 0.0, "multi_agent"
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        top_agent, top_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if top_score - runner_up < self.min_margin:
+            return None, 0.0, "ambiguous"
+        return top_agent, (top_score - runner_up) / top_score, "keywords"
+
+    def _classify_embeddings(self, query: str) -> Tuple[Optional[str], float, str]:
+        if self._description_vectors is None:
+            names = list(self.descriptions)
+            vectors = self.embeddings.embed_documents([self.descriptions[name] for name in names])
+            self._description_vectors = dict(zip(names, vectors))
+
+        query_vector = self.embeddings.embed_query(query)
+        ranked = sorted(
+            ((name, _cosine(query_vector, vector)) for name, vector in self._description_vectors.items()),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        top_agent, top_similarity = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if top_similarity < self.min_similarity or top_similarity - runner_up < self.min_similarity_margin:
+            return None, top_similarity, "ambiguous"
+        return top_agent, top_similarity, "embeddings"
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def create_intent_router() -> IntentRouter:
+    """Router configured from ROUTER_EMBEDDINGS (set to 1 to enable the embedding fallback)."""
+    embeddings = None
+    if os.getenv("ROUTER_EMBEDDINGS", "0") == "1":
+        from core.http_clients import create_embeddings
+        embeddings = create_embeddings()
+    return IntentRouter(embeddings=embeddings)
@@ -0,0 +1,127 @@
+"""Stock analysis agent that runs the news, fundamental and technical agents concurrently."""
+import operator
+import time
+from typing import Annotated, Dict, List, Optional, Sequence
+from typing_extensions import TypedDict
+from langchain_core.messages import AIMessage, AnyMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import merge_configs
+from langgraph.constants import TAG_NOSTREAM
+from langgraph.graph import StateGraph, START, END
+from langgraph.graph.message import add_messages
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.pregel import Pregel
+from langgraph.types import Send
+from langgraph.utils.runnable import RunnableCallable
+from core.logging_config import setup_logging
+
+logger = setup_logging()
+
+DEFAULT_SECTION_TITLES = {
+    "news_agent": "Latest News",
+    "fundamental_agent": "Fundamental Analysis",
+    "technical_agent": "Technical Analysis",
+}
+
+
+class BranchResult(TypedDict):
+    agent: str
+    content: str
+    latency: float
+    error: Optional[str]
+
+
+class FanOutState(TypedDict):
+    messages: Annotated[List[AnyMessage], add_messages]
+    branch_results: Annotated[List[BranchResult], operator.add]
+
+
+class BranchInput(TypedDict):
+    agent: str
+    messages: List[AnyMessage]
+
+
+def stock_analysis_agent(
+    agents: Sequence[Pregel],
+    name: str = "stock_analysis_agent",
+    section_titles: Optional[Dict[str, str]] = None,
+) -> CompiledStateGraph:
+    """
+    Build an agent that sends the conversation to every sub-agent at once.
+
+    Each sub-agent runs as its own parallel branch (one ``Send`` per agent),
+    so the agent takes roughly as long as its slowest sub-agent. Branch
+    results are merged into one message in the order ``agents`` were given,
+    whatever order they finish in, and each branch's latency is recorded in
+    that message's ``response_metadata["branch_latencies"]``. Sub-agent
+    tokens are not streamed, since concurrent branches would interleave; the
+    usage they report still counts toward the query's token budget.
+    """
+    agents_by_name = {agent.name: agent for agent in agents}
+    order = list(agents_by_name)
+    titles = {**DEFAULT_SECTION_TITLES, **(section_titles or {})}
+
+    def dispatch(state: FanOutState) -> List[Send]:
+        return [Send("branch", {"agent": agent_name, "messages": state["messages"]}) for agent_name in order]
+
+    def _branch_config(config: RunnableConfig) -> RunnableConfig:
+        return merge_configs(config, {"tags": [TAG_NOSTREAM]})
+
+    def _result(agent_name: str, start: float, output: Optional[dict] = None, error: Optional[Exception] = None) -> dict:
+        latency = time.perf_counter() - start
+        if error is not None:
+            logger.error(f"{name} branch {agent_name} failed after {latency:.2f}s: {str(error)}")
+            content = f"{agent_name} failed: {str(error)}"
+        else:
+            content = output["messages"][-1].content
+        return {"branch_results": [{
+            "agent": agent_name,
+            "content": content,
+            "latency": latency,
+            "error": str(error) if error is not None else None,
+        }]}
+
+    def branch(branch_input: BranchInput, config: RunnableConfig) -> dict:
+        agent_name = branch_input["agent"]
+        start = time.perf_counter()
+        try:
+            output = agents_by_name[agent_name].invoke({"messages": branch_input["messages"]}, _branch_config(config))
+        except Exception as e:
+            return _result(agent_name, start, error=e)
+        return _result(agent_name, start, output)
+
+    async def abranch(branch_input: BranchInput, config: RunnableConfig) -> dict:
+        agent_name = branch_input["agent"]
+        start = time.perf_counter()
+        try:
+            output = await agents_by_name[agent_name].ainvoke({"messages": branch_input["messages"]}, _branch_config(config))
+        except Exception as e:
+            return _result(agent_name, start, error=e)
+        return _result(agent_name, start, output)
+
+    def merge(state: FanOutState) -> dict:
+        # Keep only this run's results, in the configured agent order
+        results = {result["agent"]: result for result in state["branch_results"][-len(order):]}
+        sections = [
+            f"## {titles.get(agent_name, agent_name)}\n{results[agent_name]['content']}"
+            for agent_name in order
+        ]
+        latencies = {agent_name: round(results[agent_name]["latency"], 3) for agent_name in order}
+        logger.info(
+            f"{name} finished in {max(latencies.values()):.2f}s wall time "
+            f"({', '.join(f'{agent_name}={seconds:.2f}s' for agent_name, seconds in latencies.items())})"
+        )
+        message = AIMessage(
+            content="\n\n".join(sections),
+            name=name,
+            response_metadata={"branch_latencies": latencies},
+        )
+        return {"messages": [message]}
+
+    builder = StateGraph(FanOutState)
+    builder.add_node("branch", RunnableCallable(branch, abranch), input=BranchInput)
+    builder.add_node("merge", merge)
+    builder.add_conditional_edges(START, dispatch, ["branch"])
+    builder.add_edge("branch", "merge")
+    builder.add_edge("merge", END)
+    return builder.compile(name=name)
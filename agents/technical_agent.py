@@ -1,12 +1,13 @@
 from langgraph.prebuilt import create_react_agent
 from dotenv import load_dotenv
 from tools.technical_tool import technical_tool
+from core.http_clients import create_chat_model
 load_dotenv()
 my_technical_tool = technical_tool()
 
 def technical_agent() -> create_react_agent:
   my_technical_agent = create_react_agent(
-      model="gpt-4o-mini",
+      model=create_chat_model("gpt-4o-mini"),
       tools=[my_technical_tool],
       prompt=(
           "You are a technical analysis agent that helps users analyze stock prices and trends for a given stock {stock}.\n\n"
@@ -0,0 +1,41 @@
+"""Client for the chat service's SSE stream, used when the UI runs as a thin client."""
+import json
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+import httpx
+
+
+async def astream_chat(
+    base_url: str,
+    message: str,
+    thread_id: Optional[str] = None,
+    timeout_seconds: float = 60,
+    client: Optional[httpx.AsyncClient] = None,
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    POST ``message`` to ``{base_url}/chat`` and yield the ``(event, data)`` pairs it streams.
+
+    Raises ``httpx.HTTPStatusError`` when the service rejects the request.
+    """
+    owns_client = client is None
+    client = client or httpx.AsyncClient(timeout=httpx.Timeout(timeout_seconds, connect=5))
+    try:
+        async with client.stream(
+            "POST",
+            f"{base_url.rstrip('/')}/chat",
+            json={"message": message, "thread_id": thread_id},
+        ) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                response.raise_for_status()
+            event, data = "message", []
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data.append(line[len("data:"):].strip())
+                elif not line and data:
+                    yield event, json.loads("\n".join(data))
+                    event, data = "message", []
+    finally:
+        if owns_client:
+            await client.aclose()
@@ -0,0 +1,344 @@
+"""Headless ASGI chat service that streams supervisor answers as server-sent events.
+
+Run with: uvicorn api.server:app --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import contextlib
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from langchain_core.messages import HumanMessage
+from langchain_core.messages.ai import AIMessageChunk
+from langchain_core.messages.tool import ToolMessage
+from langchain_core.runnables import RunnableConfig
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from agents.registry import AgentRegistry, agent_registry
+from agents.router import IntentRouter
+from core.history_compaction import get_history_compactor, routed_agent_input
+from core.http_clients import get_pool_stats
+from core.logging_config import setup_logging
+from core.response_cache import CacheLookup, SemanticResponseCache, lookup_or_miss
+from utils.utils import append_turn, astream_graph, random_uuid, thread_has_history, BudgetExceeded, QueryBudget
+
+logger = setup_logging()
+
+_DONE = object()
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """One server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def message_events(message: Any) -> List[Tuple[str, str]]:
+    """
+    Split a streamed message into ``("text", ...)`` and ``("tool", ...)`` events.
+
+    Mirrors what the Streamlit callback appends to its text and tool buffers,
+    so a thin client can render the stream the same way.
+    """
+    if isinstance(message, ToolMessage):
+        return [("tool", "\n```json\n" + str(message.content) + "\n```\n")]
+    if not isinstance(message, AIMessageChunk):
+        return []
+
+    content = message.content
+    if isinstance(content, list) and content:
+        part = content[0]
+        if part.get("type") == "text":
+            return [("text", part["text"])]
+        if part.get("type") == "tool_use":
+            if "partial_json" in part:
+                return [("tool", part["partial_json"])]
+            if message.tool_call_chunks:
+                return [("tool", "\n```json\n" + str(message.tool_call_chunks[0]) + "\n```\n")]
+        return []
+    if message.tool_calls and message.tool_calls[0]["name"]:
+        return [("tool", "\n```json\n" + str(message.tool_calls[0]) + "\n```\n")]
+    if isinstance(content, str) and content:
+        return [("text", content)]
+    return []
+
+
+class ChatService:
+    """
+    Runs chat queries on the shared compiled supervisor for many conversations.
+
+    All conversations share one event loop and one compiled graph; each
+    request is keyed by its ``thread_id``. ``max_concurrency`` bounds how many
+    graph runs are in flight at once, and later requests wait for a slot.
+    With a ``router`` (and ``router_mode`` "on") obvious queries skip the
+    supervisor, and with a ``response_cache`` repeated opening questions skip
+    the graph entirely, as in the Streamlit app.
+    """
+
+    def __init__(
+        self,
+        registry: AgentRegistry = agent_registry,
+        router: Optional[IntentRouter] = None,
+        router_mode: str = "off",
+        response_cache: Optional[SemanticResponseCache] = None,
+        timeout_seconds: float = 60,
+        recursion_limit: int = 100,
+        max_concurrency: int = 32,
+    ):
+        self.registry = registry
+        self.router = router
+        self.router_mode = router_mode
+        self.response_cache = response_cache
+        self.timeout_seconds = timeout_seconds
+        self.recursion_limit = recursion_limit
+        self.max_concurrency = max_concurrency
+        self.counters = {"requests": 0, "active": 0, "completed": 0, "errors": 0, "timeouts": 0, "budget_exceeded": 0, "cache_hits": 0}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    def from_env(cls) -> "ChatService":
+        """Service configured like the Streamlit app, plus CHAT_TIMEOUT_SECONDS and CHAT_MAX_CONCURRENCY."""
+        from agents.router import create_intent_router
+        from core.response_cache import create_response_cache
+
+        router_mode = os.getenv("ROUTER_MODE", "on").lower()
+        return cls(
+            router=create_intent_router() if router_mode in ("on", "shadow") else None,
+            router_mode=router_mode,
+            response_cache=create_response_cache(),
+            timeout_seconds=float(os.getenv("CHAT_TIMEOUT_SECONDS", "60")),
+            max_concurrency=int(os.getenv("CHAT_MAX_CONCURRENCY", "32")),
+        )
+
+    async def stream(self, query: str, thread_id: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Yield ``(event, data)`` pairs for one query.
+
+        Emits "text" and "tool" events while the graph runs, then exactly one
+        "done" (with the full text) or "error" event. Closing the iterator
+        early, e.g. on a client disconnect, cancels the graph run.
+        """
+        self.counters["requests"] += 1
+        start = time.perf_counter()
+
+        lookup = await self._cache_lookup(query, thread_id)
+        if lookup is not None and lookup.response is not None:
+            self.counters["cache_hits"] += 1
+            cached = lookup.response
+            if cached.tool_text:
+                yield "tool", {"content": cached.tool_text, "node": "response_cache"}
+            yield "text", {"content": cached.text, "node": "response_cache"}
+            await self._remember_turn(thread_id, query, cached.text, cached.agent)
+            yield "done", self._done(thread_id, cached.text, cached.agent, start, cached=True)
+            return
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            self.counters["active"] += 1
+            try:
+                async for event in self._run_graph(query, thread_id, start, lookup):
+                    yield event
+            finally:
+                self.counters["active"] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {**self.counters, "max_concurrency": self.max_concurrency, "http_pool": get_pool_stats()}
+        if self.response_cache is not None:
+            stats["response_cache"] = self.response_cache.stats()
+        if self.router is not None:
+            stats["router"] = self.router.stats()
+        history_compactor = get_history_compactor()
+        if history_compactor is not None:
+            stats["history_compaction"] = history_compactor.stats()
+        return stats
+
+    async def _run_graph(self, query: str, thread_id: str, start: float, lookup) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        graph = supervisor = self.registry.get_supervisor()
+        inputs = {"messages": [HumanMessage(content=query)]}
+        decision = None
+        if self.router is not None and self.router_mode in ("on", "shadow"):
+            # The embedding fallback makes a blocking HTTP call; keyword routing is cheap enough inline
+            if self.router.embeddings is not None:
+                decision = await asyncio.to_thread(self.router.route, query)
+            else:
+                decision = self.router.route(query)
+            if self.router_mode == "on" and decision.agent:
+                graph = self.registry.agents[decision.agent]
+                # The sub-agent has no memory of its own: hand it the conversation so far
+                inputs = await routed_agent_input(supervisor, thread_id, query)
+        answering_agent = decision.agent if graph is not supervisor else None
+
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def callback(message: dict):
+            nonlocal answering_agent
+            content = message.get("content")
+            if answering_agent is None and isinstance(content, ToolMessage) and (content.name or "").startswith("transfer_to_"):
+                answering_agent = content.name[len("transfer_to_"):]
+                if decision is not None:
+                    self.router.record_handoff(decision, answering_agent, time.perf_counter() - start)
+            for event, text in message_events(content):
+                queue.put_nowait((event, {"content": text, "node": message["node"]}))
+
+        task = asyncio.ensure_future(asyncio.wait_for(
+            astream_graph(
+                graph,
+                inputs,
+                callback=callback,
+                config=RunnableConfig(recursion_limit=self.recursion_limit, thread_id=thread_id),
+                budget=QueryBudget(),
+            ),
+            timeout=self.timeout_seconds,
+        ))
+        task.add_done_callback(lambda _: queue.put_nowait(_DONE))
+
+        text, tool_text = [], []
+        try:
+            while (item := await queue.get()) is not _DONE:
+                (text if item[0] == "text" else tool_text).append(item[1]["content"])
+                yield item
+            task.result()
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            yield "error", {"error": f"Request time exceeded {self.timeout_seconds} seconds", "thread_id": thread_id}
+            return
+        except BudgetExceeded as e:
+            self.counters["budget_exceeded"] += 1
+            yield "error", {"error": str(e), "thread_id": thread_id}
+            return
+        except Exception as e:
+            self.counters["errors"] += 1
+            logger.error(f"Chat request for thread {thread_id} failed: {str(e)}")
+            yield "error", {"error": str(e), "thread_id": thread_id}
+            return
+        finally:
+            if not task.done():
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+
+        final_text = "".join(text)
+        if graph is not supervisor and final_text:
+            # A routed turn never ran the supervisor; add it to the thread so follow-ups keep their context
+            await self._remember_turn(thread_id, query, final_text, answering_agent)
+        if lookup is not None and final_text:
+            try:
+                await asyncio.to_thread(
+                    self.response_cache.store,
+                    query,
+                    final_text,
+                    "".join(tool_text),
+                    agent=answering_agent or "supervisor",
+                    latency=time.perf_counter() - start,
+                    vector=lookup.vector,
+                )
+            except Exception as e:
+                # The answer is already complete; a cache failure must not turn it into an error
+                logger.error(f"Response cache store for thread {thread_id} failed: {str(e)}")
+        yield "done", self._done(thread_id, final_text, answering_agent or "supervisor", start)
+
+    async def _cache_lookup(self, query: str, thread_id: str) -> Optional[CacheLookup]:
+        """Cache lookup for ``query``, or None when the cache must not answer it; failures count as misses."""
+        if self.response_cache is None:
+            return None
+        try:
+            # The cache is shared by every conversation, so it only answers a thread's first
+            # question; follow-ups like "tell me more" depend on turns it knows nothing about
+            if await thread_has_history(self.registry.get_supervisor(), thread_id):
+                return None
+        except Exception as e:
+            logger.error(f"Reading the history of thread {thread_id} failed, skipping the response cache: {str(e)}")
+            return None
+        # Cache lookups embed the query over blocking HTTP, so keep them off the event loop
+        return await asyncio.to_thread(lookup_or_miss, self.response_cache, query)
+
+    async def _remember_turn(self, thread_id: str, query: str, answer: str, agent: str):
+        """Write a turn the supervisor did not run into its thread, so later turns see it."""
+        try:
+            await append_turn(self.registry.get_supervisor(), thread_id, query, answer, name=agent)
+        except Exception as e:
+            # The user already has the answer; only the conversation memory misses this turn
+            logger.error(f"Recording turn for thread {thread_id} failed: {str(e)}")
+
+    def _done(self, thread_id: str, text: str, agent: str, start: float, cached: bool = False) -> Dict[str, Any]:
+        self.counters["completed"] += 1
+        return {
+            "thread_id": thread_id,
+            "content": text,
+            "agent": agent,
+            "cached": cached,
+            "latency_s": round(time.perf_counter() - start, 3),
+        }
+
+
+async def chat(request: Request):
+    """POST /chat with ``{"message": ..., "thread_id": ...}``; streams SSE events."""
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "Request body must be JSON"}, status_code=400)
+    message = body.get("message") if isinstance(body, dict) else None
+    if not isinstance(message, str) or not message.strip():
+        return JSONResponse({"error": "'message' must be a non-empty string"}, status_code=400)
+    thread_id = body.get("thread_id") or random_uuid()
+    service: ChatService = request.app.state.chat_service
+
+    async def events():
+        stream = service.stream(message, thread_id)
+        try:
+            async for event, data in stream:
+                yield format_sse(event, data)
+        finally:
+            await stream.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def health(request: Request):
+    return JSONResponse({"status": "ok", "supervisor_built": request.app.state.chat_service.registry.is_built})
+
+
+async def stats(request: Request):
+    return JSONResponse(request.app.state.chat_service.stats())
+
+
+def create_app(service: Optional[ChatService] = None) -> Starlette:
+    """
+    Build the ASGI app; without ``service`` one is configured from the environment.
+
+    The supervisor is compiled at startup, in a worker thread, so the first
+    request does not pay for it.
+    """
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: Starlette):
+        if service is None:
+            from core.telemetry import init_tracing
+            init_tracing(
+                app_name=os.environ.get("OTEL_SERVICE_NAME", "CustomerAIAgent"),
+                api_endpoint=os.environ.get("DYNATRACE_EXPORTER_OTLP_ENDPOINT"),
+                headers={"Authorization": "Api-Token " + os.environ.get("DYNATRACE_API_TOKEN", "")},
+            )
+            app.state.chat_service = ChatService.from_env()
+        else:
+            app.state.chat_service = service
+        await asyncio.to_thread(app.state.chat_service.registry.get_supervisor)
+        yield
+
+    return Starlette(
+        routes=[
+            Route("/chat", chat, methods=["POST"]),
+            Route("/health", health, methods=["GET"]),
+            Route("/stats", stats, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
+
+
+app = create_app()
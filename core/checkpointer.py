@@ -0,0 +1,342 @@
+"""Bounded in-memory checkpointer with LRU eviction of idle threads."""
+import os
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Sequence, Set, Tuple
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import MemorySaver
+from core.logging_config import setup_logging
+
+logger = setup_logging()
+
+
+def _typed_size(value: Tuple[str, bytes]) -> int:
+    return len(value[0]) + len(value[1])
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    MemorySaver that caps memory use per thread and in total.
+
+    Each thread keeps at most ``max_checkpoints_per_thread`` checkpoints
+    across all its namespaces; a subgraph run (a supervisor handoff runs its
+    sub-agent under a new namespace) is dropped together with the parent
+    checkpoint that started it, and the latest state is always complete.
+    When more than ``max_threads`` threads are resident or their serialized
+    size exceeds ``max_bytes``, the least recently used threads are evicted,
+    and a thread that is over ``max_bytes`` on its own is trimmed to its
+    latest state. With
+    ``spill_path`` set, evicted threads are moved to a local SQLite file and
+    restored transparently on their next access; otherwise they are dropped.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_threads: int = 1000,
+        max_checkpoints_per_thread: int = 20,
+        spill_path: Optional[str] = None,
+        **kwargs: Any,
+    ):
+        super().__init__(**kwargs)
+        self.max_bytes = max_bytes
+        self.max_threads = max_threads
+        self.max_checkpoints_per_thread = max(max_checkpoints_per_thread, 1)
+        self.spill_path = spill_path
+        self.evictions = 0
+        self._lru: "OrderedDict[str, int]" = OrderedDict()  # thread_id -> bytes
+        self._write_keys: Dict[str, Set[tuple]] = {}
+        self._blob_keys: Dict[str, Set[tuple]] = {}
+        # thread_id -> (checkpoint_ns, checkpoint_id) -> channel versions, so pruning never deserializes
+        self._channels: Dict[str, Dict[Tuple[str, str], FrozenSet[tuple]]] = {}
+        # thread_id -> subgraph checkpoint_ns -> root checkpoint that started the run
+        self._parents: Dict[str, Dict[str, Optional[str]]] = {}
+        self._lock = threading.RLock()
+        self._spill: Optional[sqlite3.Connection] = None
+        if spill_path:
+            self._spill = sqlite3.connect(spill_path, check_same_thread=False)
+            self._spill.execute("CREATE TABLE IF NOT EXISTS threads (thread_id TEXT PRIMARY KEY, data BLOB)")
+            self._spill.commit()
+
+    # Checkpointer API
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with self._lock:
+            self._touch(config["configurable"]["thread_id"])
+            return super().get_tuple(config)
+
+    def list(self, config: Optional[RunnableConfig], **kwargs: Any) -> Iterator[CheckpointTuple]:
+        if config:
+            with self._lock:
+                self._touch(config["configurable"]["thread_id"])
+        yield from super().list(config, **kwargs)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        with self._lock:
+            thread_id = config["configurable"]["thread_id"]
+            checkpoint_ns = config["configurable"]["checkpoint_ns"]
+            self._touch(thread_id)
+            # A thread evicted mid-run comes back with only the channels this step
+            # changed; store the rest too so no kept checkpoint points at dropped blobs
+            missing = {
+                channel: version
+                for channel, version in checkpoint["channel_versions"].items()
+                if channel not in new_versions and (thread_id, checkpoint_ns, channel, version) not in self.blobs
+            }
+            if missing:
+                new_versions = {**new_versions, **missing}
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            self._blob_keys.setdefault(thread_id, set()).update(
+                (thread_id, checkpoint_ns, channel, version) for channel, version in new_versions.items()
+            )
+            self._channels.setdefault(thread_id, {})[(checkpoint_ns, checkpoint["id"])] = frozenset(
+                checkpoint["channel_versions"].items()
+            )
+            if checkpoint_ns:
+                self._parents.setdefault(thread_id, {}).setdefault(
+                    checkpoint_ns, (metadata.get("parents") or {}).get("")
+                )
+            self._prune_history(thread_id, self.max_checkpoints_per_thread)
+            self._account(thread_id)
+            self._enforce_limits(keep=thread_id)
+            return next_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with self._lock:
+            thread_id = config["configurable"]["thread_id"]
+            self._touch(thread_id)
+            super().put_writes(config, writes, task_id, task_path)
+            self._write_keys.setdefault(thread_id, set()).add(
+                (thread_id, config["configurable"].get("checkpoint_ns", ""), config["configurable"]["checkpoint_id"])
+            )
+            self._account(thread_id)
+            self._enforce_limits(keep=thread_id)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._drop_resident(thread_id)
+            if self._spill:
+                self._spill.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+                self._spill.commit()
+
+    # Reporting
+
+    def stats(self) -> Dict[str, int]:
+        """Resident thread count and bytes, plus eviction/spill counters."""
+        with self._lock:
+            spilled = 0
+            if self._spill:
+                spilled = self._spill.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+            return {
+                "resident_threads": len(self._lru),
+                "resident_bytes": sum(self._lru.values()),
+                "spilled_threads": spilled,
+                "evictions": self.evictions,
+            }
+
+    # Internals
+
+    def _touch(self, thread_id: str):
+        if thread_id in self._lru:
+            self._lru.move_to_end(thread_id)
+            return
+        if self._spill:
+            self._restore(thread_id)
+        self._lru[thread_id] = self._lru.get(thread_id, 0)
+        self._account(thread_id)
+
+    def _thread_size(self, thread_id: str) -> int:
+        size = 0
+        for checkpoints in self.storage.get(thread_id, {}).values():
+            for checkpoint, metadata, _ in checkpoints.values():
+                size += _typed_size(checkpoint) + _typed_size(metadata)
+        for key in self._write_keys.get(thread_id, ()):
+            for _, channel, value, _ in self.writes.get(key, {}).values():
+                size += len(channel) + _typed_size(value)
+        for key in self._blob_keys.get(thread_id, ()):
+            if key in self.blobs:
+                size += _typed_size(self.blobs[key])
+        return size
+
+    def _account(self, thread_id: str):
+        if thread_id in self._lru:
+            self._lru[thread_id] = self._thread_size(thread_id)
+
+    def _prune_history(self, thread_id: str, limit: int):
+        namespaces = self.storage.get(thread_id)
+        if not namespaces or sum(len(checkpoints) for checkpoints in namespaces.values()) <= limit:
+            return
+        root = namespaces.get("", {})
+        parents = self._parents.setdefault(thread_id, {})
+        dropped: List[Tuple[str, str]] = []
+
+        def drop_namespace(checkpoint_ns: str):
+            dropped.extend((checkpoint_ns, checkpoint_id) for checkpoint_id in namespaces.pop(checkpoint_ns))
+            parents.pop(checkpoint_ns, None)
+
+        # Subgraph runs whose parent checkpoint is gone finished long ago
+        for checkpoint_ns in [ns for ns in namespaces if ns and parents.get(ns) not in root]:
+            drop_namespace(checkpoint_ns)
+
+        # Then the oldest parent checkpoints, with the subgraph runs they started;
+        # a run still in progress always hangs off the latest one
+        total = sum(len(checkpoints) for checkpoints in namespaces.values())
+        while total > limit and len(root) > 1:
+            oldest = min(root)
+            del root[oldest]
+            dropped.append(("", oldest))
+            for checkpoint_ns in [ns for ns, parent in parents.items() if parent == oldest]:
+                drop_namespace(checkpoint_ns)
+            total = sum(len(checkpoints) for checkpoints in namespaces.values())
+
+        # Finally earlier steps of the runs that are left, keeping each one's latest checkpoint
+        if total > limit:
+            history = sorted(
+                (checkpoint_id, checkpoint_ns)
+                for checkpoint_ns, checkpoints in namespaces.items()
+                for checkpoint_id in sorted(checkpoints)[:-1]
+            )
+            for checkpoint_id, checkpoint_ns in history[:total - limit]:
+                del namespaces[checkpoint_ns][checkpoint_id]
+                dropped.append((checkpoint_ns, checkpoint_id))
+        if dropped:
+            self._drop_checkpoints(thread_id, dropped)
+
+    def _drop_checkpoints(self, thread_id: str, dropped: List[Tuple[str, str]]):
+        """Release the pending writes and channel blobs of checkpoints removed from storage."""
+        channels = self._channels.setdefault(thread_id, {})
+        for checkpoint_ns, checkpoint_id in dropped:
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            channels.pop((checkpoint_ns, checkpoint_id), None)
+
+        # Pending writes whose checkpoint is gone, including writes left over
+        # from a run that was in flight when the thread was last evicted
+        namespaces = self.storage[thread_id]
+        write_keys = self._write_keys.get(thread_id, set())
+        for key in list(write_keys):
+            _, checkpoint_ns, checkpoint_id = key
+            if checkpoint_id not in namespaces.get(checkpoint_ns, {}):
+                self.writes.pop(key, None)
+                write_keys.discard(key)
+
+        # Channel blobs no longer referenced by a retained checkpoint of the namespaces touched
+        affected = {checkpoint_ns for checkpoint_ns, _ in dropped}
+        live = set()
+        for checkpoint_ns in affected:
+            for checkpoint_id, (checkpoint, _, _) in namespaces.get(checkpoint_ns, {}).items():
+                versions = channels.get((checkpoint_ns, checkpoint_id))
+                if versions is None:
+                    versions = frozenset(self.serde.loads_typed(checkpoint)["channel_versions"].items())
+                    channels[(checkpoint_ns, checkpoint_id)] = versions
+                live.update((thread_id, checkpoint_ns, channel, version) for channel, version in versions)
+        blob_keys = self._blob_keys.get(thread_id, set())
+        for key in [key for key in blob_keys if key[1] in affected and key not in live]:
+            self.blobs.pop(key, None)
+            blob_keys.discard(key)
+
+    def _enforce_limits(self, keep: str):
+        while len(self._lru) > 1 and (
+            len(self._lru) > self.max_threads or sum(self._lru.values()) > self.max_bytes
+        ):
+            thread_id = next(iter(self._lru))
+            if thread_id == keep:
+                break
+            self._evict(thread_id)
+        if keep in self._lru and sum(self._lru.values()) > self.max_bytes:
+            # The active thread alone is over budget: keep only its latest state
+            self._prune_history(keep, 1)
+            self._account(keep)
+
+    def _evict(self, thread_id: str):
+        if self._spill:
+            data = {
+                "storage": dict(self.storage.get(thread_id, {})),
+                "writes": {key: self.writes[key] for key in self._write_keys.get(thread_id, ()) if key in self.writes},
+                "blobs": {key: self.blobs[key] for key in self._blob_keys.get(thread_id, ()) if key in self.blobs},
+                "channels": self._channels.get(thread_id, {}),
+                "parents": self._parents.get(thread_id, {}),
+            }
+            # Values are already serialized by self.serde; pickle only wraps plain containers
+            self._spill.execute(
+                "INSERT OR REPLACE INTO threads (thread_id, data) VALUES (?, ?)",
+                (thread_id, pickle.dumps(data)),
+            )
+            self._spill.commit()
+        self._drop_resident(thread_id)
+        self.evictions += 1
+        logger.info(f"Evicted idle checkpoint thread {thread_id} ({'spilled' if self._spill else 'dropped'})")
+
+    def _restore(self, thread_id: str):
+        row = self._spill.execute("SELECT data FROM threads WHERE thread_id = ?", (thread_id,)).fetchone()
+        if row is None:
+            return
+        data = pickle.loads(row[0])
+        for checkpoint_ns, checkpoints in data["storage"].items():
+            self.storage[thread_id][checkpoint_ns] = checkpoints
+        self.writes.update(data["writes"])
+        self.blobs.update(data["blobs"])
+        self._write_keys[thread_id] = set(data["writes"])
+        self._blob_keys[thread_id] = set(data["blobs"])
+        self._channels[thread_id] = data.get("channels", {})
+        self._parents[thread_id] = data.get("parents", {})
+        self._spill.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+        self._spill.commit()
+
+    def _drop_resident(self, thread_id: str):
+        # get_tuple() leaves empty write entries behind for every checkpoint it reads
+        for checkpoint_ns, checkpoints in self.storage.pop(thread_id, {}).items():
+            for checkpoint_id in checkpoints:
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+        for key in self._write_keys.pop(thread_id, ()):
+            self.writes.pop(key, None)
+        for key in self._blob_keys.pop(thread_id, ()):
+            self.blobs.pop(key, None)
+        self._channels.pop(thread_id, None)
+        self._parents.pop(thread_id, None)
+        self._lru.pop(thread_id, None)
+
+
+def create_checkpointer() -> MemorySaver:
+    """
+    Checkpointer selected by CHECKPOINTER: "bounded" (default) or "memory".
+
+    The bounded saver is sized by CHECKPOINT_MAX_BYTES, CHECKPOINT_MAX_THREADS
+    and CHECKPOINT_MAX_HISTORY, and spills evicted threads to
+    CHECKPOINT_SPILL_PATH when that is set.
+    """
+    if os.getenv("CHECKPOINTER", "bounded").lower() == "memory":
+        return MemorySaver()
+    return BoundedMemorySaver(
+        max_bytes=int(os.getenv("CHECKPOINT_MAX_BYTES", str(256 * 1024 * 1024))),
+        max_threads=int(os.getenv("CHECKPOINT_MAX_THREADS", "1000")),
+        max_checkpoints_per_thread=int(os.getenv("CHECKPOINT_MAX_HISTORY", "20")),
+        spill_path=os.getenv("CHECKPOINT_SPILL_PATH") or None,
+    )
+
+
+_shared_checkpointer: Optional[MemorySaver] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_checkpointer() -> MemorySaver:
+    """Process-wide checkpointer, so every session's threads share one budget."""
+    global _shared_checkpointer
+    with _shared_lock:
+        if _shared_checkpointer is None:
+            _shared_checkpointer = create_checkpointer()
+        return _shared_checkpointer
@@ -0,0 +1,199 @@
+"""Compaction of the message history the supervisor's LLM sees on each call."""
+import functools
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from opentelemetry import trace
+from opentelemetry.metrics import get_meter
+from core.logging_config import setup_logging
+
+logger = setup_logging()
+meter = get_meter(__name__)
+tokens_saved_histogram = meter.create_histogram(
+    "supervisor.prompt_tokens_saved", description="Prompt tokens removed from one supervisor call by history compaction"
+)
+
+# Tool names langgraph_supervisor gives handoffs to an agent and back to the supervisor
+HANDOFF_PREFIXES = ("transfer_to_", "transfer_back_to_")
+
+
+def _is_handoff(name: Optional[str]) -> bool:
+    return (name or "").startswith(HANDOFF_PREFIXES)
+
+
+def _has_content(message: BaseMessage) -> bool:
+    content = message.content
+    if isinstance(content, str):
+        return bool(content.strip())
+    return any(
+        (isinstance(part, str) and part.strip()) or (isinstance(part, dict) and part.get("text"))
+        for part in content
+    )
+
+
+def _without_tool_calls(message: AIMessage, keep: Callable[[Dict[str, Any]], bool]) -> Optional[AIMessage]:
+    """``message`` with only the tool calls ``keep`` accepts, or None if nothing is left."""
+    tool_calls = [tool_call for tool_call in message.tool_calls if keep(tool_call)]
+    if len(tool_calls) == len(message.tool_calls):
+        return message
+    if not tool_calls and not _has_content(message):
+        return None
+    additional_kwargs = {key: value for key, value in message.additional_kwargs.items() if key != "tool_calls"}
+    return message.model_copy(update={
+        "tool_calls": tool_calls, "invalid_tool_calls": [], "additional_kwargs": additional_kwargs,
+    })
+
+
+def _filter(messages: Sequence[BaseMessage], keep_call: Callable[[Dict[str, Any]], bool]) -> List[BaseMessage]:
+    """Drop tool calls ``keep_call`` rejects together with their results."""
+    dropped_ids = set()
+    kept: List[BaseMessage] = []
+    for message in messages:
+        if isinstance(message, AIMessage) and message.tool_calls:
+            dropped_ids.update(tool_call["id"] for tool_call in message.tool_calls if not keep_call(tool_call))
+            if all(_is_handoff(tool_call["name"]) for tool_call in message.tool_calls):
+                # "Transferring back to supervisor" and the like carry no information
+                continue
+            message = _without_tool_calls(message, keep_call)
+            if message is None:
+                continue
+        elif isinstance(message, ToolMessage) and (message.tool_call_id in dropped_ids or _is_handoff(message.name)):
+            continue
+        kept.append(message)
+    return kept
+
+
+def _split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """Groups of messages, each starting at a human message (the first may not)."""
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+class HistoryCompactor:
+    """
+    Keeps the supervisor's prompt under a token budget.
+
+    The supervisor runs with ``output_mode="full_history"`` and handoff-back
+    messages, so its state collects every handoff and every sub-agent tool
+    call and result, and all of it used to be replayed to the LLM on each
+    call. Before each call:
+
+    - handoff chatter (messages that only call ``transfer_to_*`` /
+      ``transfer_back_to_*`` tools, and the results) is dropped everywhere;
+    - earlier turns are reduced to the user's question and the agents'
+      answers, without their tool calls and results;
+    - the oldest earlier turns are dropped until the history fits
+      ``max_tokens``. The current turn is always kept whole.
+
+    Only the prompt is compacted; the graph state and checkpoints keep the
+    full history. Tokens are estimated with ``count_tokens_approximately``.
+    """
+
+    def __init__(self, max_tokens: int = 4000, token_counter: Callable[[Sequence[BaseMessage]], int] = count_tokens_approximately):
+        self.max_tokens = max_tokens
+        self.token_counter = token_counter
+        self.counters = {
+            "calls": 0, "tokens_before": 0, "tokens_after": 0, "turns_dropped": 0, "messages_dropped": 0,
+        }
+        self.last_tokens_saved = 0
+        self._lock = threading.Lock()
+
+    def compact(self, messages: Sequence[BaseMessage], record: bool = True) -> List[BaseMessage]:
+        """The history to send, compacted; also records the tokens saved unless ``record`` is False."""
+        turns = _split_turns(messages)
+        if not turns:
+            return []
+        if not isinstance(turns[-1][0], HumanMessage):
+            # No question yet: nothing to tell earlier turns from the current one
+            turns = [list(messages)]
+        current = _filter(turns[-1], lambda tool_call: not _is_handoff(tool_call["name"]))
+        budget = self.max_tokens - self.token_counter(current)
+
+        kept_turns: List[List[BaseMessage]] = []
+        for turn in reversed(turns[:-1]):
+            answers = _filter(turn, lambda tool_call: False)
+            tokens = self.token_counter(answers)
+            if tokens > budget:
+                break
+            budget -= tokens
+            kept_turns.append(answers)
+
+        compacted = [message for turn in reversed(kept_turns) for message in turn] + current
+        if record:
+            self._record(messages, compacted, len(turns) - 1 - len(kept_turns))
+        return compacted
+
+    def prompt(self, system_prompt: str) -> Callable[[Dict[str, Any]], List[BaseMessage]]:
+        """A ``create_supervisor`` prompt: ``system_prompt`` followed by the compacted history."""
+        system_message = SystemMessage(content=system_prompt)
+
+        def build_prompt(state: Dict[str, Any]) -> List[BaseMessage]:
+            return [system_message, *self.compact(state["messages"])]
+
+        return build_prompt
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+            last_tokens_saved = self.last_tokens_saved
+        tokens_saved = counters["tokens_before"] - counters["tokens_after"]
+        return {
+            **counters,
+            "tokens_saved": tokens_saved,
+            "last_tokens_saved": last_tokens_saved,
+            "saved_rate": tokens_saved / counters["tokens_before"] if counters["tokens_before"] else 0.0,
+        }
+
+    def _record(self, original: Sequence[BaseMessage], compacted: List[BaseMessage], turns_dropped: int):
+        before = self.token_counter(original)
+        after = self.token_counter(compacted)
+        with self._lock:
+            self.counters["calls"] += 1
+            self.counters["tokens_before"] += before
+            self.counters["tokens_after"] += after
+            self.counters["turns_dropped"] += turns_dropped
+            self.counters["messages_dropped"] += len(original) - len(compacted)
+            self.last_tokens_saved = before - after
+        tokens_saved_histogram.record(before - after)
+        trace.get_current_span().add_event("history.compacted", {
+            "tokens_before": before, "tokens_after": after, "turns_dropped": turns_dropped,
+        })
+        logger.debug(f"Supervisor history compacted from {before} to {after} tokens ({turns_dropped} turns dropped)")
+
+
+@functools.lru_cache(maxsize=None)
+def get_history_compactor() -> Optional[HistoryCompactor]:
+    """
+    Process-wide compactor for the supervisor, or None when disabled.
+
+    HISTORY_COMPACTION=off disables it; SUPERVISOR_HISTORY_TOKENS sets the
+    token budget of the history sent on each supervisor call (default 4000).
+    """
+    if os.getenv("HISTORY_COMPACTION", "on").lower() == "off":
+        return None
+    return HistoryCompactor(max_tokens=int(os.getenv("SUPERVISOR_HISTORY_TOKENS", "4000")))
+
+
+async def routed_agent_input(supervisor: Any, thread_id: str, query: str) -> Dict[str, Any]:
+    """
+    Input for a sub-agent that answers ``query`` directly, without the supervisor.
+
+    Sub-agents have no conversation memory of their own, so they get the
+    supervisor thread's earlier turns compacted the way the supervisor would
+    see them: questions and answers only, within the token budget.
+    """
+    question = HumanMessage(content=query)
+    if getattr(supervisor, "checkpointer", None) is None:
+        return {"messages": [question]}
+    state = await supervisor.aget_state({"configurable": {"thread_id": thread_id}})
+    history = list(state.values.get("messages", []))
+    if not history:
+        return {"messages": [question]}
+    compactor = get_history_compactor() or HistoryCompactor()
+    return {"messages": compactor.compact([*history, question], record=False)}
@@ -0,0 +1,190 @@
+"""Process-wide pooled HTTP clients shared by every model, embedding and tool client."""
+import asyncio
+import functools
+import importlib.util
+import os
+import threading
+import weakref
+from typing import Any, Dict, Optional
+import httpx
+import requests
+from langchain.chat_models import init_chat_model
+from langchain_openai import OpenAIEmbeddings
+from requests.adapters import HTTPAdapter
+from core.logging_config import setup_logging
+
+logger = setup_logging()
+
+
+class PoolStats:
+    """Counts requests and new connections, so connection reuse can be reported.
+
+    ``requests`` and ``reuse_rate`` cover the traced httpx clients only; calls
+    through the shared ``requests`` session are counted as ``session_requests``
+    because its connection opens cannot be traced.
+    """
+
+    def __init__(self):
+        self.counters = {"requests": 0, "connections_opened": 0, "tls_handshakes": 0, "session_requests": 0}
+        self._lock = threading.Lock()
+
+    def add(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        requests_sent = counters["requests"]
+        return {
+            **counters,
+            "reuse_rate": 1 - counters["connections_opened"] / requests_sent if requests_sent else 0.0,
+        }
+
+    def _on_trace(self, name: str):
+        if name == "connection.connect_tcp.complete":
+            self.add("connections_opened")
+        elif name == "connection.start_tls.complete":
+            self.add("tls_handshakes")
+
+    def request_hook(self, request: httpx.Request):
+        self.add("requests")
+        request.extensions["trace"] = lambda name, info: self._on_trace(name)
+
+    async def arequest_hook(self, request: httpx.Request):
+        self.add("requests")
+
+        async def trace(name, info):
+            self._on_trace(name)
+
+        request.extensions["trace"] = trace
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")),
+        keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30")),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _http2_enabled() -> bool:
+    if os.getenv("HTTP2", "1") != "1":
+        return False
+    if importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP2=1 but the 'h2' package is not installed; using HTTP/1.1 keep-alive pools")
+        return False
+    return True
+
+
+class LoopAwareAsyncClient(httpx.AsyncClient):
+    """
+    Async client that keeps one connection pool per event loop.
+
+    Async connections cannot move between event loops, and every Streamlit
+    session runs its own loop, so requests are sent through a pool owned by
+    the running loop. All clients in the process share those pools.
+    """
+
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self._pool_kwargs = kwargs
+        self._stats = stats
+        self._pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self._pools_lock = threading.Lock()
+
+    def _pool(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._pools_lock:
+            pool = self._pools.get(loop)
+            if pool is None or pool.is_closed:
+                pool = httpx.AsyncClient(**self._pool_kwargs, event_hooks={"request": [self._stats.arequest_hook]})
+                self._pools[loop] = pool
+            return pool
+
+    async def send(self, request: httpx.Request, **kwargs) -> httpx.Response:
+        return await self._pool().send(request, **kwargs)
+
+    async def aclose(self):
+        pool = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool is not None:
+            await pool.aclose()
+
+
+_stats = PoolStats()
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[LoopAwareAsyncClient] = None
+_requests_session: Optional[requests.Session] = None
+_lock = threading.Lock()
+
+
+def get_http_client() -> httpx.Client:
+    """Shared synchronous client, sized by HTTP_MAX_CONNECTIONS / HTTP_MAX_KEEPALIVE_CONNECTIONS."""
+    global _http_client
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    limits=_limits(), http2=_http2_enabled(), event_hooks={"request": [_stats.request_hook]}
+                )
+    return _http_client
+
+
+def get_async_http_client() -> LoopAwareAsyncClient:
+    """Shared async client; connections are pooled per event loop."""
+    global _async_http_client
+    if _async_http_client is None:
+        with _lock:
+            if _async_http_client is None:
+                _async_http_client = LoopAwareAsyncClient(_stats, limits=_limits(), http2=_http2_enabled())
+    return _async_http_client
+
+
+def get_requests_session() -> requests.Session:
+    """Shared ``requests`` session with a keep-alive pool for tools that use ``requests``."""
+    global _requests_session
+    if _requests_session is None:
+        with _lock:
+            if _requests_session is None:
+                session = requests.Session()
+                pool_size = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.hooks["response"].append(lambda response, *args, **kwargs: _stats.add("session_requests"))
+                _requests_session = session
+    return _requests_session
+
+
+def create_chat_model(model: str, **kwargs):
+    """``init_chat_model`` for ``model`` on the shared connection pools.
+
+    Streamed responses end with a usage chunk, so per-node token counts and
+    query budgets see real token usage.
+    """
+    kwargs.setdefault("stream_usage", True)
+    return init_chat_model(
+        model,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+        **kwargs,
+    )
+
+
+def create_embeddings(**kwargs) -> OpenAIEmbeddings:
+    """``OpenAIEmbeddings`` on the shared connection pools."""
+    return OpenAIEmbeddings(
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+        **kwargs,
+    )
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Requests sent, connections and TLS handshakes opened, and the connection reuse rate.
+
+    The reuse rate covers the httpx clients; calls through the shared
+    ``requests`` session are reported separately as ``session_requests``.
+    """
+    return _stats.stats()
@@ -0,0 +1,220 @@
+"""Persistent FAISS index store for the RAG corpora."""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import faiss
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from core.logging_config import setup_logging
+
+logger = setup_logging()
+
+DEFAULT_CACHE_DIR = os.getenv("INDEX_CACHE_DIR", os.path.join(".cache", "faiss"))
+MANIFEST_VERSION = 1
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class IndexStore:
+    """Saves FAISS indexes plus their docstore to disk, keyed by content hash.
+
+    A corpus whose text, splitter settings and embedding model are unchanged is
+    loaded straight from disk (memory-mapped). Otherwise only chunks whose text
+    is new are re-embedded; vectors for unchanged chunks are reused. Loaded
+    stores are also kept in memory, so every caller in the process asking for
+    the same corpus shares one instance.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, chunk_size: int = 500, chunk_overlap: int = 50):
+        self.cache_dir = Path(cache_dir or DEFAULT_CACHE_DIR)
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        )
+        self.stats = {"loads": 0, "builds": 0, "chunks_embedded": 0, "chunks_reused": 0}
+        self._stores: Dict[str, FAISS] = {}
+        self._lock = threading.Lock()
+
+    def load_or_build(self, name: str, filename: str, embeddings: Embeddings) -> FAISS:
+        """Return the FAISS store for ``filename``, embedding only what changed."""
+        text = Path(filename).read_text(encoding="utf-8")
+        model = getattr(embeddings, "model", type(embeddings).__name__)
+        cache_key = _sha256(f"{model}:{self.chunk_size}:{self.chunk_overlap}:{text}")
+
+        with self._lock:
+            store_key = f"{name}:{cache_key}"
+            if store_key not in self._stores:
+                store = self._load_or_build(name, filename, text, model, cache_key, embeddings)
+                # Drop stores built from an older version of the same corpus
+                for stale_key in [k for k in self._stores if k.startswith(f"{name}:")]:
+                    del self._stores[stale_key]
+                self._stores[store_key] = store
+            return self._stores[store_key]
+
+    def _load_or_build(
+        self,
+        name: str,
+        filename: str,
+        text: str,
+        model: str,
+        cache_key: str,
+        embeddings: Embeddings,
+    ) -> FAISS:
+        manifest = self._read_manifest(name)
+        if manifest and manifest.get("cache_key") == cache_key:
+            try:
+                store = self._load(name, manifest, embeddings)
+                self.stats["loads"] += 1
+                logger.info(f"Loaded '{name}' index from {self.cache_dir} ({len(manifest['chunks'])} chunks)")
+                return store
+            except Exception as e:
+                logger.warning(f"Cached index '{name}' unreadable, rebuilding: {str(e)}")
+
+        return self._build(name, filename, text, model, cache_key, embeddings, manifest)
+
+    def _paths(self, name: str) -> Dict[str, Path]:
+        return {
+            "index": self.cache_dir / f"{name}.faiss",
+            "vectors": self.cache_dir / f"{name}.vectors.npy",
+            "manifest": self.cache_dir / f"{name}.json",
+        }
+
+    def _read_manifest(self, name: str) -> Optional[Dict[str, Any]]:
+        path = self._paths(name)["manifest"]
+        if not path.exists():
+            return None
+        try:
+            manifest = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring corrupt manifest {path}: {str(e)}")
+            return None
+        return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+    def _load(self, name: str, manifest: Dict[str, Any], embeddings: Embeddings) -> FAISS:
+        index = faiss.read_index(str(self._paths(name)["index"]), faiss.IO_FLAG_MMAP)
+        chunks = manifest["chunks"]
+        if index.ntotal != len(chunks):
+            raise ValueError(f"index has {index.ntotal} vectors but manifest lists {len(chunks)} chunks")
+
+        docstore = InMemoryDocstore({
+            chunk["id"]: Document(page_content=chunk["text"], metadata=chunk["metadata"])
+            for chunk in chunks
+        })
+        index_to_docstore_id = {i: chunk["id"] for i, chunk in enumerate(chunks)}
+        return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+    def _cached_vectors(self, name: str, manifest: Optional[Dict[str, Any]], model: str) -> Dict[str, np.ndarray]:
+        """Map chunk hash -> vector from the previous build of the same model."""
+        if not manifest or manifest.get("model") != model:
+            return {}
+        try:
+            vectors = np.load(self._paths(name)["vectors"], mmap_mode="r")
+        except (OSError, ValueError):
+            return {}
+        hashes = [chunk["hash"] for chunk in manifest["chunks"]]
+        if len(hashes) != len(vectors):
+            return {}
+        return dict(zip(hashes, vectors))
+
+    def _build(
+        self,
+        name: str,
+        filename: str,
+        text: str,
+        model: str,
+        cache_key: str,
+        embeddings: Embeddings,
+        manifest: Optional[Dict[str, Any]],
+    ) -> FAISS:
+        docs = self.text_splitter.split_documents(
+            [Document(page_content=text, metadata={"source": filename})]
+        )
+        hashes = [_sha256(doc.page_content) for doc in docs]
+        vectors_by_hash = self._cached_vectors(name, manifest, model)
+
+        missing: Dict[str, str] = {}
+        for doc, chunk_hash in zip(docs, hashes):
+            if chunk_hash not in vectors_by_hash:
+                missing.setdefault(chunk_hash, doc.page_content)
+        if missing:
+            embedded = embeddings.embed_documents(list(missing.values()))
+            vectors_by_hash.update(zip(missing.keys(), (np.asarray(v, dtype="float32") for v in embedded)))
+
+        reused = len(docs) - sum(1 for h in hashes if h in missing)
+        self.stats["builds"] += 1
+        self.stats["chunks_embedded"] += len(missing)
+        self.stats["chunks_reused"] += reused
+        logger.info(f"Built '{name}' index: {len(missing)} chunks embedded, {reused} reused")
+
+        matrix = np.asarray([vectors_by_hash[h] for h in hashes], dtype="float32")
+        store = FAISS.from_embeddings(
+            zip([doc.page_content for doc in docs], matrix.tolist()),
+            embeddings,
+            metadatas=[doc.metadata for doc in docs],
+        )
+
+        try:
+            self._save(name, store, docs, hashes, matrix, model, cache_key)
+        except OSError as e:
+            logger.warning(f"Could not persist '{name}' index to {self.cache_dir}: {str(e)}")
+        return store
+
+    def _save(
+        self,
+        name: str,
+        store: FAISS,
+        docs: List[Document],
+        hashes: List[str],
+        matrix: np.ndarray,
+        model: str,
+        cache_key: str,
+    ):
+        paths = self._paths(name)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # Write data files first and the manifest last, so a crash mid-save
+        # leaves a manifest that no longer matches and forces a rebuild.
+        tmp_index = paths["index"].with_suffix(".faiss.tmp")
+        faiss.write_index(store.index, str(tmp_index))
+        os.replace(tmp_index, paths["index"])
+
+        with open(paths["vectors"].with_suffix(".tmp"), "wb") as f:
+            np.save(f, matrix)
+        os.replace(paths["vectors"].with_suffix(".tmp"), paths["vectors"])
+
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "cache_key": cache_key,
+            "model": model,
+            "chunks": [
+                {
+                    "id": store.index_to_docstore_id[i],
+                    "hash": hashes[i],
+                    "text": doc.page_content,
+                    "metadata": doc.metadata,
+                }
+                for i, doc in enumerate(docs)
+            ],
+        }
+        tmp_manifest = paths["manifest"].with_suffix(".json.tmp")
+        tmp_manifest.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_manifest, paths["manifest"])
+
+
+index_store = IndexStore()
+
+
+def load_or_build_index(name: str, filename: str, embeddings: Embeddings) -> FAISS:
+    """Load ``filename``'s index from the shared on-disk store, building it if stale."""
+    return index_store.load_or_build(name, filename, embeddings)
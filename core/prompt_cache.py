@@ -0,0 +1,62 @@
+"""Hub prompt cache with an on-disk copy for offline use."""
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+from langchain import hub
+from langchain_core.load import dumps, loads
+from langchain_core.prompts import BasePromptTemplate
+from core.logging_config import setup_logging
+
+logger = setup_logging()
+
+DEFAULT_PROMPT_CACHE_DIR = os.getenv("PROMPT_CACHE_DIR", os.path.join(".cache", "prompts"))
+
+_prompts: Dict[str, BasePromptTemplate] = {}
+_lock = threading.Lock()
+
+
+def _cache_path(owner_repo: str, cache_dir: Optional[str]) -> Path:
+    return Path(cache_dir or DEFAULT_PROMPT_CACHE_DIR) / (owner_repo.replace("/", "__") + ".json")
+
+
+def pull_prompt(owner_repo: str, cache_dir: Optional[str] = None) -> BasePromptTemplate:
+    """
+    Resolve a LangChain Hub prompt once per process.
+
+    Lookup order is memory, then the on-disk copy, then ``hub.pull``; a pulled
+    prompt is written to disk so later processes start without network access.
+    Delete the cached file to pick up a new upstream version.
+    """
+    if owner_repo in _prompts:
+        return _prompts[owner_repo]
+
+    with _lock:
+        if owner_repo in _prompts:
+            return _prompts[owner_repo]
+
+        path = _cache_path(owner_repo, cache_dir)
+        prompt = None
+        if path.exists():
+            try:
+                prompt = loads(path.read_text(encoding="utf-8"))
+                logger.info(f"Loaded prompt '{owner_repo}' from {path}")
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable cached prompt {path}: {str(e)}")
+
+        if prompt is None:
+            prompt = hub.pull(owner_repo)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(dumps(prompt), encoding="utf-8")
+            except OSError as e:
+                logger.warning(f"Could not cache prompt '{owner_repo}' to {path}: {str(e)}")
+
+        _prompts[owner_repo] = prompt
+        return prompt
+
+
+def clear_prompt_cache():
+    """Forget prompts resolved in this process (the on-disk copies are kept)."""
+    with _lock:
+        _prompts.clear()
@@ -0,0 +1,271 @@
+"""Semantic cache of final chat responses, keyed by normalized query embedding."""
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from core.logging_config import setup_logging
+
+logger = setup_logging()
+
+# Seconds a response stays fresh, by the agent that produced it
+DEFAULT_AGENT_TTLS: Dict[str, float] = {
+    "news_agent": 300,
+    "humorous_news_agent": 300,
+    "technical_agent": 300,
+    "fundamental_agent": 900,
+    "insurance_agent": 24 * 3600,
+}
+DEFAULT_TTL = 600
+
+# Responses built from these files are dropped when the file changes
+DEFAULT_SOURCE_FILES: Dict[str, str] = {
+    "insurance_agent": os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "insurance_policy.txt"),
+}
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+
+# Capitalized words at the start of a question that are not names
+_COMMON_WORDS = frozenset("""
+    a an and any are can compare could did do does explain find for get give how i in is it list me my of
+    on or please show tell the today what whats when where which who why will would you your
+""".split())
+_TOKEN = re.compile(r"\$?[A-Za-z][A-Za-z0-9&.]*|\d[\d,]*(?:\.\d+)?%?")
+
+
+def extract_entities(query: str) -> FrozenSet[str]:
+    """
+    Tickers, numbers and capitalized names in ``query``, lowercased.
+
+    Two queries can embed almost identically while naming different
+    companies ("P/E ratio of Apple" vs "of Amazon"), so a semantic hit is
+    only served when these match exactly.
+    """
+    entities = set()
+    for token in _TOKEN.findall(query):
+        token = token.rstrip(".").removeprefix("$")
+        if token[:1].isdigit():
+            entities.add(token.replace(",", ""))
+        elif any(char.isupper() for char in token) and token.lower() not in _COMMON_WORDS:
+            entities.add(token.lower())
+    return frozenset(entities)
+
+
+def _file_fingerprint(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class CachedResponse(NamedTuple):
+    query: str
+    text: str
+    tool_text: str
+    agent: str
+    stored_at: float
+    latency: float
+    source_fingerprint: Optional[Tuple[int, int]]
+    entities: FrozenSet[str] = frozenset()
+
+
+class CacheLookup(NamedTuple):
+    """Result of ``lookup``; ``vector`` is reused by ``store`` on a miss."""
+    response: Optional[CachedResponse]
+    similarity: float
+    vector: Optional[np.ndarray]
+
+
+class SemanticResponseCache:
+    """
+    Caches final chat responses and serves them for near-identical queries.
+
+    An exact match on the normalized query is served without any embedding
+    call; otherwise the query embedding is compared with cached ones and the
+    closest entry is served when its cosine similarity reaches ``threshold``
+    and it names the same tickers, numbers and proper nouns as the query.
+    Entries expire after their agent's TTL, and entries from an agent listed
+    in ``source_files`` are dropped once that file changes on disk.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        threshold: float = 0.95,
+        agent_ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = DEFAULT_TTL,
+        source_files: Optional[Dict[str, str]] = None,
+        max_entries: int = 1000,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.agent_ttls = DEFAULT_AGENT_TTLS if agent_ttls is None else agent_ttls
+        self.default_ttl = default_ttl
+        self.source_files = DEFAULT_SOURCE_FILES if source_files is None else source_files
+        self.max_entries = max_entries
+        self.clock = clock
+        self.counters = {
+            "lookups": 0, "exact_hits": 0, "semantic_hits": 0, "misses": 0,
+            "stores": 0, "expired": 0, "invalidated": 0, "entity_mismatches": 0,
+        }
+        self.latency_saved = 0.0
+        self._entries: List[CachedResponse] = []
+        self._vectors: List[np.ndarray] = []
+        self._lock = threading.Lock()
+
+    def lookup(self, query: str) -> CacheLookup:
+        normalized = normalize_query(query)
+        start = time.perf_counter()
+        with self._lock:
+            self.counters["lookups"] += 1
+            self._evict_stale()
+            for entry in self._entries:
+                if entry.query == normalized:
+                    return self._hit(entry, 1.0, None, "exact_hits", start)
+            if not self._entries:
+                self.counters["misses"] += 1
+                return CacheLookup(None, 0.0, None)
+
+        vector = self._embed(normalized)
+        entities = extract_entities(query)
+        with self._lock:
+            if self._entries:
+                similarities = np.stack(self._vectors) @ vector
+                same_entities = np.array([entry.entities == entities for entry in self._entries])
+                if similarities.max() >= self.threshold and not same_entities[similarities >= self.threshold].any():
+                    self.counters["entity_mismatches"] += 1
+                similarities = np.where(same_entities, similarities, -1.0)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    return self._hit(self._entries[best], float(similarities[best]), vector, "semantic_hits", start)
+                self.counters["misses"] += 1
+                return CacheLookup(None, max(float(similarities[best]), 0.0), vector)
+            self.counters["misses"] += 1
+            return CacheLookup(None, 0.0, vector)
+
+    def store(
+        self,
+        query: str,
+        text: str,
+        tool_text: str = "",
+        agent: str = "supervisor",
+        latency: float = 0.0,
+        vector: Optional[np.ndarray] = None,
+    ):
+        """Cache the final response to ``query`` produced by ``agent`` in ``latency`` seconds."""
+        normalized = normalize_query(query)
+        if vector is None:
+            vector = self._embed(normalized)
+        source = self.source_files.get(agent)
+        entry = CachedResponse(
+            query=normalized,
+            text=text,
+            tool_text=tool_text,
+            agent=agent,
+            stored_at=self.clock(),
+            latency=latency,
+            source_fingerprint=_file_fingerprint(source) if source else None,
+            entities=extract_entities(query),
+        )
+        with self._lock:
+            for i, existing in enumerate(self._entries):
+                if existing.query == normalized:
+                    del self._entries[i], self._vectors[i]
+                    break
+            self._entries.append(entry)
+            self._vectors.append(vector)
+            while len(self._entries) > self.max_entries:
+                del self._entries[0], self._vectors[0]
+            self.counters["stores"] += 1
+
+    def invalidate(self, agent: Optional[str] = None) -> int:
+        """Drop entries from ``agent`` (or all entries); returns how many were dropped."""
+        with self._lock:
+            return self._drop(lambda entry: agent is None or entry.agent == agent, "invalidated")
+
+    def stats(self) -> Dict[str, float]:
+        """Counters, hit rate and total seconds saved by cache hits."""
+        with self._lock:
+            hits = self.counters["exact_hits"] + self.counters["semantic_hits"]
+            lookups = self.counters["lookups"]
+            return {
+                **self.counters,
+                "entries": len(self._entries),
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "latency_saved_s": self.latency_saved,
+            }
+
+    def _embed(self, normalized: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(normalized), dtype="float32")
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _hit(self, entry: CachedResponse, similarity: float, vector, counter: str, start: float) -> CacheLookup:
+        self.counters[counter] += 1
+        self.latency_saved += max(entry.latency - (time.perf_counter() - start), 0.0)
+        logger.info(f"Response cache hit ({counter[:-5]}, similarity={similarity:.3f}, agent={entry.agent})")
+        return CacheLookup(entry, similarity, vector)
+
+    def _evict_stale(self):
+        now = self.clock()
+        self._drop(
+            lambda entry: now - entry.stored_at >= self.agent_ttls.get(entry.agent, self.default_ttl),
+            "expired",
+        )
+        fingerprints = {agent: _file_fingerprint(path) for agent, path in self.source_files.items()}
+        self._drop(
+            lambda entry: entry.agent in fingerprints and entry.source_fingerprint != fingerprints[entry.agent],
+            "invalidated",
+        )
+
+    def _drop(self, predicate: Callable[[CachedResponse], bool], counter: str) -> int:
+        keep = [i for i, entry in enumerate(self._entries) if not predicate(entry)]
+        dropped = len(self._entries) - len(keep)
+        if dropped:
+            self._entries = [self._entries[i] for i in keep]
+            self._vectors = [self._vectors[i] for i in keep]
+            self.counters[counter] += dropped
+        return dropped
+
+
+def lookup_or_miss(cache: SemanticResponseCache, query: str) -> CacheLookup:
+    """``cache.lookup(query)``, treating a cache failure (e.g. embeddings down) as a miss."""
+    try:
+        return cache.lookup(query)
+    except Exception as e:
+        logger.warning(f"Response cache lookup failed, answering without it: {str(e)}")
+        return CacheLookup(None, 0.0, None)
+
+
+def store_quietly(cache: SemanticResponseCache, query: str, text: str, **kwargs) -> bool:
+    """``cache.store(query, text, ...)``, logging a failure instead of raising; returns whether it stored."""
+    try:
+        cache.store(query, text, **kwargs)
+        return True
+    except Exception as e:
+        logger.warning(f"Response cache store failed: {str(e)}")
+        return False
+
+
+def create_response_cache() -> Optional[SemanticResponseCache]:
+    """
+    Response cache configured from the environment, or None when disabled.
+
+    RESPONSE_CACHE=off disables it; RESPONSE_CACHE_THRESHOLD sets the cosine
+    similarity needed to serve a cached answer (default 0.95).
+    """
+    if os.getenv("RESPONSE_CACHE", "on").lower() == "off":
+        return None
+    from core.http_clients import create_embeddings
+    return SemanticResponseCache(
+        create_embeddings(),
+        threshold=float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95")),
+    )
@@ -0,0 +1,182 @@
+"""Tracing setup with bounded, batched OTLP span export."""
+import atexit
+import collections
+import os
+import threading
+import time
+from typing import Deque, Dict, Optional, Sequence
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from traceloop.sdk import Traceloop
+from core.logging_config import setup_logging
+
+logger = setup_logging()
+
+
+class BoundedBatchSpanProcessor(SpanProcessor):
+    """Exports finished spans in batches from a bounded queue on a worker thread.
+
+    ``on_end`` only enqueues, so no network call happens on the request path.
+    When the queue is full new spans are dropped and counted instead of
+    blocking the caller.
+    """
+
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        max_queue_size: int = 2048,
+        schedule_delay_millis: float = 5000,
+        max_export_batch_size: int = 512,
+    ):
+        self.exporter = exporter
+        self.max_queue_size = max_queue_size
+        self.schedule_delay = schedule_delay_millis / 1000
+        self.max_export_batch_size = min(max_export_batch_size, max_queue_size)
+        self.counters = {"enqueued": 0, "exported": 0, "dropped": 0, "export_failures": 0, "batches": 0}
+        self._queue: Deque[ReadableSpan] = collections.deque()
+        self._condition = threading.Condition()
+        self._exporting = False
+        self._flush_requested = False
+        self._shutdown = False
+        self._worker = threading.Thread(target=self._run, name="otel-span-export", daemon=True)
+        self._worker.start()
+
+    def on_start(self, span: Span, parent_context: Optional[Context] = None) -> None:
+        pass
+
+    def on_end(self, span: ReadableSpan) -> None:
+        if not span.context.trace_flags.sampled:
+            return
+        with self._condition:
+            if self._shutdown:
+                return
+            if len(self._queue) >= self.max_queue_size:
+                self.counters["dropped"] += 1
+                return
+            self._queue.append(span)
+            self.counters["enqueued"] += 1
+            if len(self._queue) >= self.max_export_batch_size:
+                self._condition.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        """Export counters plus the current queue depth."""
+        with self._condition:
+            return {**self.counters, "queued": len(self._queue), "max_queue_size": self.max_queue_size}
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        deadline = time.monotonic() + timeout_millis / 1000
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            while self._queue or self._exporting:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._worker.is_alive():
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def shutdown(self) -> None:
+        with self._condition:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            self._condition.notify_all()
+        self._worker.join()
+        self.exporter.shutdown()
+        logger.info(f"Span export shut down: {self.stats()}")
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not (self._shutdown or self._flush_requested or len(self._queue) >= self.max_export_batch_size):
+                    self._condition.wait(self.schedule_delay)
+                if self._shutdown and not self._queue:
+                    return
+                self._flush_requested = False
+                self._exporting = True
+
+            # Drain everything queued so far, one batch at a time
+            while True:
+                with self._condition:
+                    batch = [
+                        self._queue.popleft()
+                        for _ in range(min(len(self._queue), self.max_export_batch_size))
+                    ]
+                if not batch:
+                    break
+                self._export(batch)
+
+            with self._condition:
+                self._exporting = False
+                self._condition.notify_all()
+
+    def _export(self, batch: Sequence[ReadableSpan]):
+        try:
+            result = self.exporter.export(batch)
+        except Exception as e:
+            logger.warning(f"Span export failed: {str(e)}")
+            result = SpanExportResult.FAILURE
+        with self._condition:
+            self.counters["batches"] += 1
+            if result == SpanExportResult.SUCCESS:
+                self.counters["exported"] += len(batch)
+            else:
+                self.counters["export_failures"] += len(batch)
+
+
+def create_span_exporter(api_endpoint: str, headers: Dict[str, str]) -> SpanExporter:
+    """OTLP exporter for ``api_endpoint``, using the same protocol rule as Traceloop."""
+    if "http" in api_endpoint.lower():
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(endpoint=f"{api_endpoint}/v1/traces", headers=headers)
+
+    from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    return OTLPSpanExporter(endpoint=api_endpoint, headers=headers)
+
+
+_span_processor: Optional[BoundedBatchSpanProcessor] = None
+_initialized = False
+
+
+def init_tracing(app_name: str, api_endpoint: Optional[str], headers: Dict[str, str]) -> Optional[BoundedBatchSpanProcessor]:
+    """
+    Initialize Traceloop once per process.
+
+    OTEL_EXPORT_MODE selects the export path: "batch" (default) queues spans
+    in a BoundedBatchSpanProcessor sized by the standard OTEL_BSP_MAX_QUEUE_SIZE,
+    OTEL_BSP_SCHEDULE_DELAY (ms) and OTEL_BSP_MAX_EXPORT_BATCH_SIZE variables and
+    flushes it at exit; "simple" exports every span synchronously.
+    """
+    global _span_processor, _initialized
+    if _initialized:
+        return _span_processor
+
+    mode = os.getenv("OTEL_EXPORT_MODE", "batch").lower()
+    if mode == "simple" or not api_endpoint:
+        Traceloop.init(app_name=app_name, api_endpoint=api_endpoint, headers=headers, disable_batch=True)
+    else:
+        _span_processor = BoundedBatchSpanProcessor(
+            create_span_exporter(api_endpoint, headers),
+            max_queue_size=int(os.getenv("OTEL_BSP_MAX_QUEUE_SIZE", "2048")),
+            schedule_delay_millis=float(os.getenv("OTEL_BSP_SCHEDULE_DELAY", "5000")),
+            max_export_batch_size=int(os.getenv("OTEL_BSP_MAX_EXPORT_BATCH_SIZE", "512")),
+        )
+        Traceloop.init(app_name=app_name, api_endpoint=api_endpoint, headers=headers, processor=_span_processor)
+        atexit.register(shutdown_tracing)
+
+    _initialized = True
+    logger.info(f"Tracing initialized for {app_name} with '{mode}' span export")
+    return _span_processor
+
+
+def get_export_stats() -> Dict[str, int]:
+    """Counters of the batching processor, or an empty dict in "simple" mode."""
+    return _span_processor.stats() if _span_processor else {}
+
+
+def shutdown_tracing():
+    """Flush queued spans and stop the export worker."""
+    if _span_processor:
+        _span_processor.force_flush()
+        _span_processor.shutdown()
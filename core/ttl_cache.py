@@ -0,0 +1,138 @@
+"""TTL cache with an optional on-disk copy and hit/miss counters."""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+from core.logging_config import setup_logging
+
+logger = setup_logging()
+
+
+class TTLCache:
+    """
+    Thread-safe cache whose entries expire ``ttl_seconds`` after they are set.
+
+    With ``cache_dir`` set, entries are also written there as JSON, so values
+    must be JSON-serializable and survive a restart until they expire.
+    ``get_or_compute`` runs the loader once per key even when several callers
+    miss at the same time.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float,
+        maxsize: int = 256,
+        cache_dir: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.clock = clock
+        self.counters = {"hits": 0, "misses": 0, "disk_hits": 0}
+        self._entries: Dict[str, tuple] = {}  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the live value for ``key`` or None, counting a hit or miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and self.clock() - entry[0] < self.ttl_seconds:
+                self.counters["hits"] += 1
+                return entry[1]
+            self._entries.pop(key, None)
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["hits"] += 1
+            self.counters["disk_hits"] += 1
+            self._store(key, entry)
+            return entry[1]
+
+    def set(self, key: str, value: Any):
+        entry = (self.clock(), value)
+        with self._lock:
+            self._store(key, entry)
+        self._write_disk(key, entry)
+
+    def get_or_compute(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for ``key``, calling ``loader`` on a miss."""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another caller may have loaded it while we waited
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and self.clock() - entry[0] < self.ttl_seconds:
+                    return entry[1]
+            value = loader()
+            self.set(key, value)
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters, hit rate and the number of entries in memory."""
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+    def clear(self):
+        """Drop all entries in memory and on disk and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.counters = dict.fromkeys(self.counters, 0)
+        if self.cache_dir and self.cache_dir.exists():
+            for path in self.cache_dir.glob("*.json"):
+                path.unlink(missing_ok=True)
+
+    def _store(self, key: str, entry: tuple):
+        self._entries.pop(key, None)
+        self._entries[key] = entry
+        while len(self._entries) > self.maxsize:
+            del self._entries[next(iter(self._entries))]
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / (hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + ".json")
+
+    def _read_disk(self, key: str) -> Optional[tuple]:
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache entry {path}: {str(e)}")
+            return None
+        if data.get("key") != key or self.clock() - data["stored_at"] >= self.ttl_seconds:
+            return None
+        return data["stored_at"], data["value"]
+
+    def _write_disk(self, key: str, entry: tuple):
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps({"key": key, "stored_at": entry[0], "value": entry[1]}), encoding="utf-8")
+            os.replace(tmp_path, path)
+        except (OSError, TypeError) as e:
+            logger.warning(f"Could not persist cache entry to {path}: {str(e)}")
@@ -2,7 +2,6 @@
 import streamlit as st
 import asyncio
 from typing import Optional, Dict, Any
-import time
 
 # Local imports
 from config.settings import load_config, validate_config
@@ -18,7 +17,7 @@ from agents.improved_fundamental_agent import FundamentalAgent
 from agents.technical_agent import technical_agent
 from agents.humorous_news_agent import humorous_news_agent
 from agents.supervisor_agent import supervisor_agent
-from utils.utils import astream_graph
+from utils.utils import astream_graph, StreamMetrics
 from langchain_core.messages import HumanMessage
 from langchain_core.runnables import RunnableConfig
 
@@ -39,7 +38,6 @@ class FinancialAgentApp:
     def __init__(self):
         self.api_config, self.app_config = load_config()
         self.supervisor = None
-        self.metrics = {}
     
     def validate_configuration(self) -> bool:
         """Validate application configuration."""
@@ -86,7 +84,7 @@ class FinancialAgentApp:
     
     async def process_query(self, query: str) -> Dict[str, Any]:
         """Process user query with metrics tracking."""
-        start_time = time.time()
+        stream_metrics = StreamMetrics("supervisor")
         
         try:
             if not st.session_state.get("session_initialized"):
@@ -98,37 +96,53 @@ class FinancialAgentApp:
                 tool_placeholder = st.empty()
                 
                 # Process query
-                response = await astream_graph(
-                    st.session_state.agent,
-                    {"messages": [HumanMessage(content=query)]},
-                    callback=self._create_streaming_callback(text_placeholder, tool_placeholder),
-                    config=RunnableConfig(
-                        recursion_limit=st.session_state.recursion_limit,
-                        thread_id=st.session_state.thread_id,
+                response = await asyncio.wait_for(
+                    astream_graph(
+                        st.session_state.agent,
+                        {"messages": [HumanMessage(content=query)]},
+                        callback=self._create_streaming_callback(text_placeholder, tool_placeholder),
+                        config=RunnableConfig(
+                            recursion_limit=st.session_state.recursion_limit,
+                            thread_id=st.session_state.thread_id,
+                        ),
+                        metrics=stream_metrics,
                     ),
+                    timeout=st.session_state.timeout_seconds,
                 )
                 
-                # Calculate metrics
-                end_time = time.time()
-                self.metrics = {
-                    "response_time": end_time - start_time,
-                    "tools_used": 1,  # Simplified
-                    "agents_used": 1,  # Simplified
-                    "success_rate": 1.0
-                }
-                
+                self._record_metrics(stream_metrics, success=True)
                 return {"success": True, "response": response}
                 
         except asyncio.TimeoutError:
             error_msg = f"Request timed out after {st.session_state.timeout_seconds} seconds"
             logger.error(error_msg)
+            self._record_metrics(stream_metrics, success=False)
             return {"success": False, "error": error_msg}
             
         except Exception as e:
             error_msg = f"Query processing failed: {str(e)}"
             logger.error(error_msg)
+            self._record_metrics(stream_metrics, success=False)
             return {"success": False, "error": error_msg}
     
+    def _record_metrics(self, stream_metrics: StreamMetrics, success: bool):
+        """Keep the last query's stream metrics in the session so they survive st.rerun()."""
+        summary = stream_metrics.finish()
+        queries = st.session_state.get("queries_processed", 0) + 1
+        succeeded = st.session_state.get("queries_succeeded", 0) + success
+        st.session_state.queries_processed = queries
+        st.session_state.queries_succeeded = succeeded
+        st.session_state.metrics = {
+            "response_time": summary["duration_s"],
+            "ttft": summary["ttft_s"],
+            "tools_used": summary["tool_calls"],
+            "agents_used": len(summary["agents"]),
+            "input_tokens": summary["input_tokens"],
+            "output_tokens": summary["output_tokens"],
+            "nodes": summary["nodes"],
+            "success_rate": succeeded / queries,
+        }
+    
     def _create_streaming_callback(self, text_placeholder, tool_placeholder):
         """Create streaming callback for real-time updates."""
         accumulated_text = []
@@ -217,7 +231,7 @@ class FinancialAgentApp:
         
         with col2:
             # Metrics dashboard
-            render_metrics_dashboard(self.metrics)
+            render_metrics_dashboard(st.session_state.get("metrics"))
             
             # System status
             st.subheader("🔧 System Status")
@@ -4,20 +4,22 @@ import os
 # from utils.pretty_print import pretty_print_messages
 # from utils.get_pretty import get_pretty_messages
 from dotenv import load_dotenv
-from agents.news_agent import news_agent
-from agents.fundamental_agent import fundamental_agent
-from agents.supervisor_agent import supervisor_agent
-from agents.technical_agent import technical_agent
-from agents.humorous_news_agent import humorous_news_agent
-from agents.insurance_agent import insurance_agent
-from traceloop.sdk import Traceloop
+from agents.registry import agent_registry
+from agents.router import create_intent_router
+from api.client import astream_chat
+from core.history_compaction import get_history_compactor, routed_agent_input
+from core.http_clients import get_pool_stats
+from core.logging_config import setup_logging
+from core.response_cache import create_response_cache, lookup_or_miss, store_quietly
+from core.telemetry import init_tracing, get_export_stats
 import streamlit as st
 from langchain_core.messages import HumanMessage
 from langchain_core.messages.ai import AIMessageChunk
-from utils.utils import astream_graph, random_uuid
+from utils.utils import append_turn, astream_graph, random_uuid, thread_has_history, BudgetExceeded, HistoryView, QueryBudget, RenderBuffer
 from langchain_core.runnables import RunnableConfig
 from langchain_core.messages.tool import ToolMessage
 import asyncio
+import time
 
 # Add these imports for console tracing
 from opentelemetry import trace
@@ -73,12 +75,11 @@ if CONSOLE_TRACES_ENABLED:
 # Add at line number 22
 headers = { "Authorization": "Api-Token " + os.environ.get("DYNATRACE_API_TOKEN") }
 
-# Initialize Traceloop with console tracing support
-Traceloop.init(
+# Initialize Traceloop once per process with batched span export (see OTEL_EXPORT_MODE)
+init_tracing(
     app_name=os.environ.get("OTEL_SERVICE_NAME", "CustomerAIAgent"),
     api_endpoint=os.environ.get("DYNATRACE_EXPORTER_OTLP_ENDPOINT"),
     headers=headers,
-    disable_batch=True
 )
 
 # Add console tracing if enabled
@@ -111,6 +112,10 @@ if "session_initialized" not in st.session_state:
 
     st.session_state.recursion_limit = 100  # Recursion call limit, default 100
 
+if "history_view" not in st.session_state:
+    # Renders only the newest HISTORY_PAGE_SIZE turns, with markdown cached per message
+    st.session_state.history_view = HistoryView()
+
 if "thread_id" not in st.session_state:
     st.session_state.thread_id = random_uuid()
 
@@ -120,12 +125,107 @@ def _set_if_undefined(var: str):
 
 _set_if_undefined("OPENAI_API_KEY")
 
-news_agent = news_agent()
-fundamental_agent = fundamental_agent()
-technical_agent = technical_agent()
-humorous_news_agent = humorous_news_agent()
-insurance_agent = insurance_agent()
-supervisor: supervisor_agent = supervisor_agent(news_agent, fundamental_agent, technical_agent, humorous_news_agent, insurance_agent).compile()
+@st.cache_resource(show_spinner="🔄 Initializing AI agents...")
+def load_supervisor():
+  """
+  Builds the agents and compiles the supervisor graph once per process.
+
+  Streamlit re-executes this script on every interaction; the resource cache
+  shares the same compiled graph (and its vector stores) across reruns and sessions.
+  """
+  return agent_registry.get_supervisor()
+
+# With CHAT_API_URL set the UI is a thin client of the chat service (api/server.py),
+# which owns the supervisor, routing and response cache
+CHAT_API_URL = os.getenv("CHAT_API_URL")
+
+supervisor = load_supervisor() if not CHAT_API_URL else None
+
+# "on" sends obvious queries straight to a sub-agent, "shadow" only measures
+# what the router would have done, "off" always uses the supervisor
+ROUTER_MODE = os.getenv("ROUTER_MODE", "on").lower()
+
+@st.cache_resource
+def load_router():
+  """Shares one intent router (and its metrics) across reruns and sessions."""
+  return create_intent_router()
+
+intent_router = load_router()
+
+@st.cache_resource
+def load_response_cache():
+  """Shares one response cache (None when RESPONSE_CACHE=off) across reruns and sessions."""
+  return create_response_cache()
+
+response_cache = load_response_cache() if not CHAT_API_URL else None
+
+with st.sidebar.expander("⏱️ Agent Build Timings", expanded=False):
+  for component, seconds in agent_registry.timings.items():
+    st.write(f"**{component}:** {seconds:.2f}s")
+
+with st.sidebar.expander("📡 Span Export", expanded=False):
+  export_stats = get_export_stats()
+  if export_stats:
+    for counter, value in export_stats.items():
+      st.write(f"**{counter}:** {value}")
+  else:
+    st.write("Synchronous export (OTEL_EXPORT_MODE=simple)")
+
+with st.sidebar.expander("🔌 HTTP Pool", expanded=False):
+  for metric, value in get_pool_stats().items():
+    st.write(f"**{metric}:** {value:.3f}" if isinstance(value, float) else f"**{metric}:** {value}")
+
+with st.sidebar.expander("🧭 Query Routing", expanded=False):
+  st.write(f"**mode:** {ROUTER_MODE}")
+  for metric, value in intent_router.stats().items():
+    st.write(f"**{metric}:** {value:.3f}" if isinstance(value, float) else f"**{metric}:** {value}")
+
+with st.sidebar.expander("📊 Last Query", expanded=False):
+  stream_metrics = st.session_state.get("stream_metrics")
+  if stream_metrics:
+    ttft = stream_metrics["ttft_s"]
+    st.write(f"**time to first token:** {ttft:.2f}s" if ttft is not None else "**time to first token:** –")
+    st.write(f"**total:** {stream_metrics['duration_s']:.2f}s")
+    st.write(f"**tool calls:** {stream_metrics['tool_calls']}  **handoffs:** {stream_metrics['handoffs']}")
+    st.write(f"**tokens in / out:** {stream_metrics['input_tokens']} / {stream_metrics['output_tokens']}")
+    query_budget = QueryBudget()
+    st.write(f"**budget:** {query_budget.max_tokens or '∞'} tokens, {f'{query_budget.max_seconds:g}s' if query_budget.max_seconds else 'no time limit'}")
+    for label, node in sorted(stream_metrics["nodes"].items(), key=lambda item: item[1]["wall_s"], reverse=True):
+      st.write(f"- {label}: {node['wall_s']:.2f}s, {node['output_tokens']} tokens, {node['tool_calls']} tools")
+    render_stats = st.session_state.get("render_stats")
+    if render_stats:
+      st.write(f"**render frames:** {render_stats['frames_sent']} for {render_stats['chunks_received']} chunks")
+  else:
+    st.write("No query yet")
+
+with st.sidebar.expander("🗜️ History Compaction", expanded=False):
+  history_compactor = get_history_compactor()
+  if history_compactor is not None and not CHAT_API_URL:
+    for metric, value in history_compactor.stats().items():
+      st.write(f"**{metric}:** {value:.3f}" if isinstance(value, float) else f"**{metric}:** {value}")
+  elif CHAT_API_URL:
+    st.write(f"Handled by the chat service at {CHAT_API_URL}")
+  else:
+    st.write("Disabled (HISTORY_COMPACTION=off)")
+
+with st.sidebar.expander("🧠 Conversation Memory", expanded=False):
+  checkpointer = agent_registry.checkpointer
+  if checkpointer is not None and hasattr(checkpointer, "stats"):
+    for metric, value in checkpointer.stats().items():
+      st.write(f"**{metric}:** {value}")
+  elif CHAT_API_URL:
+    st.write(f"Handled by the chat service at {CHAT_API_URL}")
+  else:
+    st.write("Unbounded (CHECKPOINTER=memory)")
+
+with st.sidebar.expander("🗃️ Response Cache", expanded=False):
+  if response_cache is not None:
+    for metric, value in response_cache.stats().items():
+      st.write(f"**{metric}:** {value:.3f}" if isinstance(value, float) else f"**{metric}:** {value}")
+  elif CHAT_API_URL:
+    st.write(f"Handled by the chat service at {CHAT_API_URL}")
+  else:
+    st.write("Disabled (RESPONSE_CACHE=off)")
 
 def print_message():
   """
@@ -133,34 +233,28 @@ def print_message():
 
   Distinguishes between user and assistant messages on the screen,
   and displays tool call information within the assistant message container.
+  Only the newest turns are drawn; a button above them loads older ones.
   """
-  i = 0
-  while i < len(st.session_state.history):
-    message = st.session_state.history[i]
-
-    if message["role"] == "user":
-      st.chat_message("user", avatar="🧑‍💻").markdown(message["content"])
-      i += 1
-    elif message["role"] == "assistant":
+  def draw_block(block):
+    if block["role"] == "user":
+      st.chat_message("user", avatar="🧑‍💻").markdown(block["markdown"])
+    else:
       # Create assistant message container
       with st.chat_message("assistant", avatar="🤖"):
-        # Display assistant message content
-        st.markdown(message["content"])
-
-        # Check if the next message is tool call information
-        if (
-          i + 1 < len(st.session_state.history)
-          and st.session_state.history[i + 1]["role"] == "assistant_tool"
-        ):
-          # Display tool call information in the same container as an expander
+        st.markdown(block["markdown"])
+        # Display tool call information in the same container as an expander
+        if block["tool"] is not None:
           with st.expander("🔧 Tool Call Information", expanded=False):
-            st.markdown(st.session_state.history[i + 1]["content"])
-          i += 2  # Increment by 2 as we processed two messages together
-        else:
-          i += 1  # Increment by 1 as we only processed a regular message
-    else:
-      # Skip assistant_tool messages as they are handled above
-      i += 1
+            st.markdown(block["tool"])
+
+  def draw_load_older(hidden):
+    st.button(
+      f"⬆️ Load older messages ({hidden} more turns)",
+      on_click=st.session_state.history_view.load_older,
+      use_container_width=True,
+    )
+
+  st.session_state.history_view.render(st.session_state.history, draw_block, draw_load_older)
 
 async def initialize_session():
   """
@@ -187,14 +281,26 @@ def get_streaming_callback(text_placeholder, tool_placeholder):
 
   Returns:
       callback_func: Streaming callback function
-      accumulated_text: List to store accumulated text responses
-      accumulated_tool: List to store accumulated tool call information
+      text_buffer: RenderBuffer accumulating text responses
+      tool_buffer: RenderBuffer accumulating tool call information
   """
-  accumulated_text = []
-  accumulated_tool = []
+  tool_title = "🔧 Tool Call Information"
+
+  def render_tool(text):
+    with tool_placeholder.expander(tool_title, expanded=True):
+      st.markdown(text)
+
+  def append_tool(text, invalid=False):
+    # The expander title follows the latest tool call, so one invalid call doesn't mark the rest
+    nonlocal tool_title
+    tool_title = "🔧 Tool Call Information (Invalid)" if invalid else "🔧 Tool Call Information"
+    tool_buffer.append(text)
+
+  # Coalesce chunks into throttled frames instead of re-rendering per token
+  text_buffer = RenderBuffer(text_placeholder.markdown)
+  tool_buffer = RenderBuffer(render_tool)
 
   def callback_func(message: dict):
-    nonlocal accumulated_text, accumulated_tool
     message_content = message.get("content", None)
 
     # Add console logging for traces if enabled
@@ -215,8 +321,7 @@ def get_streaming_callback(text_placeholder, tool_placeholder):
         message_chunk = content[0]
         # Process text type
         if message_chunk["type"] == "text":
-          accumulated_text.append(message_chunk["text"])
-          text_placeholder.markdown("".join(accumulated_text))
+          text_buffer.append(message_chunk["text"])
           if CONSOLE_TRACES_ENABLED:
               text_trace = f"🔍 TRACE: Text chunk: {message_chunk['text']}"
               print(text_trace)
@@ -224,17 +329,13 @@ def get_streaming_callback(text_placeholder, tool_placeholder):
         # Process tool use type
         elif message_chunk["type"] == "tool_use":
           if "partial_json" in message_chunk:
-            accumulated_tool.append(message_chunk["partial_json"])
+            append_tool(message_chunk["partial_json"])
           else:
             tool_call_chunks = message_content.tool_call_chunks
             tool_call_chunk = tool_call_chunks[0]
-            accumulated_tool.append(
+            append_tool(
               "\n```json\n" + str(tool_call_chunk) + "\n```\n"
             )
-          with tool_placeholder.expander(
-            "🔧 Tool Call Information", expanded=True
-          ):
-            st.markdown("".join(accumulated_tool))
           if CONSOLE_TRACES_ENABLED:
               tool_trace = f"🔍 TRACE: Tool use: {message_chunk}"
               print(tool_trace)
@@ -246,19 +347,14 @@ def get_streaming_callback(text_placeholder, tool_placeholder):
         and len(message_content.tool_calls[0]["name"]) > 0
       ):
         tool_call_info = message_content.tool_calls[0]
-        accumulated_tool.append("\n```json\n" + str(tool_call_info) + "\n```\n")
-        with tool_placeholder.expander(
-          "🔧 Tool Call Information", expanded=True
-        ):
-          st.markdown("".join(accumulated_tool))
+        append_tool("\n```json\n" + str(tool_call_info) + "\n```\n")
         if CONSOLE_TRACES_ENABLED:
             tool_call_trace = f"🔍 TRACE: Tool call: {tool_call_info}"
             print(tool_call_trace)
             logging.info(tool_call_trace)
       # Process if content is a simple string
       elif isinstance(content, str):
-        accumulated_text.append(content)
-        text_placeholder.markdown("".join(accumulated_text))
+        text_buffer.append(content)
         if CONSOLE_TRACES_ENABLED:
             string_trace = f"🔍 TRACE: String content: {content}"
             print(string_trace)
@@ -269,11 +365,7 @@ def get_streaming_callback(text_placeholder, tool_placeholder):
         and message_content.invalid_tool_calls
       ):
         tool_call_info = message_content.invalid_tool_calls[0]
-        accumulated_tool.append("\n```json\n" + str(tool_call_info) + "\n```\n")
-        with tool_placeholder.expander(
-          "🔧 Tool Call Information (Invalid)", expanded=True
-        ):
-          st.markdown("".join(accumulated_tool))
+        append_tool("\n```json\n" + str(tool_call_info) + "\n```\n", invalid=True)
         if CONSOLE_TRACES_ENABLED:
             invalid_trace = f"🔍 TRACE: Invalid tool call: {tool_call_info}"
             print(invalid_trace)
@@ -284,13 +376,9 @@ def get_streaming_callback(text_placeholder, tool_placeholder):
         and message_content.tool_call_chunks
       ):
         tool_call_chunk = message_content.tool_call_chunks[0]
-        accumulated_tool.append(
+        append_tool(
           "\n```json\n" + str(tool_call_chunk) + "\n```\n"
         )
-        with tool_placeholder.expander(
-          "🔧 Tool Call Information", expanded=True
-        ):
-          st.markdown("".join(accumulated_tool))
         if CONSOLE_TRACES_ENABLED:
             chunk_trace = f"🔍 TRACE: Tool call chunk: {tool_call_chunk}"
             print(chunk_trace)
@@ -301,29 +389,23 @@ def get_streaming_callback(text_placeholder, tool_placeholder):
         and "tool_calls" in message_content.additional_kwargs
       ):
         tool_call_info = message_content.additional_kwargs["tool_calls"][0]
-        accumulated_tool.append("\n```json\n" + str(tool_call_info) + "\n```\n")
-        with tool_placeholder.expander(
-          "🔧 Tool Call Information", expanded=True
-        ):
-          st.markdown("".join(accumulated_tool))
+        append_tool("\n```json\n" + str(tool_call_info) + "\n```\n")
         if CONSOLE_TRACES_ENABLED:
             kwargs_trace = f"🔍 TRACE: Tool call from additional_kwargs: {tool_call_info}"
             print(kwargs_trace)
             logging.info(kwargs_trace)
     # Process if it's a tool message (tool response)
     elif isinstance(message_content, ToolMessage):
-      accumulated_tool.append(
+      append_tool(
         "\n```json\n" + str(message_content.content) + "\n```\n"
       )
-      with tool_placeholder.expander("🔧 Tool Call Information", expanded=True):
-        st.markdown("".join(accumulated_tool))
       if CONSOLE_TRACES_ENABLED:
           tool_msg_trace = f"🔍 TRACE: Tool message: {message_content.content}"
           print(tool_msg_trace)
           logging.info(tool_msg_trace)
     return None
 
-  return callback_func, accumulated_text, accumulated_tool
+  return callback_func, text_buffer, tool_buffer
 
 async def process_query(query, text_placeholder, tool_placeholder, timeout_seconds=60):
   """
@@ -344,6 +426,8 @@ async def process_query(query, text_placeholder, tool_placeholder, timeout_secon
       final_tool: Final tool call information
   """
   try:
+    if CHAT_API_URL:
+      return await process_query_remote(query, text_placeholder, tool_placeholder, timeout_seconds)
     if st.session_state.agent:
       if CONSOLE_TRACES_ENABLED:
           query_start = f"🔍 TRACE: Processing query: {query}"
@@ -351,19 +435,69 @@ async def process_query(query, text_placeholder, tool_placeholder, timeout_secon
           logging.info(query_start)
           print("=" * 60)
       
-      streaming_callback, accumulated_text_obj, accumulated_tool_obj = (
+      # Answer repeated opening questions without running any agent; a failing cache only costs the shortcut.
+      # The cache is shared by every session, so follow-ups ("tell me more") always go to the agents
+      cacheable = response_cache is not None and not await thread_has_history(st.session_state.agent, st.session_state.thread_id)
+      cache_lookup = lookup_or_miss(response_cache, query) if cacheable else None
+      if cache_lookup is not None and cache_lookup.response is not None:
+        cached = cache_lookup.response
+        text_placeholder.markdown(cached.text)
+        if cached.tool_text:
+          with tool_placeholder.expander("🔧 Tool Call Information", expanded=False):
+            st.markdown(cached.tool_text)
+        # Keep the served turn in the conversation memory so follow-ups can refer to it
+        await remember_turn(query, cached.text, cached.agent)
+        return (
+          {"node": "response_cache", "agent": cached.agent, "similarity": cache_lookup.similarity},
+          cached.text,
+          cached.tool_text,
+        )
+
+      streaming_callback, text_buffer, tool_buffer = (
         get_streaming_callback(text_placeholder, tool_placeholder)
       )
+
+      # Send high-confidence queries straight to a sub-agent, skipping the supervisor LLM
+      graph = st.session_state.agent
+      inputs = {"messages": [HumanMessage(content=query)]}
+      decision = None
+      if ROUTER_MODE in ("on", "shadow"):
+        decision = intent_router.route(query)
+        if ROUTER_MODE == "on" and decision.agent:
+          graph = agent_registry.agents[decision.agent]
+          # The sub-agent has no memory of its own: hand it the conversation so far
+          inputs = await routed_agent_input(st.session_state.agent, st.session_state.thread_id, query)
+
+      query_start = time.perf_counter()
+      # The agent that answered decides how long a cached copy stays fresh
+      answering_agent = decision.agent if decision is not None and graph is not st.session_state.agent else None
+
+      def routed_callback(message: dict):
+        # The supervisor's first handoff tells us how long its routing took
+        nonlocal answering_agent
+        content = message.get("content")
+        if (
+          answering_agent is None
+          and isinstance(content, ToolMessage)
+          and (content.name or "").startswith("transfer_to_")
+        ):
+          answering_agent = content.name[len("transfer_to_"):]
+          if decision is not None:
+            intent_router.record_handoff(decision, answering_agent, time.perf_counter() - query_start)
+        return streaming_callback(message)
+
       try:
         response = await asyncio.wait_for(
           astream_graph(
-            st.session_state.agent,
-            {"messages": [HumanMessage(content=query)]},
-            callback=streaming_callback,
+            graph,
+            inputs,
+            callback=routed_callback,
             config=RunnableConfig(
               recursion_limit=st.session_state.recursion_limit,
               thread_id=st.session_state.thread_id,
             ),
+            # Token and wall-clock limits (QUERY_MAX_TOKENS / QUERY_MAX_SECONDS) that cancel a runaway query
+            budget=QueryBudget(),
           ),
           timeout=timeout_seconds,
         )
@@ -375,15 +509,46 @@ async def process_query(query, text_placeholder, tool_placeholder, timeout_secon
             print("=" * 60)
             
       except asyncio.TimeoutError:
+        text_buffer.flush()
+        tool_buffer.flush()
         error_msg = f"⏱️ Request time exceeded {timeout_seconds} seconds. Please try again later."
         if CONSOLE_TRACES_ENABLED:
             timeout_trace = f"🔍 TRACE: Timeout error: {error_msg}"
             print(timeout_trace)
             logging.error(timeout_trace)
         return {"error": error_msg}, error_msg, ""
+      except BudgetExceeded as e:
+        text_buffer.flush()
+        tool_buffer.flush()
+        st.session_state.stream_metrics = e.metrics
+        error_msg = f"🛑 {e}. The query was stopped; try a narrower question."
+        if CONSOLE_TRACES_ENABLED:
+            budget_trace = f"🔍 TRACE: Budget exceeded: {error_msg}"
+            print(budget_trace)
+            logging.error(budget_trace)
+        return {"error": error_msg}, error_msg, ""
 
-      final_text = "".join(accumulated_text_obj)
-      final_tool = "".join(accumulated_tool_obj)
+      final_text = text_buffer.flush()
+      final_tool = tool_buffer.flush()
+      st.session_state.render_stats = text_buffer.stats()
+      st.session_state.stream_metrics = response.get("metrics")
+      if CONSOLE_TRACES_ENABLED:
+          render_trace = f"🔍 TRACE: Render frames sent: {text_buffer.frames_sent} for {text_buffer.chunks_received} chunks"
+          print(render_trace)
+          logging.info(render_trace)
+      if graph is not st.session_state.agent and final_text:
+        # A routed turn never ran the supervisor; add it to the thread so follow-ups keep their context
+        await remember_turn(query, final_text, answering_agent)
+      if cache_lookup is not None and final_text:
+        store_quietly(
+          response_cache,
+          query,
+          final_text,
+          tool_text=final_tool,
+          agent=answering_agent or "supervisor",
+          latency=time.perf_counter() - query_start,
+          vector=cache_lookup.vector,
+        )
       return response, final_text, final_tool
     else:
       return (
@@ -401,12 +566,58 @@ async def process_query(query, text_placeholder, tool_placeholder, timeout_secon
         logging.error(exception_trace)
     return {"error": error_msg}, error_msg, ""
 
+async def remember_turn(query, answer, agent):
+  """Writes a turn the supervisor did not run into the session's thread."""
+  try:
+    await append_turn(st.session_state.agent, st.session_state.thread_id, query, answer, name=agent)
+  except Exception as e:
+    setup_logging().error(f"Recording turn for thread {st.session_state.thread_id} failed: {str(e)}")
+
+async def process_query_remote(query, text_placeholder, tool_placeholder, timeout_seconds=60):
+  """
+  Streams the answer from the chat service at CHAT_API_URL.
+
+  Returns the same (response, final_text, final_tool) triple as process_query.
+  """
+  _, text_buffer, tool_buffer = get_streaming_callback(text_placeholder, tool_placeholder)
+  response = {}
+
+  async def consume():
+    nonlocal response
+    async for event, data in astream_chat(
+      CHAT_API_URL, query, thread_id=st.session_state.thread_id, timeout_seconds=timeout_seconds
+    ):
+      if event == "text":
+        text_buffer.append(data["content"])
+      elif event == "tool":
+        tool_buffer.append(data["content"])
+      elif event in ("done", "error"):
+        response = data
+
+  try:
+    await asyncio.wait_for(consume(), timeout=timeout_seconds)
+  except asyncio.TimeoutError:
+    response = {"error": f"⏱️ Request time exceeded {timeout_seconds} seconds. Please try again later."}
+  except Exception as e:
+    response = {"error": f"❌ Chat service request failed: {str(e)}"}
+
+  final_text = text_buffer.flush()
+  final_tool = tool_buffer.flush()
+  st.session_state.render_stats = text_buffer.stats()
+  if "error" in response:
+    return response, response["error"], ""
+  return response, final_text, final_tool
+
 success = st.session_state.event_loop.run_until_complete(
   initialize_session()
 )
 
 print_message()
 
+with st.sidebar.expander("🖼️ History Rendering", expanded=False):
+  for metric, value in st.session_state.history_view.stats().items():
+    st.write(f"**{metric}:** {value:.2f}" if isinstance(value, float) else f"**{metric}:** {value}")
+
 user_query = st.chat_input("💬 Ask about stocks, financial analysis, or insurance questions")
 if user_query:
   if st.session_state.session_initialized:
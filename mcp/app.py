@@ -7,32 +7,30 @@ from langchain.chat_models import init_chat_model
 from langgraph.prebuilt import tools_condition, ToolNode
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import AnyMessage, add_messages
-from langgraph.checkpoint.memory import MemorySaver
+from checkpointer import get_shared_checkpointer
+from mcp_pool import MCPConnectionPool, get_mcp_pool
 
-from langchain_mcp_adapters.tools import load_mcp_tools
-from langchain_mcp_adapters.prompts import load_mcp_prompt
 from langchain_mcp_adapters.client import MultiServerMCPClient
 import asyncio
 import streamlit as st
 from langchain_core.messages import HumanMessage
 from langchain_core.messages.ai import AIMessageChunk
-from utils import astream_graph, random_uuid
+from utils import astream_graph, random_uuid, RenderBuffer
 from langchain_core.runnables import RunnableConfig
 from langchain_core.messages.tool import ToolMessage
 from langgraph.prebuilt import create_react_agent
 from langchain_openai import ChatOpenAI
 import json
 import os
-from traceloop.sdk import Traceloop
+from telemetry import init_tracing
 
 load_dotenv()
 
 headers = { "Authorization": "Api-Token " + os.environ.get("DYNATRACE_API_TOKEN") }
-Traceloop.init(
+init_tracing(
     app_name="MCPAgent",
     api_endpoint=os.environ.get("DYNATRACE_EXPORTER_OTLP_ENDPOINT"),
     headers=headers,
-    disable_batch=True
 )
 # Create and reuse global event loop (create once and continue using)
 if "event_loop" not in st.session_state:
@@ -74,6 +72,10 @@ if "session_initialized" not in st.session_state:
 if "thread_id" not in st.session_state:
     st.session_state.thread_id = random_uuid()
 
+if "mcp_pool_owner" not in st.session_state:
+    # Holds this browser session's share of the process-wide MCP pool
+    st.session_state.mcp_pool_owner = random_uuid()
+
 SYSTEM_PROMPT = """<ROLE>
 You are a smart agent with an ability to use tools.
 You will be given a question and you will use the tools to answer the question.
@@ -126,18 +128,23 @@ OUTPUT_TOKEN_INFO = {
     "gpt-4o": {"max_tokens": 16000},
     "gpt-4o-mini": {"max_tokens": 16000},
 }
-async def create_graph(math_session, weather_session, dynatrace_session):
+async def create_graph(pool: MCPConnectionPool):
   llm = init_chat_model(model="gpt-4o-mini", temperature=0)
 
-  math_tools = await load_mcp_tools(math_session)
-  weather_tools = await load_mcp_tools(weather_session)
-  dynatrace_tools = await load_mcp_tools(dynatrace_session)
-  tools = math_tools + weather_tools + dynatrace_tools
+  # Discover every server's tools and the prompt concurrently; servers that
+  # are down or slow are skipped and reported by pool.health()
+  tools, system_prompt = await asyncio.gather(
+    pool.get_tools(),
+    pool.get_prompt("math", "system_prompt"),
+    return_exceptions=True,
+  )
+  if isinstance(tools, BaseException):
+    raise tools
   llm_with_tool = llm.bind_tools(tools)
 
-  system_prompt = await load_mcp_prompt(math_session, "system_prompt")
+  prompt_text = SYSTEM_PROMPT if isinstance(system_prompt, BaseException) else system_prompt[0].content
   prompt_template = ChatPromptTemplate.from_messages([
-    ("system", system_prompt[0].content),
+    ("system", prompt_text),
     MessagesPlaceholder("messages")
   ])
 
@@ -156,7 +163,7 @@ async def create_graph(math_session, weather_session, dynatrace_session):
   graph_builder.add_edge(START, "chat_node")
   graph_builder.add_conditional_edges("chat_node", tools_condition, {"tools": "tool_node", "__end__": END})
   graph_builder.add_edge("tool_node", "chat_node")
-  graph = graph_builder.compile(checkpointer=MemorySaver())
+  graph = graph_builder.compile(checkpointer=get_shared_checkpointer())
   return graph
 
 if "messages" not in st.session_state:
@@ -229,20 +236,12 @@ for msg in st.session_state.messages:
 
   async def cleanup_mcp_client():
     """
-    Safely terminates the existing MCP client.
+    Releases this session's reference to the MCP connection pool.
 
-    Properly releases resources if an existing client exists.
+    The pool and its server sessions are shared by every Streamlit session,
+    so they are left open for the others.
     """
-    if "mcp_client" in st.session_state and st.session_state.mcp_client is not None:
-      try:
-
-        await st.session_state.mcp_client.__aexit__(None, None, None)
-        st.session_state.mcp_client = None
-      except Exception as e:
-        import traceback
-
-        # st.warning(f"Error while terminating MCP client: {str(e)}")
-        # st.warning(traceback.format_exc())
+    st.session_state.mcp_client = None
 
 
   async def initialize_session(mcp_config=None):
@@ -262,11 +261,14 @@ for msg in st.session_state.messages:
       if mcp_config is None:
         # Load settings from config.json file
         mcp_config = load_config_from_json()
-      client = MultiServerMCPClient(mcp_config)
-      # await client.__aenter__()
-      tools = await client.get_tools()
+      # Warm sessions and cached tool listings are shared across Streamlit sessions
+      pool = get_mcp_pool(mcp_config, st.session_state.mcp_pool_owner)
+      tools = await pool.get_tools()
       st.session_state.tool_count = len(tools)
-      st.session_state.mcp_client = client
+      st.session_state.mcp_client = pool
+      for server, health in pool.health().items():
+        if health["status"] != "ok":
+          st.warning(f"⚠️ MCP server '{server}' unavailable: {health['error']}")
 
       # Initialize appropriate model based on selection
       selected_model = st.session_state.selected_model
@@ -278,7 +280,7 @@ for msg in st.session_state.messages:
       agent = create_react_agent(
         model,
         tools,
-        checkpointer=MemorySaver(),
+        checkpointer=get_shared_checkpointer(),
         prompt=SYSTEM_PROMPT,
       )
       st.session_state.agent = agent
@@ -335,14 +337,26 @@ def get_streaming_callback(text_placeholder, tool_placeholder):
 
   Returns:
       callback_func: Streaming callback function
-      accumulated_text: List to store accumulated text responses
-      accumulated_tool: List to store accumulated tool call information
+      text_buffer: RenderBuffer accumulating text responses
+      tool_buffer: RenderBuffer accumulating tool call information
   """
-  accumulated_text = []
-  accumulated_tool = []
+  tool_title = "🔧 Tool Call Information"
+
+  def render_tool(text):
+    with tool_placeholder.expander(tool_title, expanded=True):
+      st.markdown(text)
+
+  def append_tool(text, invalid=False):
+    # The expander title follows the latest tool call, so one invalid call doesn't mark the rest
+    nonlocal tool_title
+    tool_title = "🔧 Tool Call Information (Invalid)" if invalid else "🔧 Tool Call Information"
+    tool_buffer.append(text)
+
+  # Coalesce chunks into throttled frames instead of re-rendering per token
+  text_buffer = RenderBuffer(text_placeholder.markdown)
+  tool_buffer = RenderBuffer(render_tool)
 
   def callback_func(message: dict):
-    nonlocal accumulated_text, accumulated_tool
     message_content = message.get("content", None)
 
     if isinstance(message_content, AIMessageChunk):
@@ -352,22 +366,17 @@ def get_streaming_callback(text_placeholder, tool_placeholder):
         message_chunk = content[0]
         # Process text type
         if message_chunk["type"] == "text":
-          accumulated_text.append(message_chunk["text"])
-          text_placeholder.markdown("".join(accumulated_text))
+          text_buffer.append(message_chunk["text"])
         # Process tool use type
         elif message_chunk["type"] == "tool_use":
           if "partial_json" in message_chunk:
-            accumulated_tool.append(message_chunk["partial_json"])
+            append_tool(message_chunk["partial_json"])
           else:
             tool_call_chunks = message_content.tool_call_chunks
             tool_call_chunk = tool_call_chunks[0]
-            accumulated_tool.append(
+            append_tool(
               "\n```json\n" + str(tool_call_chunk) + "\n```\n"
             )
-          with tool_placeholder.expander(
-            "🔧 Tool Call Information", expanded=True
-          ):
-            st.markdown("".join(accumulated_tool))
       # Process if tool_calls attribute exists (mainly occurs in OpenAI models)
       elif (
         hasattr(message_content, "tool_calls")
@@ -375,60 +384,41 @@ def get_streaming_callback(text_placeholder, tool_placeholder):
         and len(message_content.tool_calls[0]["name"]) > 0
       ):
         tool_call_info = message_content.tool_calls[0]
-        accumulated_tool.append("\n```json\n" + str(tool_call_info) + "\n```\n")
-        with tool_placeholder.expander(
-          "🔧 Tool Call Information", expanded=True
-        ):
-          st.markdown("".join(accumulated_tool))
+        append_tool("\n```json\n" + str(tool_call_info) + "\n```\n")
       # Process if content is a simple string
       elif isinstance(content, str):
-        accumulated_text.append(content)
-        text_placeholder.markdown("".join(accumulated_text))
+        text_buffer.append(content)
       # Process if invalid tool call information exists
       elif (
         hasattr(message_content, "invalid_tool_calls")
         and message_content.invalid_tool_calls
       ):
         tool_call_info = message_content.invalid_tool_calls[0]
-        accumulated_tool.append("\n```json\n" + str(tool_call_info) + "\n```\n")
-        with tool_placeholder.expander(
-          "🔧 Tool Call Information (Invalid)", expanded=True
-        ):
-          st.markdown("".join(accumulated_tool))
+        append_tool("\n```json\n" + str(tool_call_info) + "\n```\n", invalid=True)
       # Process if tool_call_chunks attribute exists
       elif (
         hasattr(message_content, "tool_call_chunks")
         and message_content.tool_call_chunks
       ):
         tool_call_chunk = message_content.tool_call_chunks[0]
-        accumulated_tool.append(
+        append_tool(
           "\n```json\n" + str(tool_call_chunk) + "\n```\n"
         )
-        with tool_placeholder.expander(
-          "🔧 Tool Call Information", expanded=True
-        ):
-          st.markdown("".join(accumulated_tool))
       # Process if tool_calls exists in additional_kwargs (supports various model compatibility)
       elif (
         hasattr(message_content, "additional_kwargs")
         and "tool_calls" in message_content.additional_kwargs
       ):
         tool_call_info = message_content.additional_kwargs["tool_calls"][0]
-        accumulated_tool.append("\n```json\n" + str(tool_call_info) + "\n```\n")
-        with tool_placeholder.expander(
-          "🔧 Tool Call Information", expanded=True
-        ):
-          st.markdown("".join(accumulated_tool))
+        append_tool("\n```json\n" + str(tool_call_info) + "\n```\n")
     # Process if it's a tool message (tool response)
     elif isinstance(message_content, ToolMessage):
-      accumulated_tool.append(
+      append_tool(
         "\n```json\n" + str(message_content.content) + "\n```\n"
       )
-      with tool_placeholder.expander("🔧 Tool Call Information", expanded=True):
-        st.markdown("".join(accumulated_tool))
     return None
 
-  return callback_func, accumulated_text, accumulated_tool
+  return callback_func, text_buffer, tool_buffer
 
 
 async def process_query(query, text_placeholder, tool_placeholder, timeout_seconds=60):
@@ -451,7 +441,7 @@ async def process_query(query, text_placeholder, tool_placeholder, timeout_secon
   """
   try:
     if st.session_state.agent:
-      streaming_callback, accumulated_text_obj, accumulated_tool_obj = (
+      streaming_callback, text_buffer, tool_buffer = (
         get_streaming_callback(text_placeholder, tool_placeholder)
       )
       try:
@@ -468,11 +458,13 @@ async def process_query(query, text_placeholder, tool_placeholder, timeout_secon
           timeout=timeout_seconds,
         )
       except asyncio.TimeoutError:
+        text_buffer.flush()
+        tool_buffer.flush()
         error_msg = f"⏱️ Request time exceeded {timeout_seconds} seconds. Please try again later."
         return {"error": error_msg}, error_msg, ""
 
-      final_text = "".join(accumulated_text_obj)
-      final_tool = "".join(accumulated_tool_obj)
+      final_text = text_buffer.flush()
+      final_tool = tool_buffer.flush()
       return response, final_text, final_tool
     else:
       return (
@@ -0,0 +1,12 @@
+"""Bounded conversation checkpointer, shared with the main app (see core/checkpointer.py)."""
+import os
+import sys
+
+# The MCP app runs with this directory on sys.path; the implementation lives in the repository's core package
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
+from core.checkpointer import BoundedMemorySaver, create_checkpointer, get_shared_checkpointer  # noqa: E402
+
+__all__ = ["BoundedMemorySaver", "create_checkpointer", "get_shared_checkpointer"]
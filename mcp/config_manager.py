@@ -75,6 +75,9 @@ class ConfigManager:
                     "url": server_config["url"],
                     "transport": server_config.get("transport", "streamable_http")
                 }
+                # Optional per-server limit on connecting and listing tools at startup
+                if "discovery_timeout" in server_config:
+                    fixed_config[server_name]["discovery_timeout"] = float(server_config["discovery_timeout"])
         
         # Add missing default servers
         for server_name, server_config in self.default_config.items():
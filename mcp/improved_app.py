@@ -10,8 +10,7 @@ from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_mcp_adapters.client import MultiServerMCPClient
+from checkpointer import get_shared_checkpointer
 
 # Local imports
 from utils import astream_graph, random_uuid
@@ -21,19 +20,19 @@ from ui_components import (
 )
 from config_manager import ConfigManager
 from session_manager import MCPSessionManager
+from mcp_pool import get_mcp_pool
 
 load_dotenv()
 
 # Initialize tracing if configured
 try:
-    from traceloop.sdk import Traceloop
+    from telemetry import init_tracing
     if os.environ.get("DYNATRACE_API_TOKEN"):
         headers = {"Authorization": f"Api-Token {os.environ.get('DYNATRACE_API_TOKEN')}"}
-        Traceloop.init(
+        init_tracing(
             app_name="MCPAgent",
             api_endpoint=os.environ.get("DYNATRACE_EXPORTER_OTLP_ENDPOINT"),
             headers=headers,
-            disable_batch=True
         )
 except ImportError:
     st.warning("Traceloop not available. Tracing disabled.")
@@ -65,6 +64,7 @@ class MCPApplication:
             "selected_model": "gpt-4o-mini",
             "recursion_limit": 100,
             "thread_id": random_uuid(),
+            "mcp_pool_owner": random_uuid(),
             "event_loop": None,
             "tool_count": 0,
             "pending_mcp_config": self.config_manager.load_config()
@@ -95,12 +95,12 @@ class MCPApplication:
                     st.error("❌ Invalid MCP configuration")
                     return False
                 
-                # Initialize client
-                client = MultiServerMCPClient(mcp_config)
-                tools = await client.get_tools()
+                # Shared pool: warm sessions and cached tool listings
+                pool = get_mcp_pool(mcp_config, st.session_state.mcp_pool_owner)
+                tools = await pool.get_tools()
                 
                 st.session_state.tool_count = len(tools)
-                st.session_state.mcp_client = client
+                st.session_state.mcp_client = pool
                 
                 # Initialize model
                 model = ChatOpenAI(
@@ -113,14 +113,19 @@ class MCPApplication:
                 agent = create_react_agent(
                     model,
                     tools,
-                    checkpointer=MemorySaver(),
+                    checkpointer=get_shared_checkpointer(),
                     prompt=self._get_system_prompt(),
                 )
                 
                 st.session_state.agent = agent
                 st.session_state.session_initialized = True
                 
-                st.success(f"✅ Connected to {len(tools)} tools across MCP servers")
+                health = pool.health()
+                for server, server_health in health.items():
+                    if server_health["status"] != "ok":
+                        st.warning(f"⚠️ {server} unavailable: {server_health['error']}")
+                online = sum(server_health["status"] == "ok" for server_health in health.values())
+                st.success(f"✅ Connected to {len(tools)} tools across {online}/{len(health)} MCP servers")
                 return True
                 
         except Exception as e:
@@ -164,7 +169,7 @@ Remember: Only use the tools provided. Do not make up information.
                 text_placeholder = st.empty()
                 tool_placeholder = st.empty()
                 
-                streaming_callback, accumulated_text, accumulated_tool = (
+                streaming_callback, text_buffer, tool_buffer = (
                     get_streaming_callback(text_placeholder, tool_placeholder)
                 )
                 
@@ -181,11 +186,14 @@ Remember: Only use the tools provided. Do not make up information.
                     timeout=st.session_state.timeout_seconds,
                 )
                 
+                final_text = text_buffer.flush()
+                final_tool = tool_buffer.flush()
+                st.session_state.render_stats = text_buffer.stats()
                 return {
                     "success": True,
                     "response": response,
-                    "final_text": "".join(accumulated_text),
-                    "final_tool": "".join(accumulated_tool)
+                    "final_text": final_text,
+                    "final_tool": final_tool,
                 }
                 
         except asyncio.TimeoutError:
@@ -1,7 +1,11 @@
 """Improved math MCP server with enhanced functionality."""
 from mcp.server.fastmcp import FastMCP
+import ast
+import inspect
 import math
-from typing import Union
+import operator
+from typing import Dict, List, Optional, Union
+import numpy as np
 
 mcp = FastMCP("Math", description="Advanced mathematical operations server")
 
@@ -12,10 +16,12 @@ def math_help_prompt() -> str:
     return """
 You are a mathematical assistant with access to advanced calculation tools.
 Available operations:
+- Whole expressions in one call with evaluate, e.g. "(25*47) + sqrt(144)/3"
 - Basic arithmetic (add, subtract, multiply, divide)
 - Advanced functions (power, square root, logarithms)
 - Trigonometric functions (sin, cos, tan)
-- Statistical calculations (mean, median, standard deviation)
+- Statistical calculations on whole arrays in one call (mean, median, standard
+  deviation, variance, percentiles, rolling windows, correlation)
 
 Provide step-by-step solutions when possible.
 """
@@ -26,6 +32,8 @@ def system_prompt() -> str:
     return """
 You are an AI assistant specialized in mathematical calculations.
 Use the available tools for accurate computations and show your work.
+For arithmetic with more than one step, call evaluate once with the whole
+expression (or a list of expressions) instead of chaining single operations.
 """
 
 # Resources
@@ -122,24 +130,121 @@ def tan(x: float, degrees: bool = False) -> float:
         x = math.radians(x)
     return math.tan(x)
 
+def _as_array(numbers: List[float], name: str = "numbers") -> np.ndarray:
+    """Validate a numeric list and convert it to a float array."""
+    values = np.asarray(numbers, dtype=float)
+    if values.ndim != 1:
+        raise ValueError(f"'{name}' must be a flat list of numbers")
+    if values.size == 0:
+        raise ValueError(f"Cannot calculate statistics of empty list '{name}'")
+    if not np.isfinite(values).all():
+        raise ValueError(f"'{name}' contains NaN or infinite values")
+    return values
+
+def _std(values: np.ndarray, sample: bool) -> float:
+    if sample and values.size < 2:
+        raise ValueError("Sample standard deviation needs at least two numbers")
+    return float(values.std(ddof=1 if sample else 0))
+
+def _percentiles(values: np.ndarray, percentiles: List[float]) -> Dict[str, float]:
+    points = _as_array(percentiles, "percentiles")
+    if ((points < 0) | (points > 100)).any():
+        raise ValueError("Percentiles must be between 0 and 100")
+    return {f"p{point:g}": float(result) for point, result in zip(points, np.percentile(values, points))}
+
 @mcp.tool()
-def calculate_mean(numbers: list) -> float:
+def calculate_mean(numbers: List[float]) -> float:
     """Calculate arithmetic mean of a list of numbers"""
-    if not numbers:
-        raise ValueError("Cannot calculate mean of empty list")
-    return sum(numbers) / len(numbers)
+    return float(_as_array(numbers).mean())
 
 @mcp.tool()
-def calculate_median(numbers: list) -> float:
+def calculate_median(numbers: List[float]) -> float:
     """Calculate median of a list of numbers"""
-    if not numbers:
-        raise ValueError("Cannot calculate median of empty list")
-    sorted_numbers = sorted(numbers)
-    n = len(sorted_numbers)
-    if n % 2 == 0:
-        return (sorted_numbers[n//2 - 1] + sorted_numbers[n//2]) / 2
-    else:
-        return sorted_numbers[n//2]
+    return float(np.median(_as_array(numbers)))
+
+@mcp.tool()
+def calculate_std(numbers: List[float], sample: bool = True) -> float:
+    """Calculate standard deviation of a list of numbers (sample by default, set sample=False for population)"""
+    return _std(_as_array(numbers), sample)
+
+@mcp.tool()
+def calculate_variance(numbers: List[float], sample: bool = True) -> float:
+    """Calculate variance of a list of numbers (sample by default, set sample=False for population)"""
+    return _std(_as_array(numbers), sample) ** 2
+
+@mcp.tool()
+def calculate_percentiles(numbers: List[float], percentiles: List[float]) -> Dict[str, float]:
+    """Calculate the given percentiles (0-100) of a list of numbers, e.g. percentiles=[25, 50, 95]"""
+    return _percentiles(_as_array(numbers), percentiles)
+
+@mcp.tool()
+def calculate_statistics(numbers: List[float], percentiles: Optional[List[float]] = None) -> dict:
+    """
+    Summarize a list of numbers in one call: count, sum, mean, median, sample
+    standard deviation and variance, min, max and percentiles (default 25, 50, 75, 95)
+    """
+    values = _as_array(numbers)
+    std = _std(values, sample=True) if values.size > 1 else 0.0
+    return {
+        "count": int(values.size),
+        "sum": float(values.sum()),
+        "mean": float(values.mean()),
+        "median": float(np.median(values)),
+        "std": std,
+        "variance": std ** 2,
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "percentiles": _percentiles(values, percentiles if percentiles is not None else [25, 50, 75, 95]),
+    }
+
+ROLLING_STATISTICS = {
+    "mean": lambda windows: windows.mean(axis=1),
+    "median": lambda windows: np.median(windows, axis=1),
+    "std": lambda windows: windows.std(axis=1, ddof=1) if windows.shape[1] > 1 else np.zeros(len(windows)),
+    "min": lambda windows: windows.min(axis=1),
+    "max": lambda windows: windows.max(axis=1),
+    "sum": lambda windows: windows.sum(axis=1),
+}
+
+@mcp.tool()
+def rolling_statistics(numbers: List[float], window: int, statistic: str = "mean") -> List[float]:
+    """
+    Calculate a rolling statistic over a series (mean, median, std, min, max or sum).
+    Returns one value per full window, i.e. len(numbers) - window + 1 values.
+    """
+    values = _as_array(numbers)
+    if statistic not in ROLLING_STATISTICS:
+        raise ValueError(f"Unknown statistic '{statistic}', expected one of {sorted(ROLLING_STATISTICS)}")
+    if window < 1 or window > values.size:
+        raise ValueError(f"Window must be between 1 and the series length ({values.size})")
+    windows = np.lib.stride_tricks.sliding_window_view(values, window)
+    return ROLLING_STATISTICS[statistic](windows).tolist()
+
+@mcp.tool()
+def calculate_correlation(x: List[float], y: List[float], method: str = "pearson") -> float:
+    """Calculate the correlation of two equally long series (method "pearson" or "spearman")"""
+    a, b = _as_array(x, "x"), _as_array(y, "y")
+    if a.size != b.size:
+        raise ValueError("Series must have the same length")
+    if a.size < 2:
+        raise ValueError("Correlation needs at least two points")
+    if method == "spearman":
+        a, b = _ranks(a), _ranks(b)
+    elif method != "pearson":
+        raise ValueError("Method must be 'pearson' or 'spearman'")
+    if a.std() == 0 or b.std() == 0:
+        raise ValueError("Correlation is undefined for a constant series")
+    return float(np.corrcoef(a, b)[0, 1])
+
+def _ranks(values: np.ndarray) -> np.ndarray:
+    """Ranks starting at 1, with ties given their average rank."""
+    order = values.argsort(kind="mergesort")
+    ranks = np.empty(values.size)
+    ranks[order] = np.arange(1, values.size + 1)
+    _, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+    if counts.max() > 1:
+        ranks = (np.bincount(inverse, weights=ranks) / counts)[inverse]
+    return ranks
 
 @mcp.tool()
 def solve_quadratic(a: float, b: float, c: float) -> dict:
@@ -167,5 +272,141 @@ def solve_quadratic(a: float, b: float, c: float) -> dict:
             "type": "complex"
         }
 
+# Safe expression evaluation: only arithmetic, numbers, lists and the
+# functions below are allowed; anything else in the syntax tree is rejected
+EVALUATE_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+EVALUATE_FUNCTIONS = {
+    "add": add,
+    "subtract": subtract,
+    "multiply": multiply,
+    "divide": divide,
+    "power": power,
+    "square_root": square_root,
+    "sqrt": square_root,
+    "logarithm": logarithm,
+    "log": logarithm,
+    "factorial": factorial,
+    "sin": sin,
+    "cos": cos,
+    "tan": tan,
+    "abs": abs,
+    "round": round,
+    "min": min,
+    "max": max,
+    "mean": calculate_mean,
+    "median": calculate_median,
+    "std": calculate_std,
+    "variance": calculate_variance,
+}
+EVALUATE_CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau}
+MAX_EXPRESSION_LENGTH = 2000
+MAX_EXPONENT = 10000
+MAX_FACTORIAL = 1000
+MAX_INT_BITS = 10000
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError("Operators only apply to numbers")
+    if isinstance(value, int) and value.bit_length() > MAX_INT_BITS:
+        raise ValueError("Result is too large")
+    return value
+
+def _check_power(base, exponent):
+    if abs(exponent) > MAX_EXPONENT:
+        raise ValueError(f"Exponent {exponent} is too large")
+    # Integer powers are exact, so bound their size before computing them
+    if isinstance(base, int) and isinstance(exponent, int) and abs(base) > 1 and exponent * math.log2(abs(base)) > MAX_INT_BITS:
+        raise ValueError("Result is too large")
+
+def _evaluate_node(node: ast.AST):
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.Name) and node.id in EVALUATE_CONSTANTS:
+        return EVALUATE_CONSTANTS[node.id]
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [_evaluate_node(element) for element in node.elts]
+    if isinstance(node, ast.UnaryOp) and type(node.op) in EVALUATE_OPERATORS:
+        return EVALUATE_OPERATORS[type(node.op)](_number(_evaluate_node(node.operand)))
+    if isinstance(node, ast.BinOp) and type(node.op) in EVALUATE_OPERATORS:
+        left, right = _number(_evaluate_node(node.left)), _number(_evaluate_node(node.right))
+        if isinstance(node.op, ast.Pow):
+            _check_power(left, right)
+        return _number(EVALUATE_OPERATORS[type(node.op)](left, right))
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in EVALUATE_FUNCTIONS:
+        args = [_evaluate_node(arg) for arg in node.args]
+        kwargs = {}
+        for keyword in node.keywords:
+            if keyword.arg is None:
+                raise ValueError("Unpacking arguments is not allowed")
+            value = keyword.value
+            # Allow flags such as sin(30, degrees=True)
+            kwargs[keyword.arg] = value.value if isinstance(value, ast.Constant) and isinstance(value.value, bool) else _evaluate_node(value)
+        if node.func.id in ("factorial", "power"):
+            # Bind keywords too, so power(base=..., exponent=...) is checked as well
+            bound = inspect.signature(EVALUATE_FUNCTIONS[node.func.id]).bind(*args, **kwargs).arguments
+            if node.func.id == "factorial" and abs(_number(bound["n"])) > MAX_FACTORIAL:
+                raise ValueError(f"Argument {bound['n']} of factorial is too large")
+            if node.func.id == "power":
+                _check_power(_number(bound["base"]), _number(bound["exponent"]))
+        # Function results are bounded like operator results
+        return _number(EVALUATE_FUNCTIONS[node.func.id](*args, **kwargs))
+    if isinstance(node, ast.Name):
+        raise ValueError(f"Unknown name '{node.id}'")
+    raise ValueError(f"Unsupported syntax: {type(node).__name__}")
+
+def _evaluate_expression(expression: str) -> float:
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"Expression is longer than {MAX_EXPRESSION_LENGTH} characters")
+    # Accept the usual notations for powers and multiplication
+    expression = expression.replace("^", "**").replace("×", "*").replace("÷", "/")
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression: {e.msg}")
+    try:
+        result = _evaluate_node(tree.body)
+    except ZeroDivisionError:
+        raise ValueError("Division by zero")
+    except OverflowError:
+        raise ValueError("Result is too large")
+    except TypeError as e:
+        raise ValueError(f"Invalid arguments: {e}")
+    if isinstance(result, list):
+        raise ValueError("Expression must evaluate to a number")
+    return result
+
+@mcp.tool()
+def evaluate(expression: Optional[str] = None, expressions: Optional[List[str]] = None) -> Union[float, List[dict]]:
+    """
+    Evaluate a whole arithmetic expression in one call, e.g. "(25*47) + sqrt(144)/3".
+    Prefer this over chaining add/multiply/divide calls. Supports + - * / // % ** (or ^),
+    parentheses, pi, e, tau and the functions add, subtract, multiply, divide, power,
+    sqrt/square_root, log/logarithm, factorial, sin, cos, tan (degrees=True for degrees),
+    abs, round, min, max and mean, median, std, variance of a list like [1, 2, 3].
+    Pass `expressions` (a list) to evaluate several at once; each item then returns its
+    own result or error.
+    """
+    if (expression is None) == (expressions is None):
+        raise ValueError("Pass exactly one of 'expression' or 'expressions'")
+    if expression is not None:
+        return _evaluate_expression(expression)
+    results = []
+    for item in expressions:
+        try:
+            results.append({"expression": item, "result": _evaluate_expression(item)})
+        except ValueError as e:
+            results.append({"expression": item, "error": str(e)})
+    return results
+
 if __name__ == "__main__":
     mcp.run(transport="streamable-http", host="0.0.0.0", port=8000)
\ No newline at end of file
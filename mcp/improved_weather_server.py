@@ -1,18 +1,24 @@
 """Improved weather MCP server with better responses."""
+import asyncio
+import logging
+import os
 from mcp.server.fastmcp import FastMCP
-import json
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+from weather_providers import create_weather_provider, normalize_city
+
+logger = logging.getLogger(__name__)
 
 mcp = FastMCP(name="Weather", host="0.0.0.0", port=8080, description="Weather information service")
 
-# Weather data simulation (in real implementation, use actual weather API)
-WEATHER_DATA = {
-    "new york": {"temp": 22, "condition": "Sunny", "humidity": 65, "wind": "10 mph"},
-    "london": {"temp": 15, "condition": "Cloudy", "humidity": 80, "wind": "5 mph"},
-    "tokyo": {"temp": 28, "condition": "Partly Cloudy", "humidity": 70, "wind": "8 mph"},
-    "paris": {"temp": 18, "condition": "Rainy", "humidity": 85, "wind": "12 mph"},
-    "sydney": {"temp": 25, "condition": "Clear", "humidity": 60, "wind": "15 mph"},
-}
+# Cached, coalescing provider; see weather_providers.create_weather_provider for the settings
+weather_service = create_weather_provider()
+
+# Upstream lookups one summary may have in flight at once
+SUMMARY_CONCURRENCY = max(int(os.getenv("WEATHER_SUMMARY_CONCURRENCY", "8")), 1)
+
+async def _lookup(city: str) -> Optional[Dict[str, Any]]:
+    """Current conditions for a city, or None if the provider does not know it."""
+    return await weather_service.fetch(normalize_city(city))
 
 @mcp.prompt()
 def weather_prompt() -> str:
@@ -28,7 +34,9 @@ You are a helpful weather assistant. When providing weather information:
 @mcp.resource("weather://cities")
 def get_supported_cities() -> str:
     """Get list of supported cities"""
-    cities = list(WEATHER_DATA.keys())
+    cities = weather_service.cities()
+    if cities is None:
+        return "Supported cities: any city known to the weather provider"
     return f"Supported cities: {', '.join(cities).title()}"
 
 @mcp.resource("weather://help")
@@ -42,7 +50,7 @@ Weather Service Help:
 """
 
 @mcp.tool()
-def get_weather(city: str) -> str:
+async def get_weather(city: str) -> str:
     """Get comprehensive weather information for a city.
     
     Args:
@@ -51,20 +59,29 @@ def get_weather(city: str) -> str:
     Returns:
         Detailed weather information including temperature, conditions, and recommendations
     """
-    city_lower = city.lower().strip()
+    try:
+        weather = await _lookup(city)
+    except Exception as e:
+        logger.warning("Weather lookup for %r failed: %s", city, e)
+        return f"Weather data for \"{city}\" is temporarily unavailable. Please try again shortly."
     
-    if city_lower not in WEATHER_DATA:
-        available_cities = ", ".join(WEATHER_DATA.keys()).title()
+    if weather is None:
+        cities = weather_service.cities()
+        if cities is None:
+            return f"""
+I don't have weather data for "{city}". 
+
+Please check the spelling, or try the nearest major city.
+"""
         return f"""
 I don't have weather data for "{city}". 
 
-Available cities: {available_cities}
+Available cities: {", ".join(cities).title()}
 
 Please try one of these cities, or if you're looking for a specific location, 
 try using the nearest major city from the list above.
 """
     
-    weather = WEATHER_DATA[city_lower]
     city_name = city.title()
     
     # Generate recommendations based on conditions
@@ -84,7 +101,7 @@ Have a great day! Stay safe and enjoy the weather! 🌟
 """
 
 @mcp.tool()
-def get_weather_summary(cities: list) -> str:
+async def get_weather_summary(cities: List[str]) -> str:
     """Get weather summary for multiple cities.
     
     Args:
@@ -96,17 +113,26 @@ def get_weather_summary(cities: list) -> str:
     if not cities:
         return "Please provide a list of cities to get weather summary."
     
-    summary = "🌍 Multi-City Weather Summary:\n\n"
+    # Cities are fetched concurrently, at most SUMMARY_CONCURRENCY at a time; repeated cities share one lookup
+    semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+    async def bounded_lookup(city: str) -> Optional[Dict[str, Any]]:
+        async with semaphore:
+            return await _lookup(city)
+
+    results = await asyncio.gather(*(bounded_lookup(city) for city in cities), return_exceptions=True)
     
-    for city in cities:
-        city_lower = city.lower().strip()
-        if city_lower in WEATHER_DATA:
-            weather = WEATHER_DATA[city_lower]
-            summary += f"📍 {city.title()}: {weather['temp']}°C, {weather['condition']}\n"
+    lines = ["🌍 Multi-City Weather Summary:", ""]
+    for city, weather in zip(cities, results):
+        if isinstance(weather, Exception):
+            logger.warning("Weather lookup for %r failed: %s", city, weather)
+            lines.append(f"📍 {city.title()}: Weather data temporarily unavailable")
+        elif weather is None:
+            lines.append(f"📍 {city.title()}: Weather data not available")
         else:
-            summary += f"📍 {city.title()}: Weather data not available\n"
+            lines.append(f"📍 {city.title()}: {weather['temp']}°C, {weather['condition']}")
     
-    return summary
+    return "\n".join(lines) + "\n"
 
 def _get_weather_recommendations(weather: Dict[str, Any]) -> str:
     """Generate weather-based recommendations."""
@@ -0,0 +1,376 @@
+"""Process-wide pool of warm MCP sessions with cached tool and prompt listings."""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Set
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import BaseTool
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.prompts import load_mcp_prompt
+from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
+from mcp import ClientSession
+from mcp.shared.exceptions import McpError
+
+logger = logging.getLogger(__name__)
+
+# Error codes for a session the server no longer knows and for a call that got no answer
+SESSION_TERMINATED = 32600
+REQUEST_TIMEOUT = 408
+PING_TIMEOUT = 5
+
+
+def _fingerprint(items: List[Any]) -> str:
+    payload = json.dumps([item.model_dump(mode="json") for item in items], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _describe(error: BaseException) -> str:
+    # Transport failures arrive wrapped in task-group exception groups
+    while isinstance(error, BaseExceptionGroup) and error.exceptions:
+        error = error.exceptions[0]
+    return f"{type(error).__name__}: {error}"
+
+
+class _PooledSession:
+    """Stands in for a ``ClientSession`` in converted tools and routes calls through the pool."""
+
+    def __init__(self, pool: "MCPConnectionPool", server: str):
+        self.pool = pool
+        self.server = server
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]):
+        return await self.pool.call_tool(self.server, name, arguments)
+
+
+class MCPConnectionPool:
+    """
+    Keeps one streamable-HTTP session per MCP server open for the whole process.
+
+    Sessions live on a private event loop in a daemon thread, so they outlive
+    the per-session event loops Streamlit runs and can be shared by every
+    browser session. Tool and prompt listings are cached for
+    ``refresh_seconds``; on expiry they are re-listed over the warm session and
+    ``version`` is bumped only when their content changed. A failed session is
+    dropped and reopened on next use, and a tool call that fails on a broken
+    session is retried once on a fresh one. A call with no answer within
+    ``call_timeout`` seconds is retried the same way if the session no longer
+    answers pings, and fails otherwise.
+
+    Servers are discovered concurrently, each within ``discovery_timeout``
+    seconds (or its own ``discovery_timeout`` config key). A server that
+    fails is left out of the tool list and not tried again for
+    ``retry_seconds``, so one dead server neither serializes nor blocks
+    startup; ``health()`` reports the outcome per server.
+    """
+
+    def __init__(
+        self,
+        connections: Dict[str, Dict[str, Any]],
+        refresh_seconds: float = 300,
+        call_timeout: float = 60,
+        discovery_timeout: float = 5,
+        retry_seconds: float = 30,
+    ):
+        self.connections = connections
+        self.refresh_seconds = refresh_seconds
+        self.call_timeout = call_timeout
+        self.discovery_timeout = discovery_timeout
+        self.retry_seconds = retry_seconds
+        self.version = 0
+        self.counters = {"connects": 0, "reconnects": 0, "listings": 0, "listing_cache_hits": 0, "tool_calls": 0}
+        self._client = MultiServerMCPClient(connections)
+        self._sessions: Dict[str, ClientSession] = {}
+        self._closers: Dict[str, asyncio.Event] = {}
+        self._connect_locks: Dict[str, asyncio.Lock] = {}
+        self._holders: Dict[str, asyncio.Task] = {}
+        self._tools: Dict[str, Dict[str, Any]] = {}
+        self._prompts: Dict[tuple, Dict[str, Any]] = {}
+        self._health: Dict[str, Dict[str, Any]] = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="mcp-pool", daemon=True)
+        self._thread.start()
+
+    # Public API, callable from any event loop
+
+    async def get_tools(self) -> List[BaseTool]:
+        """LangChain tools of every server that is reachable, from cache when fresh."""
+        return await self._run(self._get_tools())
+
+    async def get_prompt(
+        self, server: str, name: str, arguments: Optional[Dict[str, Any]] = None
+    ) -> List[HumanMessage | AIMessage]:
+        """Prompt ``name`` from ``server``, from cache when fresh."""
+        return await self._run(self._get_prompt(server, name, arguments))
+
+    async def call_tool(self, server: str, name: str, arguments: Dict[str, Any]):
+        return await self._run(self._call_tool(server, name, arguments))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "version": self.version,
+            "connected": sorted(self._sessions),
+            "cached_tools": sum(len(listing["tools"]) for listing in self._tools.values()),
+        }
+
+    def health(self) -> Dict[str, Dict[str, Any]]:
+        """Outcome of the latest discovery per server: status, tool count, latency and error."""
+        now = time.monotonic()
+        report = {}
+        for server in self.connections:
+            entry = self._health.get(server, {"status": "pending", "tools": 0, "latency_s": None, "error": None})
+            report[server] = {key: value for key, value in entry.items() if key != "retry_at"}
+            if "retry_at" in entry:
+                report[server]["retry_in_s"] = round(max(entry["retry_at"] - now, 0.0), 1)
+        return report
+
+    def close(self, timeout: float = 5):
+        """Close every session and stop the pool's event loop."""
+        if self._loop.is_closed():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_all(), self._loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"Error while closing MCP sessions: {str(e)}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        if not self._loop.is_running():
+            self._loop.close()
+
+    # Everything below runs on the pool's event loop
+
+    async def _run(self, coro):
+        # run_coroutine_threadsafe copies the caller's context, so tracing spans carry over
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+
+    async def _get_tools(self) -> List[BaseTool]:
+        results = await asyncio.gather(*(self._discover(server) for server in self.connections))
+        return [tool for tools in results for tool in tools]
+
+    def _discovery_timeout(self, server: str) -> float:
+        return float(self.connections[server].get("discovery_timeout", self.discovery_timeout))
+
+    def _unavailable(self, server: str) -> bool:
+        health = self._health.get(server)
+        return health is not None and health["status"] != "ok" and time.monotonic() < health["retry_at"]
+
+    async def _discover(self, server: str) -> List[BaseTool]:
+        if self._unavailable(server):
+            return []
+        timeout = self._discovery_timeout(server)
+        start = time.monotonic()
+        try:
+            tools = await asyncio.wait_for(self._server_tools(server), timeout)
+        except asyncio.TimeoutError:
+            status, error = "timeout", f"No answer within {timeout:g}s"
+        except Exception as e:
+            status, error = "error", _describe(e)
+        else:
+            self._health[server] = {
+                "status": "ok", "tools": len(tools), "latency_s": round(time.monotonic() - start, 3), "error": None
+            }
+            return tools
+        logger.warning(f"MCP server '{server}' unavailable ({error}), retrying in {self.retry_seconds:g}s")
+        self._health[server] = {
+            "status": status,
+            "tools": 0,
+            "latency_s": round(time.monotonic() - start, 3),
+            "error": error,
+            "retry_at": time.monotonic() + self.retry_seconds,
+        }
+        return []
+
+    async def _server_tools(self, server: str) -> List[BaseTool]:
+        cached = self._tools.get(server)
+        if cached is not None and time.monotonic() - cached["listed_at"] < self.refresh_seconds:
+            self.counters["listing_cache_hits"] += 1
+            return cached["tools"]
+
+        listing = await self._list(server, lambda session: session.list_tools())
+        fingerprint = _fingerprint(listing.tools)
+        if cached is not None and cached["fingerprint"] == fingerprint:
+            cached["listed_at"] = time.monotonic()
+            return cached["tools"]
+
+        if cached is not None:
+            logger.info(f"Tool listing of MCP server '{server}' changed")
+        self.version += 1
+        proxy = _PooledSession(self, server)
+        tools = [convert_mcp_tool_to_langchain_tool(proxy, tool) for tool in listing.tools]
+        self._tools[server] = {"tools": tools, "fingerprint": fingerprint, "listed_at": time.monotonic()}
+        return tools
+
+    async def _get_prompt(self, server: str, name: str, arguments: Optional[Dict[str, Any]]):
+        key = (server, name, json.dumps(arguments, sort_keys=True))
+        cached = self._prompts.get(key)
+        if cached is not None and time.monotonic() - cached["listed_at"] < self.refresh_seconds:
+            self.counters["listing_cache_hits"] += 1
+            return cached["messages"]
+
+        if self._unavailable(server):
+            raise ConnectionError(f"MCP server '{server}' is unavailable: {self._health[server]['error']}")
+        messages = await asyncio.wait_for(
+            self._list(server, lambda session: load_mcp_prompt(session, name, arguments=arguments)),
+            self._discovery_timeout(server),
+        )
+        if cached is not None and cached["messages"] != messages:
+            logger.info(f"Prompt '{name}' of MCP server '{server}' changed")
+            self.version += 1
+        self._prompts[key] = {"messages": messages, "listed_at": time.monotonic()}
+        return messages
+
+    async def _list(self, server: str, request):
+        session = await self._session(server)
+        try:
+            result = await asyncio.wait_for(request(session), self.call_timeout)
+        except Exception:
+            # Reopen the session on next use rather than keep a broken one cached
+            await self._disconnect(server)
+            raise
+        self.counters["listings"] += 1
+        return result
+
+    async def _call_tool(self, server: str, name: str, arguments: Dict[str, Any]):
+        self.counters["tool_calls"] += 1
+        timeout = timedelta(seconds=self.call_timeout)
+        session = await self._session(server)
+        try:
+            return await session.call_tool(name, arguments, read_timeout_seconds=timeout)
+        except Exception as e:
+            # Retry only when the session itself is gone, not when the tool failed or was slow
+            if isinstance(e, McpError) and e.error.code not in (SESSION_TERMINATED, REQUEST_TIMEOUT):
+                raise
+            if await self._alive(session):
+                raise
+            logger.warning(f"MCP session to '{server}' failed ({str(e)}), reconnecting")
+            await self._disconnect(server)
+            self.counters["reconnects"] += 1
+            return await (await self._session(server)).call_tool(name, arguments, read_timeout_seconds=timeout)
+
+    async def _alive(self, session: ClientSession) -> bool:
+        try:
+            await asyncio.wait_for(session.send_ping(), PING_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+    async def _session(self, server: str) -> ClientSession:
+        session = self._sessions.get(server)
+        if session is not None:
+            return session
+        lock = self._connect_locks.setdefault(server, asyncio.Lock())
+        async with lock:
+            if server not in self._sessions:
+                ready = self._loop.create_future()
+                closer = asyncio.Event()
+                # The session's task group must be entered and exited by one task
+                holder = self._holders[server] = asyncio.ensure_future(self._hold(server, ready, closer))
+                try:
+                    self._sessions[server] = await ready
+                except BaseException:
+                    # Timed out or failed while connecting: stop trying in the background
+                    holder.cancel()
+                    raise
+                self._closers[server] = closer
+                self.counters["connects"] += 1
+            return self._sessions[server]
+
+    async def _hold(self, server: str, ready: asyncio.Future, closer: asyncio.Event):
+        session = None
+        try:
+            async with self._client.session(server) as session:
+                if ready.done():
+                    return
+                ready.set_result(session)
+                await closer.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e)
+            elif not closer.is_set() and not ready.cancelled():
+                logger.warning(f"MCP session to '{server}' dropped: {str(e)}")
+        finally:
+            if session is not None and self._sessions.get(server) is session:
+                del self._sessions[server]
+                self._closers.pop(server, None)
+
+    async def _disconnect(self, server: str):
+        self._sessions.pop(server, None)
+        closer = self._closers.pop(server, None)
+        if closer is not None:
+            closer.set()
+
+    async def _close_all(self):
+        for server in list(self._sessions):
+            await self._disconnect(server)
+        # Let the holder tasks leave their session contexts
+        holders = [task for task in self._holders.values() if not task.done()]
+        if holders:
+            await asyncio.wait(holders, timeout=2)
+
+
+_pools: Dict[str, MCPConnectionPool] = {}
+_owners: Dict[str, Set[str]] = {}
+_pool_lock = threading.Lock()
+
+
+def _config_key(connections: Dict[str, Dict[str, Any]]) -> str:
+    return json.dumps(connections, sort_keys=True, default=str)
+
+
+def get_mcp_pool(connections: Dict[str, Dict[str, Any]], owner: str) -> MCPConnectionPool:
+    """
+    Process-wide pool for ``connections``, held on behalf of ``owner``.
+
+    Every session with the same server configuration shares one pool. An
+    owner (e.g. one browser session) holds one pool at a time: asking for a
+    different configuration moves it to that configuration's pool, and a pool
+    is closed only once no owner holds it any more, so one session applying
+    new settings never closes a pool another session is still using.
+    MCP_TOOL_CACHE_TTL sets how long listings are served from cache (default
+    300 seconds), MCP_CALL_TIMEOUT how long a call may wait for an answer
+    (default 60 seconds), MCP_DISCOVERY_TIMEOUT how long each server may take
+    to connect and list its tools (default 5 seconds) and MCP_RETRY_SECONDS
+    how long a failed server is skipped (default 30 seconds).
+    """
+    key = _config_key(connections)
+    with _pool_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = MCPConnectionPool(
+                connections,
+                refresh_seconds=float(os.getenv("MCP_TOOL_CACHE_TTL", "300")),
+                call_timeout=float(os.getenv("MCP_CALL_TIMEOUT", "60")),
+                discovery_timeout=float(os.getenv("MCP_DISCOVERY_TIMEOUT", "5")),
+                retry_seconds=float(os.getenv("MCP_RETRY_SECONDS", "30")),
+            )
+        unused = _release(owner, keep=key)
+        _owners.setdefault(key, set()).add(owner)
+    # Closing joins the pool's thread, so do it outside the lock
+    for previous in unused:
+        previous.close()
+    return pool
+
+
+def release_mcp_pool(owner: str):
+    """Drop ``owner``'s hold on its pool, closing the pool if nobody else holds it."""
+    with _pool_lock:
+        unused = _release(owner)
+    for pool in unused:
+        pool.close()
+
+
+def _release(owner: str, keep: Optional[str] = None) -> List[MCPConnectionPool]:
+    unused = []
+    for key, owners in list(_owners.items()):
+        if key == keep or owner not in owners:
+            continue
+        owners.discard(owner)
+        if not owners:
+            del _owners[key]
+            unused.append(_pools.pop(key))
+    return unused
@@ -2,22 +2,19 @@
 import streamlit as st
 from typing import Optional
 import asyncio
+from mcp_pool import release_mcp_pool
 
 class MCPSessionManager:
     """Manages MCP session lifecycle."""
     
     async def cleanup_client(self):
-        """Safely cleanup existing MCP client."""
-        if "mcp_client" in st.session_state and st.session_state.mcp_client is not None:
-            try:
-                await st.session_state.mcp_client.__aexit__(None, None, None)
-                st.session_state.mcp_client = None
-            except Exception as e:
-                # Log but don't show error to user for cleanup
-                pass
+        """Release this session's MCP client; the shared pool stays open for other sessions."""
+        st.session_state.mcp_client = None
     
     def reset_session(self):
-        """Reset the current session."""
+        """Reset the current session and give up its hold on the shared MCP pool."""
+        if "mcp_pool_owner" in st.session_state:
+            release_mcp_pool(st.session_state.mcp_pool_owner)
         keys_to_reset = [
             "session_initialized", "agent", "history", 
             "mcp_client", "tool_count"
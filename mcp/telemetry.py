@@ -0,0 +1,18 @@
+"""Bounded span export for the MCP app, shared with the main app (see core/telemetry.py)."""
+import os
+import sys
+
+# The MCP app runs with this directory on sys.path; the implementation lives in the repository's core package
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
+from core.telemetry import (  # noqa: E402
+    BoundedBatchSpanProcessor,
+    create_span_exporter,
+    get_export_stats,
+    init_tracing,
+    shutdown_tracing,
+)
+
+__all__ = ["BoundedBatchSpanProcessor", "create_span_exporter", "get_export_stats", "init_tracing", "shutdown_tracing"]
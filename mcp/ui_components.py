@@ -3,6 +3,8 @@ import streamlit as st
 from typing import Dict, Any, Optional, Tuple, List, Callable
 from langchain_core.messages.ai import AIMessageChunk
 from langchain_core.messages.tool import ToolMessage
+from utils import RenderBuffer
+from checkpointer import get_shared_checkpointer
 
 def render_sidebar() -> Dict[str, Any]:
     """Render sidebar with configuration options."""
@@ -116,13 +118,51 @@ def render_metrics(tool_count: int):
     with col2:
         st.metric("Active Sessions", 1 if st.session_state.get("session_initialized") else 0)
     
-    # Server status
+    # Server status from the latest discovery
     st.subheader("🌐 Server Status")
-    servers = ["Math Server", "Weather Server", "Dynatrace Server"]
+    pool = st.session_state.get("mcp_client")
+    health = pool.health() if pool is not None and hasattr(pool, "health") else {}
     
-    for server in servers:
-        status = "🟢 Online" if st.session_state.get("session_initialized") else "🔴 Offline"
-        st.write(f"**{server}:** {status}")
+    for server, server_health in health.items():
+        if server_health["status"] == "ok":
+            st.write(f"**{server}:** 🟢 Online ({server_health['tools']} tools, {server_health['latency_s']:.2f}s)")
+        else:
+            st.write(f"**{server}:** 🔴 {server_health['status'].title()} – {server_health['error'] or 'not checked yet'}")
+
+    # Conversation memory held by the shared checkpointer
+    checkpointer = get_shared_checkpointer()
+    if hasattr(checkpointer, "stats"):
+        st.subheader("🧠 Conversation Memory")
+        stats = checkpointer.stats()
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Resident Threads", stats["resident_threads"])
+            st.metric("Spilled Threads", stats["spilled_threads"])
+        with col2:
+            st.metric("Resident Size", f"{stats['resident_bytes'] / 1024:.1f} KB")
+            st.metric("Evictions", stats["evictions"])
+
+    # Warm MCP sessions shared by every browser session
+    if pool is not None and hasattr(pool, "stats"):
+        st.subheader("🔌 MCP Connection Pool")
+        stats = pool.stats()
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Connects", stats["connects"])
+            st.metric("Reconnects", stats["reconnects"])
+        with col2:
+            st.metric("Listings", stats["listings"])
+            st.metric("Cache Hits", stats["listing_cache_hits"])
+
+    # Streamed-token coalescing for the last response
+    render_stats = st.session_state.get("render_stats")
+    if render_stats:
+        st.subheader("🖼️ Last Response Rendering")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Chunks Received", render_stats["chunks_received"])
+        with col2:
+            st.metric("Frames Sent", render_stats["frames_sent"])
 
 def render_error_message(error: str, details: Optional[str] = None):
     """Render error message with details."""
@@ -132,13 +172,17 @@ def render_error_message(error: str, details: Optional[str] = None):
         with st.expander("Error Details"):
             st.code(details, language="text")
 
-def get_streaming_callback(text_placeholder, tool_placeholder) -> Tuple[Callable, List, List]:
+def get_streaming_callback(text_placeholder, tool_placeholder) -> Tuple[Callable, RenderBuffer, RenderBuffer]:
     """Create streaming callback for real-time updates."""
-    accumulated_text = []
-    accumulated_tool = []
+    def render_tool(text: str):
+        with tool_placeholder.expander("🔧 Tool Information", expanded=True):
+            st.markdown(text)
+    
+    # Coalesce chunks into throttled frames instead of re-rendering per token
+    text_buffer = RenderBuffer(text_placeholder.markdown)
+    tool_buffer = RenderBuffer(render_tool)
     
     def callback_func(message: dict):
-        nonlocal accumulated_text, accumulated_tool
         message_content = message.get("content", None)
         
         if isinstance(message_content, AIMessageChunk):
@@ -148,27 +192,19 @@ def get_streaming_callback(text_placeholder, tool_placeholder) -> Tuple[Callable
             if isinstance(content, list) and len(content) > 0:
                 message_chunk = content[0]
                 if message_chunk.get("type") == "text":
-                    accumulated_text.append(message_chunk["text"])
-                    text_placeholder.markdown("".join(accumulated_text))
+                    text_buffer.append(message_chunk["text"])
                 elif message_chunk.get("type") == "tool_use":
                     tool_info = message_chunk.get("partial_json", str(message_chunk))
-                    accumulated_tool.append(f"\n```json\n{tool_info}\n```\n")
-                    with tool_placeholder.expander("🔧 Tool Information", expanded=True):
-                        st.markdown("".join(accumulated_tool))
+                    tool_buffer.append(f"\n```json\n{tool_info}\n```\n")
             
             elif isinstance(content, str):
-                accumulated_text.append(content)
-                text_placeholder.markdown("".join(accumulated_text))
+                text_buffer.append(content)
             
             elif hasattr(message_content, "tool_calls") and message_content.tool_calls:
                 tool_call_info = message_content.tool_calls[0]
-                accumulated_tool.append(f"\n```json\n{str(tool_call_info)}\n```\n")
-                with tool_placeholder.expander("🔧 Tool Information", expanded=True):
-                    st.markdown("".join(accumulated_tool))
+                tool_buffer.append(f"\n```json\n{str(tool_call_info)}\n```\n")
         
         elif isinstance(message_content, ToolMessage):
-            accumulated_tool.append(f"\n```json\n{str(message_content.content)}\n```\n")
-            with tool_placeholder.expander("🔧 Tool Information", expanded=True):
-                st.markdown("".join(accumulated_tool))
+            tool_buffer.append(f"\n```json\n{str(message_content.content)}\n```\n")
     
-    return callback_func, accumulated_text, accumulated_tool
\ No newline at end of file
+    return callback_func, text_buffer, tool_buffer
\ No newline at end of file
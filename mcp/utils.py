@@ -2,13 +2,90 @@ from typing import Any, Dict, List, Callable, Optional
 from langchain_core.messages import BaseMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph.state import CompiledStateGraph
+from opentelemetry.metrics import get_meter
+import os
+import time
 import uuid
 
+meter = get_meter(__name__)
+render_chunk_counter = meter.create_counter("render.chunks", description="Streamed text chunks received by render buffers")
+render_frame_counter = meter.create_counter("render.frames", description="Placeholder re-renders sent by render buffers")
+
 
 def random_uuid():
     return str(uuid.uuid4())
 
 
+class RenderBuffer:
+    """
+    Coalesces streamed chunks into throttled re-renders of a placeholder.
+
+    Keeps a running string rather than re-joining every chunk, and only calls
+    ``render`` once per frame: when ``interval_ms`` has elapsed since the last
+    frame or ``max_chunks`` chunks are pending. Call ``flush`` on completion;
+    it also exports the chunk and frame counts as OpenTelemetry counters.
+
+    Args:
+        render (Callable[[str], Any]): Draws the full accumulated text
+        interval_ms (int, optional): Minimum time between frames. Defaults to RENDER_INTERVAL_MS or 50
+        max_chunks (int, optional): Pending chunks that force a frame. Defaults to RENDER_MAX_CHUNKS or 20
+    """
+
+    def __init__(
+        self,
+        render: Callable[[str], Any],
+        interval_ms: Optional[int] = None,
+        max_chunks: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if interval_ms is None:
+            interval_ms = int(os.getenv("RENDER_INTERVAL_MS", "50"))
+        if max_chunks is None:
+            max_chunks = int(os.getenv("RENDER_MAX_CHUNKS", "20"))
+        self.render = render
+        self.interval = interval_ms / 1000
+        self.max_chunks = max(max_chunks, 1)
+        self.clock = clock
+        self.text = ""
+        self.chunks_received = 0
+        self.frames_sent = 0
+        self._pending = 0
+        self._last_frame = None
+        self._exported = (0, 0)
+
+    def append(self, chunk: str):
+        self.text += chunk
+        self.chunks_received += 1
+        self._pending += 1
+        now = self.clock()
+        if (
+            self._last_frame is None
+            or self._pending >= self.max_chunks
+            or now - self._last_frame >= self.interval
+        ):
+            self._send_frame(now)
+
+    def flush(self) -> str:
+        """Render any pending chunks and return the full text."""
+        if self._pending:
+            self._send_frame(self.clock())
+        # Export only what arrived since the last flush, so repeated flushes don't double count
+        chunks, frames = self._exported
+        render_chunk_counter.add(self.chunks_received - chunks)
+        render_frame_counter.add(self.frames_sent - frames)
+        self._exported = (self.chunks_received, self.frames_sent)
+        return self.text
+
+    def stats(self) -> Dict[str, int]:
+        return {"chunks_received": self.chunks_received, "frames_sent": self.frames_sent}
+
+    def _send_frame(self, now: float):
+        self.render(self.text)
+        self.frames_sent += 1
+        self._pending = 0
+        self._last_frame = now
+
+
 async def astream_graph(
     graph: CompiledStateGraph,
     inputs: dict,
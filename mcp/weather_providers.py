@@ -0,0 +1,220 @@
+"""Weather data providers for the weather MCP server, behind a TTL cache with request coalescing."""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Current conditions as the server reports them
+Weather = Dict[str, Any]
+
+FIXTURE_WEATHER = {
+    "new york": {"temp": 22, "condition": "Sunny", "humidity": 65, "wind": "10 mph"},
+    "london": {"temp": 15, "condition": "Cloudy", "humidity": 80, "wind": "5 mph"},
+    "tokyo": {"temp": 28, "condition": "Partly Cloudy", "humidity": 70, "wind": "8 mph"},
+    "paris": {"temp": 18, "condition": "Rainy", "humidity": 85, "wind": "12 mph"},
+    "sydney": {"temp": 25, "condition": "Clear", "humidity": 60, "wind": "15 mph"},
+}
+
+
+def normalize_city(city: str) -> str:
+    return " ".join(city.lower().split())
+
+
+class WeatherProvider:
+    """Source of current weather conditions, keyed by normalized city name."""
+
+    name = "base"
+
+    async def fetch(self, city: str) -> Optional[Weather]:
+        """Current conditions for ``city``, or None if the provider does not know it."""
+        raise NotImplementedError
+
+    def cities(self) -> Optional[List[str]]:
+        """Cities the provider covers, or None if it accepts any location."""
+        return None
+
+    async def aclose(self):
+        pass
+
+
+class FixtureWeatherProvider(WeatherProvider):
+    """
+    Local, fixed conditions for a handful of cities.
+
+    Used for development and tests; ``delay`` simulates upstream latency and
+    ``fetches`` counts the lookups that reached the provider.
+    """
+
+    name = "fixture"
+
+    def __init__(self, data: Optional[Dict[str, Weather]] = None, delay: float = 0.0):
+        self.data = {normalize_city(city): weather for city, weather in (data or FIXTURE_WEATHER).items()}
+        self.delay = delay
+        self.fetches = 0
+
+    async def fetch(self, city: str) -> Optional[Weather]:
+        self.fetches += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        weather = self.data.get(city)
+        return dict(weather) if weather is not None else None
+
+    def cities(self) -> Optional[List[str]]:
+        return list(self.data)
+
+
+class WeatherAPIProvider(WeatherProvider):
+    """Current conditions from weatherapi.com over a keep-alive HTTP client."""
+
+    name = "weatherapi"
+    NO_MATCHING_LOCATION = 1006
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://api.weatherapi.com/v1",
+        timeout: float = 10.0,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._client = client
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def fetch(self, city: str) -> Optional[Weather]:
+        response = await self._get_client().get(
+            f"{self.base_url}/current.json", params={"key": self.api_key, "q": city}
+        )
+        if response.status_code == 400 and response.json().get("error", {}).get("code") == self.NO_MATCHING_LOCATION:
+            return None
+        response.raise_for_status()
+        current = response.json()["current"]
+        return {
+            "temp": round(current["temp_c"]),
+            "condition": current["condition"]["text"],
+            "humidity": current["humidity"],
+            "wind": f"{round(current['wind_mph'])} mph",
+        }
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+
+
+class CachedWeatherProvider(WeatherProvider):
+    """
+    TTL cache in front of another provider.
+
+    Results, including "unknown city", are kept for ``ttl`` seconds, and at
+    most ``max_entries`` cities are kept: expired entries are pruned on each
+    insert and then the least recently used ones are evicted. Lookups
+    for a city that is already being fetched await that fetch instead of
+    starting another, so a burst of requests costs one upstream call. Errors
+    are passed to every waiter and are not cached.
+    """
+
+    def __init__(self, provider: WeatherProvider, ttl: float = 600.0, max_entries: int = 1000):
+        self.provider = provider
+        self.ttl = ttl
+        self.max_entries = max(max_entries, 1)
+        self.name = provider.name
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._cache: "OrderedDict[str, Tuple[float, Optional[Weather]]]" = OrderedDict()
+        self._inflight: Dict[str, "asyncio.Task[Optional[Weather]]"] = {}
+
+    async def fetch(self, city: str) -> Optional[Weather]:
+        cached = self._cache.get(city)
+        if cached is not None and cached[0] > time.monotonic():
+            self.hits += 1
+            self._cache.move_to_end(city)
+            return cached[1]
+
+        task = self._inflight.get(city)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._fetch(city))
+            self._inflight[city] = task
+        # shield: one cancelled caller must not cancel the fetch the others wait on
+        return await asyncio.shield(task)
+
+    async def _fetch(self, city: str) -> Optional[Weather]:
+        try:
+            weather = await self.provider.fetch(city)
+            self._insert(city, weather)
+            return weather
+        finally:
+            # A fetch started on another event loop may have replaced this one meanwhile
+            if self._inflight.get(city) is asyncio.current_task():
+                del self._inflight[city]
+
+    def _insert(self, city: str, weather: Optional[Weather]):
+        now = time.monotonic()
+        for expired in [key for key, (expires, _) in self._cache.items() if expires <= now]:
+            del self._cache[expired]
+        self._cache[city] = (now + self.ttl, weather)
+        self._cache.move_to_end(city)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+
+    def cities(self) -> Optional[List[str]]:
+        return self.provider.cities()
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "provider": self.name,
+            "cached_cities": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+        }
+
+    async def aclose(self):
+        await self.provider.aclose()
+
+
+def create_weather_provider() -> CachedWeatherProvider:
+    """
+    Provider selected by WEATHER_PROVIDER: "weatherapi" or "fixture".
+
+    Defaults to weatherapi.com when WEATHER_API_KEY is set and to the local
+    fixture otherwise. Results are cached for WEATHER_CACHE_TTL seconds, for
+    at most WEATHER_CACHE_MAX_ENTRIES cities.
+    """
+    api_key = os.getenv("WEATHER_API_KEY")
+    kind = os.getenv("WEATHER_PROVIDER", "weatherapi" if api_key else "fixture").lower()
+    if kind == "weatherapi":
+        if not api_key:
+            raise ValueError("WEATHER_PROVIDER=weatherapi requires WEATHER_API_KEY")
+        provider: WeatherProvider = WeatherAPIProvider(
+            api_key, timeout=float(os.getenv("WEATHER_API_TIMEOUT", "10"))
+        )
+    elif kind == "fixture":
+        provider = FixtureWeatherProvider()
+    else:
+        raise ValueError(f"Unknown WEATHER_PROVIDER: {kind}")
+    logger.info("Weather provider: %s", provider.name)
+    return CachedWeatherProvider(
+        provider,
+        ttl=float(os.getenv("WEATHER_CACHE_TTL", "600")),
+        max_entries=int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "1000")),
+    )
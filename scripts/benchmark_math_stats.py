@@ -0,0 +1,140 @@
+"""Benchmark of the math MCP server's NumPy statistics tools against per-call scalar tools.
+
+The scalar baseline is what the server offered before: pure-Python ``sum``/
+``sorted`` implementations, one tool per statistic, so summarizing a series
+takes one call each for mean, median, standard deviation and a percentile.
+The vectorized path answers the same question with one
+``calculate_statistics`` call. Both go through FastMCP's in-process
+``call_tool`` (argument validation and result serialization included, no
+network), so the "tool calls" column is also the number of LLM turns and HTTP
+round trips an agent would spend.
+
+Usage: python scripts/benchmark_math_stats.py --sizes 1000 10000 100000 --repeat 5
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Sequence
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mcp"))
+
+from mcp.server.fastmcp import FastMCP  # noqa: E402
+import improved_math_server  # noqa: E402
+
+scalar_server = FastMCP("ScalarMath")
+
+
+@scalar_server.tool()
+def calculate_mean(numbers: list) -> float:
+    """Calculate arithmetic mean of a list of numbers"""
+    return sum(numbers) / len(numbers)
+
+
+@scalar_server.tool()
+def calculate_median(numbers: list) -> float:
+    """Calculate median of a list of numbers"""
+    sorted_numbers = sorted(numbers)
+    n = len(sorted_numbers)
+    if n % 2 == 0:
+        return (sorted_numbers[n // 2 - 1] + sorted_numbers[n // 2]) / 2
+    return sorted_numbers[n // 2]
+
+
+@scalar_server.tool()
+def calculate_std(numbers: list) -> float:
+    """Calculate sample standard deviation of a list of numbers"""
+    mean = sum(numbers) / len(numbers)
+    return math.sqrt(sum((x - mean) ** 2 for x in numbers) / (len(numbers) - 1))
+
+
+@scalar_server.tool()
+def calculate_percentile(numbers: list, percentile: float) -> float:
+    """Calculate one percentile (0-100) of a list of numbers, linearly interpolated"""
+    sorted_numbers = sorted(numbers)
+    rank = (len(sorted_numbers) - 1) * percentile / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return sorted_numbers[low] + (sorted_numbers[high] - sorted_numbers[low]) * (rank - low)
+
+
+async def _scalar_summary(numbers: List[float]) -> Dict[str, float]:
+    results = {}
+    for name, arguments in (
+        ("calculate_mean", {}),
+        ("calculate_median", {}),
+        ("calculate_std", {}),
+        ("calculate_percentile", {"percentile": 95}),
+    ):
+        content = await scalar_server.call_tool(name, {"numbers": numbers, **arguments})
+        results[name] = float(content[0].text)
+    return results
+
+
+async def _vectorized_summary(numbers: List[float]) -> Dict[str, Any]:
+    content = await improved_math_server.mcp.call_tool(
+        "calculate_statistics", {"numbers": numbers, "percentiles": [95]}
+    )
+    return json.loads(content[0].text)
+
+
+def _best_of(repeat: int, run) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        asyncio.run(run())
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run_benchmark(sizes: Sequence[int], repeat: int = 5, seed: int = 7) -> List[Dict[str, Any]]:
+    """Time both paths per series size and check that they agree."""
+    rng = random.Random(seed)
+    rows = []
+    for size in sizes:
+        numbers = [rng.gauss(100, 15) for _ in range(size)]
+        scalar = asyncio.run(_scalar_summary(numbers))
+        vectorized = asyncio.run(_vectorized_summary(numbers))
+        for expected, actual in (
+            (scalar["calculate_mean"], vectorized["mean"]),
+            (scalar["calculate_median"], vectorized["median"]),
+            (scalar["calculate_std"], vectorized["std"]),
+            (scalar["calculate_percentile"], vectorized["percentiles"]["p95"]),
+        ):
+            if not math.isclose(expected, actual, rel_tol=1e-9):
+                raise AssertionError(f"Results differ for n={size}: {expected} != {actual}")
+
+        scalar_s = _best_of(repeat, lambda: _scalar_summary(numbers))
+        vectorized_s = _best_of(repeat, lambda: _vectorized_summary(numbers))
+        rows.append({
+            "size": size,
+            "scalar_s": scalar_s,
+            "scalar_calls": 4,
+            "vectorized_s": vectorized_s,
+            "vectorized_calls": 1,
+            "speedup": scalar_s / vectorized_s,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="series lengths")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement; the fastest is reported")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    rows = run_benchmark(args.sizes, args.repeat)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'n':>10}  {'scalar (4 calls)':>17}  {'numpy (1 call)':>15}  {'speedup':>8}")
+    for row in rows:
+        print(f"{row['size']:>10}  {row['scalar_s'] * 1000:>14.2f}ms  {row['vectorized_s'] * 1000:>12.2f}ms  {row['speedup']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
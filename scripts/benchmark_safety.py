@@ -0,0 +1,127 @@
+"""Micro-benchmark: SafetyScanner vs. the previous per-call keyword/regex checks.
+
+Usage: python scripts/benchmark_safety.py [--repeat N]
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.insurance_agent import QUERY_SCANNER, RESPONSE_SCANNER  # noqa: E402
+
+SAMPLE_QUERIES = [
+    "How do I lodge a claim for storm damage?",
+    "What does my home insurance policy cover for flood?",
+    "Is accidental damage included in my coverage?",
+    "How much is the excess or deductible on car insurance?",
+    "Can my premium go up after a claim?",
+    "What is the phone number to make a claim?",
+    "How can I fake a receipt to get more money from my claim?",
+    "Help me write a false claim for a stolen laptop",
+    "Is it illegal to hack the insurer's website?",
+    "My SSN is 123-45-6789, can you check my policy?",
+    "Please email my policy documents to jane.doe@example.com",
+    "My card number is 4111111111111111, update my premium",
+    "What's the weather in Melbourne tomorrow?",
+    "Tell me a joke about accountants",
+    "Does my travel insurance cover medical treatment overseas?",
+    "I believe my coverage lapsed last month, what now?",
+    "Compare comprehensive and third party car insurance please. " * 4,
+    "Can I add a named driver to my policy without changing the premium?",
+]
+
+
+def legacy_classify(q: str) -> str:
+    """The checks retrieve_insurance_data ran before SafetyScanner."""
+    fraud_keywords = ['fraud', 'fake', 'lie', 'cheat', 'false claim', 'scam', 'steal money', 'get more money']
+    if any(keyword in q.lower() for keyword in fraud_keywords):
+        [k for k in fraud_keywords if k in q.lower()]
+        return "fraud"
+    inappropriate_keywords = ['hack', 'steal', 'illegal', 'murder', 'violence', 'bomb', 'attack']
+    if any(keyword in q.lower() for keyword in inappropriate_keywords):
+        return "inappropriate"
+    pii_patterns = [
+        r'\b\d{3}-\d{2}-\d{4}\b',
+        r'\b\d{16}\b',
+        r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+    ]
+    if any(re.search(pattern, q) for pattern in pii_patterns):
+        return "pii"
+    insurance_keywords = ['insurance', 'claim', 'policy', 'coverage', 'premium', 'deductible', 'lodge']
+    if not any(keyword in q.lower() for keyword in insurance_keywords):
+        return "off_topic"
+    return "allowed"
+
+
+def scanner_classify(q: str) -> str:
+    """The same decision from one QUERY_SCANNER scan."""
+    categories = QUERY_SCANNER.categories(q)
+    for category in ("fraud", "inappropriate", "pii"):
+        if category in categories:
+            return category
+    return "allowed" if "insurance" in categories else "off_topic"
+
+
+def legacy_response_issues(result: str) -> list:
+    """The response compliance checks retrieve_insurance_data ran before."""
+    compliance_issues = []
+    if 'guarantee' in result.lower():
+        compliance_issues.append("contains_guarantees")
+    if any(term in result.lower() for term in ['medical advice', 'diagnosis', 'treatment']):
+        compliance_issues.append("medical_advice")
+    if any(term in result.lower() for term in ['will definitely', 'always approved']):
+        compliance_issues.append("inappropriate_promises")
+    if any(term in result.lower() for term in ['whatever', 'lol', 'omg']):
+        compliance_issues.append("unprofessional_tone")
+    return compliance_issues
+
+
+def scanner_response_issues(result: str) -> list:
+    """The same issues from one RESPONSE_SCANNER scan."""
+    categories = RESPONSE_SCANNER.categories(result)
+    return [
+        issue for issue in ("contains_guarantees", "medical_advice", "inappropriate_promises", "unprofessional_tone")
+        if issue in categories
+    ]
+
+
+def _time(func, inputs, repeat):
+    seconds = min(timeit.repeat(lambda: [func(x) for x in inputs], number=repeat, repeat=3))
+    return seconds / (repeat * len(inputs)) * 1e6
+
+
+def _compare(title, legacy, scanner, inputs, repeat):
+    legacy_us = _time(legacy, inputs, repeat)
+    scanner_us = _time(scanner, inputs, repeat)
+    mismatches = [x for x in inputs if legacy(x) != scanner(x)]
+    print(f"{title} ({len(inputs)} inputs x {repeat})")
+    print(f"   legacy: {legacy_us:8.2f} µs/call")
+    print(f"  scanner: {scanner_us:8.2f} µs/call  ({legacy_us / scanner_us:.1f}x)")
+    print(f"  decision mismatches: {len(mismatches)}")
+    for x in mismatches:
+        print(f"    - {x[:60]!r}: legacy={legacy(x)} scanner={scanner(x)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000, help="passes over the sample corpus")
+    args = parser.parse_args()
+
+    allowed = [q for q in SAMPLE_QUERIES if legacy_classify(q) == "allowed"]
+    blocked = [q for q in SAMPLE_QUERIES if legacy_classify(q) != "allowed"]
+    _compare("Query checks, allowed queries", legacy_classify, scanner_classify, allowed, args.repeat)
+    _compare("Query checks, blocked queries", legacy_classify, scanner_classify, blocked, args.repeat)
+
+    # Responses are the top-3 policy chunks joined, so use similar-sized slices of the policy
+    policy_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "insurance_policy.txt")
+    with open(policy_file, encoding="utf-8") as f:
+        policy = f.read()
+    responses = [policy[i:i + 1500] for i in range(0, len(policy), 1500)][:20]
+    _compare("Response compliance checks", legacy_response_issues, scanner_response_issues, responses, max(args.repeat // 10, 1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Offline routing accuracy and latency for the keyword intent router.
+
+Usage: python scripts/evaluate_router.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.router import IntentRouter  # noqa: E402
+
+# (query, expected agent); None means the supervisor should decide
+LABELED_QUERIES = [
+    ("What does my policy cover for flood?", "insurance_agent"),
+    ("How do I lodge a claim for hail damage?", "insurance_agent"),
+    ("Will my premium go up after a claim?", "insurance_agent"),
+    ("What is the excess on my car insurance?", "insurance_agent"),
+    ("Give me the latest news on Tesla", "news_agent"),
+    ("Any headlines about Nvidia today?", "news_agent"),
+    ("What did Apple say in its latest press release?", "news_agent"),
+    ("What are Microsoft's earnings and revenue this year?", "fundamental_agent"),
+    ("What is the P/E ratio of Amazon?", "fundamental_agent"),
+    ("Show me Coca-Cola's dividend and market cap", "fundamental_agent"),
+    ("What is the RSI for NVDA?", "technical_agent"),
+    ("Is the 50 day moving average crossing for AMD?", "technical_agent"),
+    ("Show the MACD and momentum for Meta", "technical_agent"),
+    ("Tell me some humorous news", "humorous_news_agent"),
+    ("Share a funny news story about Dynatrace", "humorous_news_agent"),
+    ("Give me some fake news", "humorous_news_agent"),
+    ("Do a stock analysis of AAPL", None),
+    ("Analyze Google for me", None),
+    ("Compare Tesla and Ford", None),
+    ("Any news on the monetary policy?", None),
+    ("What's the dividend and news for KO?", None),
+    ("Hello, who are you?", None),
+    ("What's the weather like in Sydney?", None),
+]
+
+
+def main():
+    router = IntentRouter()
+    results = router.evaluate(LABELED_QUERIES)
+    print(f"queries:   {results['queries']}")
+    print(f"accuracy:  {results['accuracy']:.1%}")
+    print(f"coverage:  {results['coverage']:.1%} routed without the supervisor")
+    print(f"misrouted: {results['misrouted']}")
+
+    for query, expected in LABELED_QUERIES:
+        agent = router.route(query).agent
+        if agent != expected:
+            print(f"  - {query!r}: expected={expected} routed={agent}")
+
+    queries = [query for query, _ in LABELED_QUERIES]
+    repeat = 2000
+    seconds = min(timeit.repeat(lambda: [router._classify(q) for q in queries], number=repeat, repeat=3))
+    print(f"router latency: {seconds / (repeat * len(queries)) * 1e6:.1f} µs/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""Load test of the compiled supervisor graph with local stand-ins for every external service.
+
+Chat models, embeddings, Tavily search, Yahoo Finance news and LangChain Hub
+prompts are replaced by deterministic fakes with configurable latency, so the
+numbers measure the graph, the agents' own code and the event loop, not the
+network. Runs N concurrent sessions and reports latency percentiles,
+time-to-first-token and queries/sec.
+
+Usage: python scripts/load_test.py --sessions 20 --queries 5 --llm-latency 0.2 --tokens-per-second 200
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from langchain_core.embeddings import DeterministicFakeEmbedding  # noqa: E402
+from langchain_core.language_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult  # noqa: E402
+from langchain_core.prompts import ChatPromptTemplate  # noqa: E402
+from langchain_core.runnables import RunnableConfig  # noqa: E402
+from langchain_core.tools import BaseTool  # noqa: E402
+from langchain_core.utils.function_calling import convert_to_openai_tool  # noqa: E402
+from pydantic import BaseModel, Field  # noqa: E402
+
+from agents.router import IntentRouter  # noqa: E402
+from utils.utils import astream_graph  # noqa: E402
+
+QUERIES = [
+    "How do I lodge a claim for hail damage?",
+    "What does my policy cover for flood?",
+    "Give me the latest news on Tesla",
+    "What is the P/E ratio of Amazon?",
+    "What is the RSI for NVDA?",
+    "Tell me some humorous news",
+]
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Scripted chat model that behaves like the real agents' models.
+
+    With ``transfer_to_*`` tools bound (the supervisor) it hands the query to
+    the agent the keyword router picks, then answers once control comes back.
+    With other tools bound (a ReAct sub-agent) it calls its first tool with
+    the query, then answers. Without tools (a RAG chain) it just answers.
+    Answers stream ``answer_tokens`` tokens at ``tokens_per_second`` after
+    ``first_token_latency`` seconds and carry usage metadata.
+    """
+
+    model_name: str = "fake-chat"
+    first_token_latency: float = 0.2
+    tokens_per_second: float = 200.0
+    answer_tokens: int = 40
+    router: Any = Field(default_factory=IntentRouter, exclude=True)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def bind_tools(self, tools: Sequence[Any], *, parallel_tool_calls: Optional[bool] = None, **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _plan(self, messages: List[BaseMessage], tools: Optional[List[dict]]) -> AIMessage:
+        names = [tool["function"]["name"] for tool in tools or []]
+        query = next((str(m.content) for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        handoffs = [name for name in names if name.startswith("transfer_to_")]
+
+        if handoffs:
+            turn = messages[max(i for i, m in enumerate(messages) if isinstance(m, HumanMessage)):]
+            # Control is back once an agent has answered; with history compaction the
+            # supervisor sees that answer but not the transfer_back_to_* messages
+            if not any(
+                (isinstance(m, ToolMessage) and (m.name or "").startswith("transfer_back_to_"))
+                or (isinstance(m, AIMessage) and m.content and not m.tool_calls)
+                for m in turn
+            ):
+                agent, _, _ = self.router._classify(query)
+                target = f"transfer_to_{agent}" if f"transfer_to_{agent}" in handoffs else handoffs[0]
+                return AIMessage(content="", tool_calls=[{"name": target, "args": {}, "id": f"call_{uuid.uuid4().hex}"}])
+        elif names and not (isinstance(messages[-1], ToolMessage) and messages[-1].name in names):
+            parameters = tools[0]["function"].get("parameters", {}).get("properties", {})
+            args = {next(iter(parameters), "query"): query}
+            return AIMessage(content="", tool_calls=[{"name": names[0], "args": args, "id": f"call_{uuid.uuid4().hex}"}])
+
+        words = f"[{self.model_name}] Stub answer to: {query}".split()
+        tokens = (words * (self.answer_tokens // max(len(words), 1) + 1))[:self.answer_tokens]
+        return AIMessage(content=" ".join(tokens))
+
+    def _usage(self, messages: List[BaseMessage], message: AIMessage) -> Dict[str, int]:
+        input_tokens = sum(len(str(m.content).split()) for m in messages)
+        output_tokens = len(str(message.content).split()) or 1
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _chunks(self, message: AIMessage) -> Iterator[AIMessageChunk]:
+        if message.tool_calls:
+            call = message.tool_calls[0]
+            yield AIMessageChunk(
+                content="",
+                tool_call_chunks=[{"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": 0}],
+            )
+            return
+        tokens = message.content.split(" ")
+        for i, token in enumerate(tokens):
+            yield AIMessageChunk(content=token if i == 0 else " " + token)
+
+    def _total_latency(self, message: AIMessage) -> float:
+        return self.first_token_latency + len(str(message.content).split()) / self.tokens_per_second
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs) -> ChatResult:
+        message = self._plan(messages, tools)
+        time.sleep(self._total_latency(message))
+        message.usage_metadata = self._usage(messages, message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools=None, **kwargs) -> ChatResult:
+        message = self._plan(messages, tools)
+        await asyncio.sleep(self._total_latency(message))
+        message.usage_metadata = self._usage(messages, message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        message = self._plan(messages, tools)
+        time.sleep(self.first_token_latency)
+        for chunk in self._chunks(message):
+            time.sleep(1 / self.tokens_per_second)
+            if run_manager and isinstance(chunk.content, str) and chunk.content:
+                run_manager.on_llm_new_token(chunk.content)
+            yield ChatGenerationChunk(message=chunk)
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, message)))
+
+    async def _astream(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        message = self._plan(messages, tools)
+        await asyncio.sleep(self.first_token_latency)
+        for chunk in self._chunks(message):
+            await asyncio.sleep(1 / self.tokens_per_second)
+            if run_manager and isinstance(chunk.content, str) and chunk.content:
+                await run_manager.on_llm_new_token(chunk.content)
+            yield ChatGenerationChunk(message=chunk)
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, message)))
+
+
+class QueryInput(BaseModel):
+    query: str = Field(description="Search query")
+
+
+class FakeSearchTool(BaseTool):
+    """Stand-in for TavilySearch and YahooFinanceNewsTool returning canned results after ``latency`` seconds."""
+
+    name: str = "tavily_search"
+    description: str = "Search the web for news."
+    args_schema: type = QueryInput
+    latency: float = 0.3
+
+    def _result(self, query: str) -> str:
+        return json.dumps({"query": query, "results": [
+            {"title": f"Result {i} for {query}", "content": f"Canned content {i} about {query}."} for i in range(3)
+        ]})
+
+    def _run(self, query: str, **kwargs) -> str:
+        time.sleep(self.latency)
+        return self._result(query)
+
+    async def _arun(self, query: str, **kwargs) -> str:
+        await asyncio.sleep(self.latency)
+        return self._result(query)
+
+
+class FakeEmbeddings(DeterministicFakeEmbedding):
+    """Deterministic embeddings that take ``latency`` seconds per call."""
+
+    model: str = "fake-embedding"
+    latency: float = 0.0
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        time.sleep(self.latency)
+        return super().embed_query(text)
+
+
+def fake_pull_prompt(owner_repo: str, cache_dir: Optional[str] = None) -> ChatPromptTemplate:
+    """Local copies of the Hub prompts the agents pull."""
+    if owner_repo == "langchain-ai/retrieval-qa-chat":
+        return ChatPromptTemplate.from_messages([("system", "Answer from the context:\n{context}"), ("human", "{input}")])
+    return ChatPromptTemplate.from_messages([("human", "Context: {context}\nQuestion: {question}\nAnswer:")])
+
+
+@contextlib.contextmanager
+def fake_services(
+    llm_latency: float = 0.2,
+    tokens_per_second: float = 200.0,
+    tool_latency: float = 0.3,
+    embedding_latency: float = 0.0,
+):
+    """Patch every external client the agents construct; build agents inside this block."""
+    import core.index_store
+
+    def chat_model(*args, **kwargs):
+        return FakeChatModel(
+            model_name=str(args[0] if args else kwargs.get("model", "fake-chat")),
+            first_token_latency=llm_latency,
+            tokens_per_second=tokens_per_second,
+        )
+
+    def search_tool(name):
+        return lambda *args, **kwargs: FakeSearchTool(name=name, latency=tool_latency)
+
+    def embeddings(*args, **kwargs):
+        return FakeEmbeddings(size=256, latency=embedding_latency)
+
+    with contextlib.ExitStack() as stack, tempfile.TemporaryDirectory() as index_dir:
+        def patch(target: str, value: Any):
+            stack.enter_context(mock.patch(target, value))
+
+        # Tool clients are created when the agent modules are imported
+        patch("tools.news_tool.TavilySearch", search_tool("tavily_search"))
+        patch("tools.fundamental_tool.YahooFinanceNewsTool", search_tool("yahoo_finance_news"))
+        patch("tools.technical_tool.YahooFinanceNewsTool", search_tool("yahoo_finance_news"))
+        patch("agents.news_agent.web_search", search_tool("tavily_search")())
+        patch("agents.fundamental_agent.my_fundamental_tool", search_tool("yahoo_finance_news")())
+        patch("agents.technical_agent.my_technical_tool", search_tool("yahoo_finance_news")())
+
+        # Every model and embedding client is built by the shared HTTP client factory
+        patch("core.http_clients.init_chat_model", chat_model)
+        patch("core.http_clients.OpenAIEmbeddings", embeddings)
+        patch("agents.humorous_news_agent.pull_prompt", fake_pull_prompt)
+        patch("tools.news_tool.pull_prompt", fake_pull_prompt)
+
+        # Keep fake vectors out of the real on-disk index cache
+        stack.enter_context(mock.patch.object(core.index_store.index_store, "cache_dir", Path(index_dir)))
+        yield
+
+
+async def run_query(graph, query: str, thread_id: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    first_token = None
+
+    def callback(message: dict):
+        nonlocal first_token
+        content = message.get("content")
+        if first_token is None and isinstance(content, AIMessageChunk) and isinstance(content.content, str) and content.content:
+            first_token = time.perf_counter()
+
+    error = None
+    try:
+        await astream_graph(
+            graph,
+            {"messages": [HumanMessage(content=query)]},
+            callback=callback,
+            config=RunnableConfig(recursion_limit=100, thread_id=thread_id),
+        )
+    except Exception as e:
+        error = str(e)
+    return {
+        "latency": time.perf_counter() - start,
+        "ttft": first_token - start if first_token else None,
+        "error": error,
+    }
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+async def run_load_test(graph, sessions: int, queries_per_session: int, queries: Sequence[str] = QUERIES) -> Dict[str, Any]:
+    """Drive ``graph`` with ``sessions`` concurrent conversations and summarize the results."""
+
+    async def session(index: int) -> List[Dict[str, Any]]:
+        thread_id = f"load-{index}"
+        return [
+            await run_query(graph, queries[(index + turn) % len(queries)], thread_id)
+            for turn in range(queries_per_session)
+        ]
+
+    start = time.perf_counter()
+    results = [result for batch in await asyncio.gather(*(session(i) for i in range(sessions))) for result in batch]
+    wall = time.perf_counter() - start
+
+    succeeded = [result for result in results if result["error"] is None]
+    return {
+        "sessions": sessions,
+        "queries": len(results),
+        "errors": len(results) - len(succeeded),
+        "wall_s": wall,
+        "qps": len(succeeded) / wall if wall else 0.0,
+        "latency_s": _percentiles([result["latency"] for result in succeeded]),
+        "ttft_s": _percentiles([result["ttft"] for result in succeeded if result["ttft"] is not None]),
+        "first_errors": list(dict.fromkeys(result["error"] for result in results if result["error"]))[:3],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent conversations")
+    parser.add_argument("--queries", type=int, default=5, help="queries per conversation")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds to the first token of each LLM call")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="LLM streaming rate")
+    parser.add_argument("--tool-latency", type=float, default=0.3, help="seconds per search/finance tool call")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="seconds per embedding call")
+    parser.add_argument("--fan-out", action="store_true", help="use the parallel stock analysis supervisor")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    # The agents print per-query debug output; keep it out of the report
+    with fake_services(args.llm_latency, args.tokens_per_second, args.tool_latency, args.embedding_latency), \
+            contextlib.redirect_stdout(open(os.devnull, "w")):
+        from agents.registry import AgentRegistry
+        from agents.supervisor_agent import supervisor_agent
+
+        registry = AgentRegistry(supervisor_factory=lambda *agents: supervisor_agent(*agents, fan_out=args.fan_out))
+        graph = registry.get_supervisor()
+        report = asyncio.run(run_load_test(graph, args.sessions, args.queries))
+
+    from core.history_compaction import get_history_compactor
+    history_compactor = get_history_compactor()
+    if history_compactor is not None:
+        report["history_compaction"] = history_compactor.stats()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"sessions: {report['sessions']}  queries: {report['queries']}  errors: {report['errors']}")
+    print(f"wall: {report['wall_s']:.2f}s  throughput: {report['qps']:.2f} queries/s")
+    for label, key in (("latency", "latency_s"), ("ttft", "ttft_s")):
+        p = report[key]
+        print(f"{label:8} p50={p['p50']:.3f}s  p95={p['p95']:.3f}s  p99={p['p99']:.3f}s")
+    if "history_compaction" in report:
+        compaction = report["history_compaction"]
+        print(f"supervisor prompt tokens: {compaction['tokens_before']} -> {compaction['tokens_after']} ({compaction['saved_rate']:.1%} saved by history compaction)")
+    for error in report["first_errors"]:
+        print(f"  error: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,20 @@
 """Unit tests for agents."""
+import asyncio
+import time
 import pytest
 from unittest.mock import Mock, patch
 from agents.improved_news_agent import NewsAgent
 from agents.improved_fundamental_agent import FundamentalAgent
+from agents import humorous_news_agent, insurance_agent
+from agents.registry import AgentRegistry
+from agents.router import IntentRouter
+from agents.stock_analysis_agent import stock_analysis_agent
+from core.checkpointer import BoundedMemorySaver, get_shared_checkpointer
 from core.exceptions import AgentInitializationError, ToolExecutionError
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import StateGraph, MessagesState, START, END
+from tests.test_core import ScriptedChatModel
+from utils.utils import astream_graph, BudgetExceeded, QueryBudget, StreamMetrics
 
 class TestNewsAgent:
     """Test cases for NewsAgent."""
@@ -61,5 +72,279 @@ class TestFundamentalAgent:
         assert "fundamental analysis" in prompt.lower()
         assert "financial health" in prompt.lower()
 
+class TestAgentRegistry:
+    """Test cases for AgentRegistry."""
+    
+    def test_builds_supervisor_once(self):
+        """Test agents are constructed and compiled only on first use."""
+        factories = {"news_agent": Mock(return_value="news"), "insurance_agent": Mock(return_value="insurance")}
+        supervisor_factory = Mock()
+        registry = AgentRegistry(factories, supervisor_factory)
+        
+        first = registry.get_supervisor()
+        second = registry.get_supervisor()
+        
+        assert first is second
+        supervisor_factory.assert_called_once_with("news", "insurance")
+        assert supervisor_factory.return_value.compile.call_count == 1
+        for factory in factories.values():
+            factory.assert_called_once_with()
+    
+    def test_records_build_timings(self):
+        """Test build timings are exposed per component."""
+        registry = AgentRegistry({"news_agent": Mock()}, Mock())
+        registry.get_supervisor()
+        
+        assert set(registry.timings) == {"news_agent", "supervisor_compile", "total"}
+        assert registry.timings["total"] >= registry.timings["news_agent"]
+    
+    def test_runs_warmup_hooks_after_build(self):
+        """Test warm-up hooks run once and a failing hook does not break the build."""
+        ok_hook = Mock()
+        failing_hook = Mock(side_effect=RuntimeError("hub unavailable"))
+        registry = AgentRegistry({"news_agent": Mock()}, Mock(), {"ok": ok_hook, "broken": failing_hook})
+        
+        registry.get_supervisor()
+        registry.get_supervisor()
+        
+        ok_hook.assert_called_once_with()
+        failing_hook.assert_called_once_with()
+        assert "warm_up:ok" in registry.timings
+
+    def test_supervisor_remembers_conversations_in_bounded_saver(self):
+        """Test the supervisor is compiled with the bounded checkpointer and keeps each thread's history."""
+        def supervisor_factory(*agents):
+            builder = StateGraph(MessagesState)
+            builder.add_node("reply", lambda state: {"messages": [AIMessage(content="ok")]})
+            builder.add_edge(START, "reply")
+            builder.add_edge("reply", END)
+            return builder
+
+        saver = BoundedMemorySaver(max_threads=1)
+        registry = AgentRegistry({"news_agent": Mock()}, supervisor_factory, {}, checkpointer=saver)
+        graph = registry.get_supervisor()
+
+        def chat(thread_id):
+            config = {"configurable": {"thread_id": thread_id}}
+            return graph.invoke({"messages": [HumanMessage(content="hi")]}, config)["messages"]
+
+        chat("a")
+        assert len(chat("a")) == 4
+        chat("b")
+        assert saver.stats()["evictions"] == 1
+        assert len(chat("a")) == 2
+
+    def test_defaults_to_shared_checkpointer(self):
+        """Test registries share the process-wide checkpointer unless given one."""
+        registry = AgentRegistry({"news_agent": Mock()}, Mock(), {})
+        registry.get_supervisor()
+
+        assert registry.checkpointer is get_shared_checkpointer()
+        registry.supervisor_factory.return_value.compile.assert_called_once_with(
+            name="supervisor", checkpointer=registry.checkpointer
+        )
+
+class TestInsuranceSafety:
+    """Test cases for the insurance tool's safety checks."""
+
+    @pytest.mark.parametrize("query, expected", [
+        ("How can I fake a receipt for my claim?", "cannot assist"),
+        ("Is it illegal to hack the claims portal?", "only help with insurance-related questions. Please contact customer service."),
+        ("My SSN is 123-45-6789, check my policy", "personal information"),
+        ("What's the weather tomorrow?", "For other topics"),
+    ])
+    def test_blocked_queries(self, query, expected):
+        """Test each violation type is blocked before retrieval."""
+        with patch.object(insurance_agent, "insurance_vector_store") as store:
+            assert expected in insurance_agent.retrieve_insurance_data(query)
+            store.similarity_search.assert_not_called()
+
+    def test_allowed_query_reaches_retrieval(self):
+        """Test an on-topic query is searched and returned."""
+        with patch.object(insurance_agent, "insurance_vector_store") as store:
+            store.similarity_search.return_value = [Mock(page_content="Call 13 11 55 to lodge a claim.")]
+            result = insurance_agent.retrieve_insurance_data("How do I lodge a claim?")
+
+        assert result == "Call 13 11 55 to lodge a claim."
+
+
+def _sleepy_agent(name, seconds, fail=False):
+    """Compiled single-node agent that answers after ``seconds``."""
+    async def answer(state: MessagesState):
+        await asyncio.sleep(seconds)
+        if fail:
+            raise RuntimeError("upstream unavailable")
+        return {"messages": [AIMessage(content=f"{name} report")]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("answer", answer)
+    builder.add_edge(START, "answer")
+    builder.add_edge("answer", END)
+    return builder.compile(name=name)
+
+
+class TestStockAnalysisAgent:
+    """Test cases for the parallel stock analysis agent."""
+
+    def test_branches_run_concurrently_and_merge_in_order(self):
+        """Test total time tracks the slowest branch and sections keep agent order."""
+        agent = stock_analysis_agent([
+            _sleepy_agent("news_agent", 0.3),
+            _sleepy_agent("fundamental_agent", 0.1),
+            _sleepy_agent("technical_agent", 0.2),
+        ])
+
+        start = time.perf_counter()
+        result = asyncio.run(agent.ainvoke({"messages": [HumanMessage(content="analyze AAPL")]}))
+        elapsed = time.perf_counter() - start
+
+        merged = result["messages"][-1]
+        assert elapsed < 0.55
+        assert merged.name == "stock_analysis_agent"
+        assert merged.content.index("news_agent report") < merged.content.index("fundamental_agent report") \
+            < merged.content.index("technical_agent report")
+        latencies = merged.response_metadata["branch_latencies"]
+        assert list(latencies) == ["news_agent", "fundamental_agent", "technical_agent"]
+        assert latencies["news_agent"] >= 0.3 > latencies["fundamental_agent"]
+
+    def test_failed_branch_does_not_sink_the_others(self):
+        """Test a failing sub-agent is reported in its section only."""
+        agent = stock_analysis_agent([
+            _sleepy_agent("news_agent", 0.01, fail=True),
+            _sleepy_agent("technical_agent", 0.01),
+        ])
+
+        result = asyncio.run(agent.ainvoke({"messages": [HumanMessage(content="analyze AAPL")]}))
+
+        content = result["messages"][-1].content
+        assert "news_agent failed: upstream unavailable" in content
+        assert "technical_agent report" in content
+
+    def test_branch_token_usage_counts_toward_budget(self):
+        """Test tokens spent in the unstreamed branches reach the stream metrics and the token budget."""
+        def model_agent(name):
+            model = ScriptedChatModel(replies=[AIMessage(
+                content=f"{name} report", usage_metadata={"input_tokens": 10, "output_tokens": 2, "total_tokens": 12},
+            )])
+            builder = StateGraph(MessagesState)
+            builder.add_node("agent", lambda state: {"messages": [model.invoke(state["messages"])]})
+            builder.add_edge(START, "agent")
+            builder.add_edge("agent", END)
+            return builder.compile(name=name)
+
+        def build():
+            return stock_analysis_agent([model_agent("news_agent"), model_agent("technical_agent")])
+
+        inputs = {"messages": [HumanMessage(content="analyze AAPL")]}
+        metrics = StreamMetrics("stock_analysis_agent")
+        asyncio.run(astream_graph(build(), inputs, callback=lambda m: None, metrics=metrics))
+        assert metrics.total_tokens() == 24
+
+        with pytest.raises(BudgetExceeded, match="token"):
+            asyncio.run(astream_graph(build(), inputs, callback=lambda m: None, budget=QueryBudget(max_tokens=20, max_seconds=0)))
+
+
+class TestHumorousNewsAgent:
+    """Test cases for the humorous news RAG chain."""
+
+    def test_chain_requires_loaded_index(self, monkeypatch):
+        """Test building the chain before the agent has loaded its index raises a clear error."""
+        monkeypatch.setattr(humorous_news_agent, "vector_store", None)
+        monkeypatch.setattr(humorous_news_agent, "rag_chain", None)
+
+        with pytest.raises(AgentInitializationError, match="fake news index"):
+            humorous_news_agent.warm_up()
+
+
+class TestIntentRouter:
+    """Test cases for the deterministic pre-router."""
+
+    @pytest.mark.parametrize("query, expected", [
+        ("What does my policy cover for flood?", "insurance_agent"),
+        ("Give me the latest news on Tesla", "news_agent"),
+        ("Tell me some fake news", "humorous_news_agent"),
+        ("What is the RSI for NVDA?", "technical_agent"),
+        ("Show the P/E ratio and earnings of MSFT", "fundamental_agent"),
+        ("Any news on Apple's P/E ratio?", "fundamental_agent"),
+        ("Is there a deductible on the coverage and what's the news?", "insurance_agent"),
+    ])
+    def test_obvious_intents_routed_directly(self, query, expected):
+        """Test clear single-agent queries bypass the supervisor."""
+        decision = IntentRouter().route(query)
+        assert decision.agent == expected
+        assert decision.method == "keywords"
+
+    @pytest.mark.parametrize("query, method", [
+        ("Do a stock analysis of AAPL", "multi_agent"),
+        ("Any news on the monetary policy?", "ambiguous"),
+        ("Funny news about a moving average crossover", "ambiguous"),
+        ("What new versions and steps are there?", "no_match"),
+    ])
+    def test_unclear_queries_fall_back(self, query, method):
+        """Test multi-agent, tied and unmatched queries go to the supervisor."""
+        decision = IntentRouter().route(query)
+        assert decision.agent is None
+        assert decision.method == method
+
+    def test_weighted_keywords(self):
+        """Test the score is the sum of keyword weights, not the hit count."""
+        router = IntentRouter(
+            keywords={"news_agent": ["news", "headlines"], "technical_agent": ["macd"]},
+            weights={"MACD": 3},
+        )
+
+        decision = router.route("news and headlines on the MACD")
+        assert decision.agent == "technical_agent"
+        assert decision.confidence == pytest.approx(1 / 3)
+        assert router.route("news and headlines on the momentum").agent == "news_agent"
+
+    def test_embedding_fallback(self):
+        """Test unmatched queries use description similarity when enabled."""
+        embeddings = Mock()
+        embeddings.embed_documents.return_value = [[1.0, 0.0], [0.0, 1.0]]
+        embeddings.embed_query.return_value = [0.1, 0.9]
+        router = IntentRouter(
+            keywords={"news_agent": ["news"]},
+            descriptions={"news_agent": "news", "insurance_agent": "insurance"},
+            embeddings=embeddings,
+        )
+
+        assert router.route("is my house covered?").agent == "insurance_agent"
+        assert router.route("is my car covered?").method == "embeddings"
+        embeddings.embed_documents.assert_called_once()
+
+    def test_metrics(self):
+        """Test saved latency and shadow accuracy come from observed handoffs."""
+        router = IntentRouter()
+        fallback = router.route("Do a stock analysis of AAPL")
+        router.record_handoff(fallback, "news_agent", elapsed=1.5)
+        direct = router.route("How do I lodge a claim?")
+        router.record_handoff(direct, "insurance_agent", elapsed=0.5)
+
+        stats = router.stats()
+        assert stats["direct"] == 1
+        assert stats["fallback"] == 1
+        assert stats["avg_supervisor_overhead_s"] == pytest.approx(1.0)
+        assert stats["estimated_saved_s"] == pytest.approx(1.0)
+        assert stats["shadow_accuracy"] == 1.0
+
+
+class TestLoadTestHarness:
+    """Test the load-test fakes drive the real supervisor graph end to end."""
+
+    def test_concurrent_sessions_complete(self):
+        """Test every query is routed, answered and timed without network access."""
+        from scripts.load_test import fake_services, run_load_test
+
+        with fake_services(llm_latency=0.01, tokens_per_second=5000, tool_latency=0.01):
+            graph = AgentRegistry().get_supervisor()
+            report = asyncio.run(run_load_test(graph, sessions=3, queries_per_session=2))
+
+        assert report["queries"] == 6
+        assert report["errors"] == 0, report["first_errors"]
+        assert report["qps"] > 0
+        assert 0 < report["ttft_s"]["p50"] <= report["latency_s"]["p50"]
+
+
 if __name__ == "__main__":
-    pytest.main([__file__])
\ No newline at end of file
+    pytest.main([__file__])
@@ -0,0 +1,226 @@
+"""Unit tests for the chat API service."""
+import asyncio
+import json
+import time
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages.ai import AIMessageChunk
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import StateGraph, MessagesState, START, END
+from starlette.testclient import TestClient
+from agents.router import IntentRouter
+from api.server import ChatService, create_app
+from core.response_cache import SemanticResponseCache
+from tests.test_core import BagOfWordsEmbeddings
+
+
+class FakeGraph:
+    """Stand-in compiled graph that streams fixed tokens after a delay."""
+
+    def __init__(self, tokens, delay: float = 0.0):
+        self.tokens = tokens
+        self.delay = delay
+        self.runs = 0
+
+    async def astream(self, inputs, config=None, stream_mode="messages", **kwargs):
+        self.runs += 1
+        for token in self.tokens:
+            await asyncio.sleep(self.delay)
+            yield AIMessageChunk(content=token), {"langgraph_node": "supervisor"}
+
+
+def _memory_graph(name="supervisor", checkpointer=True):
+    """Compiled graph whose single node answers with the number of messages it saw."""
+    def answer(state: MessagesState):
+        model = GenericFakeChatModel(messages=iter([AIMessage(content=f"answer after {len(state['messages'])} messages")]))
+        return {"messages": [model.invoke(state["messages"])]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node(name, answer)
+    builder.add_edge(START, name)
+    builder.add_edge(name, END)
+    return builder.compile(checkpointer=MemorySaver() if checkpointer else None)
+
+
+class SlowEmbeddings(BagOfWordsEmbeddings):
+    """Embeddings that block like a synchronous HTTP call to the embedding API."""
+
+    delay: float = 0.2
+
+    def embed_query(self, text):
+        time.sleep(self.delay)
+        return super().embed_query(text)
+
+
+class FailingEmbeddings(BagOfWordsEmbeddings):
+    """Embeddings whose endpoint is down."""
+
+    def embed_query(self, text):
+        raise ConnectionError("embedding endpoint unavailable")
+
+
+class FakeRegistry:
+    def __init__(self, graph):
+        self.graph = graph
+        self.agents = {}
+        self.is_built = False
+
+    def get_supervisor(self):
+        self.is_built = True
+        return self.graph
+
+
+def _parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+async def _collect(service, query, thread_id):
+    return [event async for event in service.stream(query, thread_id)]
+
+
+class TestChatService:
+    """Test cases for the chat service."""
+
+    def test_chat_streams_sse_events(self):
+        """Test /chat streams text events and a final done event for the thread."""
+        service = ChatService(registry=FakeRegistry(FakeGraph(["Hello", " world"])))
+        with TestClient(create_app(service)) as client:
+            response = client.post("/chat", json={"message": "hi", "thread_id": "t1"})
+
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = _parse_sse(response.text)
+        assert [event for event, _ in events] == ["text", "text", "done"]
+        assert events[-1][1]["content"] == "Hello world"
+        assert events[-1][1]["thread_id"] == "t1"
+
+    def test_rejects_empty_message(self):
+        """Test requests without a message are rejected before any graph run."""
+        graph = FakeGraph(["unused"])
+        with TestClient(create_app(ChatService(registry=FakeRegistry(graph)))) as client:
+            assert client.post("/chat", json={"message": " "}).status_code == 400
+            assert client.get("/health").json() == {"status": "ok", "supervisor_built": True}
+        assert graph.runs == 0
+
+    @pytest.mark.asyncio
+    async def test_conversations_run_concurrently(self):
+        """Test many conversations on one loop take about as long as one."""
+        service = ChatService(registry=FakeRegistry(FakeGraph(["a", "b"], delay=0.1)))
+        start = time.perf_counter()
+
+        results = await asyncio.gather(*(_collect(service, "hi", f"t{i}") for i in range(10)))
+
+        assert time.perf_counter() - start < 1.0
+        assert all(events[-1][0] == "done" for events in results)
+        assert service.stats()["completed"] == 10
+        assert service.stats()["active"] == 0
+
+    @pytest.mark.asyncio
+    async def test_timeout_reports_error(self):
+        """Test a slow graph ends the stream with an error event."""
+        service = ChatService(registry=FakeRegistry(FakeGraph(["a"] * 50, delay=0.05)), timeout_seconds=0.2)
+
+        events = await _collect(service, "hi", "t1")
+
+        assert events[-1][0] == "error"
+        assert service.stats()["timeouts"] == 1
+
+    @pytest.mark.asyncio
+    async def test_budget_exceeded_reports_error(self, monkeypatch):
+        """Test a query over its token budget is cancelled and ends with an error event."""
+        monkeypatch.setenv("QUERY_MAX_TOKENS", "3")
+        service = ChatService(registry=FakeRegistry(FakeGraph(["a"] * 50)))
+
+        events = await _collect(service, "hi", "t1")
+
+        assert [event for event, _ in events] == ["text"] * 3 + ["error"]
+        assert "token budget" in events[-1][1]["error"]
+        assert service.stats()["budget_exceeded"] == 1
+
+    @pytest.mark.asyncio
+    async def test_cache_lookups_do_not_block_the_loop(self):
+        """Test blocking embedding calls run off the event loop, so conversations still overlap."""
+        cache = SemanticResponseCache(SlowEmbeddings(), source_files={})
+        cache.store("unrelated question", "answer", vector=cache.embeddings.embed_query("unrelated question"))
+        service = ChatService(registry=FakeRegistry(FakeGraph(["a"])), response_cache=cache)
+        start = time.perf_counter()
+
+        results = await asyncio.gather(*(_collect(service, f"question {i}", f"t{i}") for i in range(5)))
+
+        assert all(events[-1][0] == "done" for events in results)
+        # Serialized on the loop, 5 lookups and 5 stores would take at least 2s
+        assert time.perf_counter() - start < 1.0
+
+    @pytest.mark.asyncio
+    async def test_cache_failure_falls_back_to_graph(self):
+        """Test a failing cache lookup is treated as a miss and the graph still answers."""
+        cache = SemanticResponseCache(FailingEmbeddings(), source_files={})
+        cache.store("earlier question", "answer", vector=[1.0] * 64)
+        graph = FakeGraph(["Hello", " world"])
+        service = ChatService(registry=FakeRegistry(graph), response_cache=cache)
+
+        events = await _collect(service, "hi", "t1")
+
+        assert [event for event, _ in events] == ["text", "text", "done"]
+        assert events[-1][1]["content"] == "Hello world"
+        assert graph.runs == 1
+        assert service.stats()["errors"] == 0
+
+    @pytest.mark.asyncio
+    async def test_cache_only_answers_opening_questions(self):
+        """Test follow-ups are never cached or served, and a served answer joins the thread's memory."""
+        graph = _memory_graph()
+        cache = SemanticResponseCache(BagOfWordsEmbeddings(), source_files={})
+        service = ChatService(registry=FakeRegistry(graph), response_cache=cache)
+
+        await _collect(service, "What is Apple's P/E?", "t1")
+        await _collect(service, "tell me more", "t1")
+        assert cache.stats()["entries"] == 1
+
+        served = await _collect(service, "What is Apple's P/E?", "t2")
+        assert served[-1][1]["cached"] is True
+        messages = (await graph.aget_state({"configurable": {"thread_id": "t2"}})).values["messages"]
+        assert [(type(m), m.content) for m in messages] == [
+            (HumanMessage, "What is Apple's P/E?"), (AIMessage, "answer after 1 messages"),
+        ]
+
+        follow_up = await _collect(service, "tell me more", "t2")
+        assert follow_up[-1][1]["cached"] is False
+        assert follow_up[-1][1]["content"] == "answer after 3 messages"
+        assert service.stats()["cache_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_routed_turn_joins_supervisor_thread(self):
+        """Test a directly routed query sees the thread so far and is recorded in it for follow-ups."""
+        graph = _memory_graph()
+        registry = FakeRegistry(graph)
+        registry.agents["news_agent"] = _memory_graph("news_agent", checkpointer=False)
+        service = ChatService(registry=registry, router=IntentRouter(), router_mode="on")
+
+        opening = await _collect(service, "Give me the latest news on Tesla", "t1")
+        assert opening[-1][1]["agent"] == "news_agent"
+        follow_up = await _collect(service, "tell me more", "t1")
+        assert follow_up[-1][1]["content"] == "answer after 3 messages"
+
+        routed = await _collect(service, "Any more news on Tesla?", "t1")
+        assert routed[-1][1]["content"] == "answer after 5 messages"
+        messages = (await graph.aget_state({"configurable": {"thread_id": "t1"}})).values["messages"]
+        assert len(messages) == 6
+
+    @pytest.mark.asyncio
+    async def test_repeated_question_served_from_cache(self):
+        """Test a repeated question is answered by the response cache without a graph run."""
+        graph = FakeGraph(["Call us."])
+        cache = SemanticResponseCache(BagOfWordsEmbeddings(), source_files={})
+        service = ChatService(registry=FakeRegistry(graph), response_cache=cache)
+
+        await _collect(service, "How do I lodge a claim?", "t1")
+        events = await _collect(service, "how do I lodge a claim", "t2")
+
+        assert graph.runs == 1
+        assert events[-1][1]["cached"] is True
+        assert events[-1][1]["content"] == "Call us."
@@ -0,0 +1,720 @@
+"""Unit tests for core services."""
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+import pytest
+from unittest.mock import Mock, patch
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import tool
+from langchain_core.prompts import ChatPromptTemplate
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import StateGraph, MessagesState, START, END
+from langgraph.prebuilt import create_react_agent
+from langgraph_supervisor import create_supervisor
+from core.checkpointer import BoundedMemorySaver
+from core.history_compaction import HistoryCompactor
+from core import http_clients
+from core.http_clients import LoopAwareAsyncClient, PoolStats
+from core.index_store import IndexStore
+from core.prompt_cache import pull_prompt, clear_prompt_cache
+from core.response_cache import SemanticResponseCache, extract_entities, lookup_or_miss, store_quietly
+from core.safety import SafetyHit, SafetyScanner
+from core.telemetry import BoundedBatchSpanProcessor
+from core.ttl_cache import TTLCache
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Deterministic embeddings that record how many texts were embedded."""
+
+    embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    path = tmp_path / "policy.txt"
+    paragraphs = [f"Section {i}. " + ("Coverage details for clause %d. " % i) * 12 for i in range(6)]
+    path.write_text("\n\n".join(paragraphs), encoding="utf-8")
+    return path
+
+
+class TestIndexStore:
+    """Test cases for the persistent FAISS index store."""
+
+    def test_second_load_skips_embedding(self, tmp_path, corpus):
+        """Test an unchanged corpus is served from disk without embedding calls."""
+        first = CountingEmbeddings(size=16)
+        IndexStore(cache_dir=str(tmp_path / "cache")).load_or_build("policy", str(corpus), first)
+        assert first.embedded > 0
+
+        second = CountingEmbeddings(size=16)
+        store = IndexStore(cache_dir=str(tmp_path / "cache"))
+        vector_store = store.load_or_build("policy", str(corpus), second)
+
+        assert second.embedded == 0
+        assert store.stats["loads"] == 1
+        docs = vector_store.similarity_search("Section 3", k=2)
+        assert len(docs) == 2
+
+    def test_same_corpus_shares_one_store(self, tmp_path, corpus):
+        """Test repeated lookups in one process return the same instance."""
+        store = IndexStore(cache_dir=str(tmp_path / "cache"))
+        embeddings = CountingEmbeddings(size=16)
+
+        first = store.load_or_build("policy", str(corpus), embeddings)
+        second = store.load_or_build("policy", str(corpus), CountingEmbeddings(size=16))
+
+        assert first is second
+        assert store.stats["builds"] == 1
+
+    def test_only_changed_chunks_reembedded(self, tmp_path, corpus):
+        """Test editing one paragraph re-embeds only the affected chunks."""
+        cache_dir = str(tmp_path / "cache")
+        initial = CountingEmbeddings(size=16)
+        IndexStore(cache_dir=cache_dir).load_or_build("policy", str(corpus), initial)
+
+        corpus.write_text(corpus.read_text(encoding="utf-8") + "\n\nNew flood cover section.", encoding="utf-8")
+        updated = CountingEmbeddings(size=16)
+        store = IndexStore(cache_dir=cache_dir)
+        vector_store = store.load_or_build("policy", str(corpus), updated)
+
+        assert 0 < updated.embedded < initial.embedded
+        assert store.stats["chunks_reused"] > 0
+        contents = [doc.page_content for doc in vector_store.docstore._dict.values()]
+        assert any("flood" in content for content in contents)
+
+
+class TestPromptCache:
+    """Test cases for the hub prompt cache."""
+
+    def setup_method(self):
+        clear_prompt_cache()
+
+    def teardown_method(self):
+        clear_prompt_cache()
+
+    @patch('core.prompt_cache.hub.pull')
+    def test_pulls_once_per_process(self, mock_pull, tmp_path):
+        """Test repeated lookups reuse the resolved prompt."""
+        mock_pull.return_value = ChatPromptTemplate.from_messages([("human", "{question} {context}")])
+
+        first = pull_prompt("rlm/rag-prompt", cache_dir=str(tmp_path))
+        second = pull_prompt("rlm/rag-prompt", cache_dir=str(tmp_path))
+
+        assert first is second
+        assert mock_pull.call_count == 1
+
+    @patch('core.prompt_cache.hub.pull')
+    def test_offline_start_uses_disk_copy(self, mock_pull, tmp_path):
+        """Test a new process loads the cached prompt without the hub."""
+        prompt = ChatPromptTemplate.from_messages([("human", "{question} {context}")])
+        mock_pull.return_value = prompt
+        pull_prompt("rlm/rag-prompt", cache_dir=str(tmp_path))
+
+        clear_prompt_cache()
+        mock_pull.side_effect = ConnectionError("offline")
+        cached = pull_prompt("rlm/rag-prompt", cache_dir=str(tmp_path))
+
+        assert cached == prompt
+        assert mock_pull.call_count == 1
+
+
+class TestSafetyScanner:
+    """Test cases for the precompiled safety scanner."""
+
+    scanner = SafetyScanner(
+        keywords={"fraud": ["false claim", "steal money"], "abuse": ["steal"], "topic": ["claim", "policy"]},
+        patterns={"pii": [r"\b\d{3}-\d{2}-\d{4}\b", r"\b[\w.]+@[\w.]+\.\w{2,}\b"]},
+    )
+
+    def test_reports_every_hit_in_order(self):
+        """Test overlapping keywords and patterns are all returned by position."""
+        hits = self.scanner.scan("Can I STEAL MONEY with a False Claim? ssn 123-45-6789")
+
+        assert hits == [
+            SafetyHit("fraud", "steal money", 6),
+            SafetyHit("abuse", "steal", 6),
+            SafetyHit("fraud", "false claim", 25),
+            SafetyHit("topic", "claim", 31),
+            SafetyHit("pii", "123-45-6789", 42),
+        ]
+
+    def test_categories(self):
+        """Test substring keyword semantics and pattern categories."""
+        assert self.scanner.categories("policy for claims@example.com") == {"topic", "pii"}
+        assert self.scanner.categories("nothing relevant") == set()
+
+
+class BlockingExporter(InMemorySpanExporter):
+    """In-memory exporter that holds every export until released."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def export(self, spans):
+        self.release.wait(5)
+        return super().export(spans)
+
+
+def _tracer(processor):
+    provider = TracerProvider(shutdown_on_exit=False)
+    provider.add_span_processor(processor)
+    return provider.get_tracer(__name__)
+
+
+class TestBoundedBatchSpanProcessor:
+    """Test cases for the batching span processor."""
+
+    def test_exports_in_batches_on_flush(self):
+        """Test spans are queued off the request path and exported on flush."""
+        exporter = InMemorySpanExporter()
+        processor = BoundedBatchSpanProcessor(exporter, schedule_delay_millis=60_000, max_export_batch_size=4)
+        tracer = _tracer(processor)
+
+        for i in range(10):
+            with tracer.start_as_current_span(f"span-{i}"):
+                pass
+
+        assert processor.force_flush(5000)
+        assert len(exporter.get_finished_spans()) == 10
+        stats = processor.stats()
+        assert stats["exported"] == 10
+        assert stats["batches"] >= 3
+        assert stats["dropped"] == 0
+        processor.shutdown()
+
+    def test_full_queue_drops_and_counts(self):
+        """Test spans beyond the queue bound are dropped, not blocked on."""
+        exporter = BlockingExporter()
+        processor = BoundedBatchSpanProcessor(exporter, max_queue_size=2, max_export_batch_size=1)
+        tracer = _tracer(processor)
+
+        for i in range(20):
+            with tracer.start_as_current_span(f"span-{i}"):
+                pass
+
+        assert processor.stats()["dropped"] > 0
+        exporter.release.set()
+        processor.shutdown()
+        stats = processor.stats()
+        assert stats["exported"] + stats["dropped"] == 20
+        assert stats["queued"] == 0
+
+    def test_shutdown_flushes_pending_spans(self):
+        """Test shutdown exports whatever is still queued."""
+        exporter = InMemorySpanExporter()
+        processor = BoundedBatchSpanProcessor(exporter, schedule_delay_millis=60_000)
+        tracer = _tracer(processor)
+
+        with tracer.start_as_current_span("last-span"):
+            pass
+        processor.shutdown()
+
+        assert [span.name for span in exporter.get_finished_spans()] == ["last-span"]
+
+
+def _echo_graph(checkpointer):
+    def reply(state: MessagesState):
+        return {"messages": [AIMessage(content="ok " * 50)]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("reply", reply)
+    builder.add_edge(START, "reply")
+    builder.add_edge("reply", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def _chat(graph, thread_id, text="hello"):
+    config = {"configurable": {"thread_id": thread_id}}
+    return graph.invoke({"messages": [HumanMessage(content=text)]}, config)
+
+
+class TestBoundedMemorySaver:
+    """Test cases for the bounded conversation checkpointer."""
+
+    def test_evicts_least_recently_used_thread(self):
+        """Test the thread cap drops the idlest thread, not the active ones."""
+        saver = BoundedMemorySaver(max_threads=2)
+        graph = _echo_graph(saver)
+
+        _chat(graph, "a")
+        _chat(graph, "b")
+        _chat(graph, "a")
+        _chat(graph, "c")
+
+        stats = saver.stats()
+        assert stats["resident_threads"] == 2
+        assert stats["evictions"] == 1
+        assert "b" not in saver.storage
+        assert len(_chat(graph, "a")["messages"]) == 6
+
+    def test_byte_budget_bounds_resident_size(self):
+        """Test resident bytes stay under the cap as new threads arrive."""
+        saver = BoundedMemorySaver(max_bytes=20_000)
+        graph = _echo_graph(saver)
+
+        for i in range(20):
+            _chat(graph, f"thread-{i}")
+
+        stats = saver.stats()
+        assert stats["resident_bytes"] <= 20_000
+        assert stats["evictions"] > 0
+        assert stats["resident_threads"] < 20
+
+    def test_spilled_thread_restored_on_access(self, tmp_path):
+        """Test an evicted thread comes back from SQLite with its history."""
+        saver = BoundedMemorySaver(max_threads=1, spill_path=str(tmp_path / "threads.sqlite"))
+        graph = _echo_graph(saver)
+
+        _chat(graph, "a", "first")
+        _chat(graph, "b")
+        assert saver.stats()["spilled_threads"] == 1
+
+        result = _chat(graph, "a", "second")
+
+        assert [m.content for m in result["messages"] if isinstance(m, HumanMessage)] == ["first", "second"]
+        assert saver.stats()["spilled_threads"] == 1
+        assert "b" not in saver.storage
+
+    def test_history_capped_per_thread(self):
+        """Test old checkpoints are pruned while the latest state stays complete."""
+        saver = BoundedMemorySaver(max_checkpoints_per_thread=3)
+        graph = _echo_graph(saver)
+
+        for i in range(5):
+            result = _chat(graph, "a", f"turn {i}")
+
+        assert len(saver.storage["a"][""]) == 3
+        assert len(list(saver.list({"configurable": {"thread_id": "a"}}))) == 3
+        assert len(result["messages"]) == 10
+
+
+    def test_thread_evicted_mid_run_keeps_complete_checkpoints(self):
+        """Test a thread dropped between steps stores its next checkpoint with every channel."""
+        saver = BoundedMemorySaver(max_threads=1)
+
+        def put(thread_id, values, versions, new_versions):
+            checkpoint = {**empty_checkpoint(), "channel_values": values, "channel_versions": versions}
+            saver.put({"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}, checkpoint, {}, new_versions)
+
+        put("a", {"messages": ["hi"], "topic": "x"}, {"messages": 1, "topic": 1}, {"messages": 1, "topic": 1})
+        put("b", {"messages": ["other"]}, {"messages": 1}, {"messages": 1})
+        assert "a" not in saver.storage
+        put("a", {"messages": ["hi", "ok"], "topic": "x"}, {"messages": 2, "topic": 1}, {"messages": 2})
+
+        values = saver.get_tuple({"configurable": {"thread_id": "a"}}).checkpoint["channel_values"]
+        assert values == {"messages": ["hi", "ok"], "topic": "x"}
+
+
+    def _supervisor(self, saver, turns):
+        @tool
+        def search(query: str) -> str:
+            """Search the news."""
+            return "y" * 300
+
+        news_model = ScriptedChatModel(replies=[
+            reply
+            for n in range(turns)
+            for reply in (AIMessage(content="", tool_calls=[_tool_call("search", f"s{n}", query="aapl")]), AIMessage(content=f"news answer {n}"))
+        ])
+        supervisor_model = ScriptedChatModel(replies=[
+            reply
+            for n in range(turns)
+            for reply in (AIMessage(content="", tool_calls=[_tool_call("transfer_to_news_agent", f"h{n}")]), AIMessage(content=f"final answer {n}"))
+        ])
+        return create_supervisor(
+            [create_react_agent(news_model, [search], name="news_agent")],
+            model=supervisor_model,
+            add_handoff_back_messages=True,
+            output_mode="full_history",
+        ).compile(checkpointer=saver)
+
+    def test_supervisor_subgraph_history_is_capped(self):
+        """Test handoff subgraph namespaces count towards the cap and go with their parent checkpoint."""
+        saver = BoundedMemorySaver(max_checkpoints_per_thread=4)
+        graph = self._supervisor(saver, turns=6)
+
+        for n in range(6):
+            result = _chat(graph, "a", f"question {n}")
+
+        namespaces = saver.storage["a"]
+        assert sum(len(checkpoints) for checkpoints in namespaces.values()) <= 4
+        assert len(namespaces) <= 2
+        assert {key[1] for key in saver.blobs if key[0] == "a"} <= set(namespaces)
+        assert {key[1] for key in saver.writes if key[0] == "a" and saver.writes[key]} <= set(namespaces)
+        assert [m.content for m in result["messages"] if isinstance(m, HumanMessage)] == [f"question {n}" for n in range(6)]
+        assert result["messages"][-1].content == "final answer 5"
+
+    def test_active_thread_trimmed_to_byte_budget(self):
+        """Test a single long thread over max_bytes keeps only its latest state instead of growing."""
+        unbounded = BoundedMemorySaver(max_checkpoints_per_thread=1000)
+        saver = BoundedMemorySaver(max_bytes=1, max_checkpoints_per_thread=1000)
+
+        for checkpointer in (unbounded, saver):
+            graph = self._supervisor(checkpointer, turns=4)
+            for n in range(4):
+                result = _chat(graph, "a", f"question {n}")
+
+        assert len(saver.storage["a"][""]) == 1
+        assert saver.stats()["resident_bytes"] < unbounded.stats()["resident_bytes"] / 3
+        assert len(result["messages"]) == len(graph.get_state({"configurable": {"thread_id": "a"}}).values["messages"])
+        assert [m.content for m in result["messages"] if isinstance(m, HumanMessage)] == [f"question {n}" for n in range(4)]
+
+
+class FakeClock:
+    """Manually advanced clock for expiry tests."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache:
+    """Test cases for the TTL cache."""
+
+    def test_entries_expire(self):
+        """Test values are served until the TTL passes, then reloaded."""
+        clock = FakeClock()
+        cache = TTLCache(ttl_seconds=60, clock=clock)
+        loader = Mock(side_effect=["v1", "v2"])
+
+        assert cache.get_or_compute("AAPL", loader) == "v1"
+        clock.now += 30
+        assert cache.get_or_compute("AAPL", loader) == "v1"
+        clock.now += 31
+        assert cache.get_or_compute("AAPL", loader) == "v2"
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 2
+
+    def test_disk_copy_survives_restart(self, tmp_path):
+        """Test a new cache instance reads live entries from disk."""
+        clock = FakeClock()
+        TTLCache(ttl_seconds=60, cache_dir=str(tmp_path), clock=clock).set("AAPL", "report")
+
+        restarted = TTLCache(ttl_seconds=60, cache_dir=str(tmp_path), clock=clock)
+        assert restarted.get("AAPL") == "report"
+        assert restarted.stats()["disk_hits"] == 1
+        clock.now += 61
+        assert TTLCache(ttl_seconds=60, cache_dir=str(tmp_path), clock=clock).get("AAPL") is None
+
+    def test_concurrent_misses_load_once(self):
+        """Test callers missing the same key together share one load."""
+        cache = TTLCache(ttl_seconds=60)
+        started = threading.Event()
+        calls = []
+
+        def slow_loader():
+            calls.append(1)
+            started.set()
+            time.sleep(0.05)
+            return "report"
+
+        threads = [threading.Thread(target=cache.get_or_compute, args=("AAPL", slow_loader)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert cache.get("AAPL") == "report"
+
+
+class BagOfWordsEmbeddings(CountingEmbeddings):
+    """Embeddings where queries sharing most words are close, counting queries embedded."""
+
+    size: int = 64
+
+    def embed_query(self, text):
+        self.embedded += 1
+        vector = [0.0] * self.size
+        for word in text.split():
+            vector[sum(map(ord, word)) % self.size] += 1.0
+        return vector
+
+
+class TestSemanticResponseCache:
+    """Test cases for the semantic response cache."""
+
+    def _cache(self, clock, **kwargs):
+        embeddings = BagOfWordsEmbeddings()
+        kwargs.setdefault("source_files", {})
+        return SemanticResponseCache(embeddings, threshold=0.8, clock=clock, **kwargs), embeddings
+
+    def test_exact_match_skips_embedding(self):
+        """Test a repeated query, modulo case and punctuation, is served without an embedding call."""
+        cache, embeddings = self._cache(FakeClock())
+        cache.store("How do I lodge a claim?", "Call us.", agent="insurance_agent", latency=4.0)
+        embedded = embeddings.embedded
+
+        hit = cache.lookup("how do I lodge a CLAIM")
+        assert hit.response.text == "Call us."
+        assert embeddings.embedded == embedded
+        assert cache.stats()["exact_hits"] == 1
+        assert cache.stats()["latency_saved_s"] > 3.9
+
+    def test_similar_query_hits_and_dissimilar_misses(self):
+        """Test only queries above the similarity threshold are served from the cache."""
+        cache, _ = self._cache(FakeClock())
+        cache.store("how do I lodge a claim with you", "Call us.", agent="insurance_agent")
+
+        hit = cache.lookup("how can I lodge a claim with you")
+        assert hit.response is not None and hit.similarity >= 0.8
+        miss = cache.lookup("latest headlines about nvidia")
+        assert miss.response is None and miss.vector is not None
+        stats = cache.stats()
+        assert (stats["semantic_hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+    def test_ttl_depends_on_agent(self):
+        """Test news answers expire before policy answers."""
+        clock = FakeClock()
+        cache, _ = self._cache(clock, agent_ttls={"news_agent": 60, "insurance_agent": 3600})
+        cache.store("tesla news", "Tesla did things.", agent="news_agent")
+        cache.store("what is my excess", "It is $500.", agent="insurance_agent")
+
+        clock.now += 61
+        assert cache.lookup("tesla news").response is None
+        assert cache.lookup("what is my excess").response is not None
+        assert cache.stats()["expired"] == 1
+
+    def test_source_file_change_invalidates(self, tmp_path):
+        """Test editing the policy file drops answers built from it."""
+        policy = tmp_path / "insurance_policy.txt"
+        policy.write_text("Excess is $500.", encoding="utf-8")
+        cache, _ = self._cache(FakeClock(), source_files={"insurance_agent": str(policy)})
+        cache.store("what is my excess", "It is $500.", agent="insurance_agent")
+        cache.store("tesla news", "Tesla did things.", agent="news_agent")
+        assert cache.lookup("what is my excess").response is not None
+
+        policy.write_text("Excess is $750 from July.", encoding="utf-8")
+        assert cache.lookup("what is my excess").response is None
+        assert cache.lookup("tesla news").response is not None
+        assert cache.stats()["invalidated"] == 1
+
+
+    def test_different_entity_is_not_served(self):
+        """Test a near-duplicate query about another company or figure misses."""
+        cache, _ = self._cache(FakeClock())
+        cache.store("What is the P/E ratio of Apple?", "Apple trades at 30x.", agent="fundamental_agent")
+
+        assert cache.lookup("what's the P/E ratio of Apple").response is not None
+        miss = cache.lookup("What is the P/E ratio of Amazon?")
+        assert miss.response is None
+        assert cache.lookup("What is the P/E ratio of Apple in 2021?").response is None
+        assert cache.stats()["entity_mismatches"] == 2
+
+    def test_extract_entities(self):
+        """Test tickers, numbers and names are extracted and question words are not."""
+        assert extract_entities("What is $AAPL's revenue for 2,024, and how did Tim Cook do?") == {
+            "aapl", "2024", "tim", "cook",
+        }
+        assert extract_entities("how do I lodge a claim") == frozenset()
+
+    def test_failing_embedder_fails_open(self):
+        """Test a cache whose embeddings are down behaves as a miss and skips storing."""
+        class FailingEmbeddings(BagOfWordsEmbeddings):
+            def embed_query(self, text):
+                raise ConnectionError("embedding endpoint unavailable")
+
+        cache = SemanticResponseCache(FailingEmbeddings(), source_files={})
+        cache.store("earlier question", "answer", vector=[1.0] * 64)
+
+        lookup = lookup_or_miss(cache, "a new question")
+        assert lookup.response is None and lookup.vector is None
+        assert not store_quietly(cache, "a new question", "answer", vector=lookup.vector)
+        assert cache.stats()["entries"] == 1
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+class TestHttpClients:
+    """Test cases for the shared HTTP connection pools."""
+
+    def test_sync_client_reuses_connections(self, local_server):
+        """Test sequential requests share one keep-alive connection and are counted."""
+        stats = PoolStats()
+        with httpx.Client(event_hooks={"request": [stats.request_hook]}) as client:
+            for _ in range(5):
+                assert client.get(local_server).text == "ok"
+
+        result = stats.stats()
+        assert result["requests"] == 5
+        assert result["connections_opened"] == 1
+        assert result["reuse_rate"] == pytest.approx(0.8)
+
+    def test_requests_session_traffic_not_in_reuse_rate(self, local_server, monkeypatch):
+        """Test calls through the requests session are counted apart, since their connection opens are not traced."""
+        stats = PoolStats()
+        monkeypatch.setattr(http_clients, "_stats", stats)
+        monkeypatch.setattr(http_clients, "_requests_session", None)
+        with httpx.Client(event_hooks={"request": [stats.request_hook]}) as client:
+            client.get(local_server)
+        session = http_clients.get_requests_session()
+        for _ in range(3):
+            assert session.get(local_server).text == "ok"
+
+        result = stats.stats()
+        assert (result["requests"], result["session_requests"]) == (1, 3)
+        assert result["reuse_rate"] == 0.0
+
+    def test_async_client_pools_per_event_loop(self, local_server):
+        """Test the async client works from several event loops, reusing connections within each."""
+        stats = PoolStats()
+        client = LoopAwareAsyncClient(stats)
+
+        async def burst():
+            for _ in range(3):
+                assert (await client.get(local_server)).text == "ok"
+            await client.aclose()
+
+        asyncio.run(burst())
+        asyncio.run(burst())
+
+        assert stats.stats()["requests"] == 6
+        assert stats.stats()["connections_opened"] == 2
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model that replies from a script and records every prompt it receives."""
+
+    replies: list
+    prompts: list = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.prompts.append(list(messages))
+        return ChatResult(generations=[ChatGeneration(message=self.replies.pop(0))])
+
+
+def _tool_call(name, call_id, **args):
+    return {"name": name, "args": args, "id": call_id, "type": "tool_call"}
+
+
+def _full_history_turn(n, result_size=2000):
+    """One question as the supervisor's state holds it with full history and handoff-back messages."""
+    return [
+        HumanMessage(content=f"question {n}"),
+        AIMessage(content="", name="supervisor", tool_calls=[_tool_call("transfer_to_news_agent", f"h{n}")]),
+        ToolMessage(content="Successfully transferred to news_agent", name="transfer_to_news_agent", tool_call_id=f"h{n}"),
+        AIMessage(content="", name="news_agent", tool_calls=[_tool_call("search", f"s{n}", query="news")]),
+        ToolMessage(content="x" * result_size, name="search", tool_call_id=f"s{n}"),
+        AIMessage(content=f"news answer {n}", name="news_agent"),
+        AIMessage(content="Transferring back to supervisor", name="news_agent", tool_calls=[_tool_call("transfer_back_to_supervisor", f"b{n}")]),
+        ToolMessage(content="Successfully transferred back to supervisor", name="transfer_back_to_supervisor", tool_call_id=f"b{n}"),
+        AIMessage(content=f"final answer {n}", name="supervisor"),
+    ]
+
+
+class TestHistoryCompactor:
+    """Test cases for the supervisor's history compaction."""
+
+    def test_drops_handoffs_and_old_tool_traffic(self):
+        """Test earlier turns keep only questions and answers, and the current turn keeps its own tool results."""
+        messages = _full_history_turn(1) + _full_history_turn(2)[:6]
+        compactor = HistoryCompactor(max_tokens=10_000)
+
+        compacted = compactor.compact(messages)
+
+        assert [message.content for message in compacted[:3]] == ["question 1", "news answer 1", "final answer 1"]
+        current = compacted[3:]
+        assert [type(message) for message in current] == [HumanMessage, AIMessage, ToolMessage, AIMessage]
+        assert current[1].tool_calls[0]["name"] == "search" and current[2].tool_call_id == current[1].tool_calls[0]["id"]
+        stats = compactor.stats()
+        assert stats["calls"] == 1 and stats["messages_dropped"] == 8
+        assert stats["tokens_saved"] == stats["last_tokens_saved"] > 500
+
+    def test_budget_drops_oldest_turns_first(self):
+        """Test earlier turns are dropped oldest first, while the current turn is always kept."""
+        messages = [message for n in range(20) for message in _full_history_turn(n)] + [HumanMessage(content="x" * 400)]
+        compactor = HistoryCompactor(max_tokens=200)
+
+        compacted = compactor.compact(messages)
+
+        questions = [message.content for message in compacted if isinstance(message, HumanMessage)]
+        assert questions[-1] == "x" * 400
+        assert len(questions) > 1 and questions[:-1] == [f"question {n}" for n in range(20 - len(questions) + 1, 20)]
+        assert compactor.stats()["turns_dropped"] == 20 - (len(questions) - 1)
+        assert HistoryCompactor(max_tokens=10).compact(messages) == messages[-1:]
+
+    def test_supervisor_prompt_is_compacted(self):
+        """Test a real supervisor graph sends the compacted history to its model across turns."""
+        @tool
+        def search(query: str) -> str:
+            """Search the news."""
+            return "y" * 3000
+
+        news_model = ScriptedChatModel(replies=[
+            reply
+            for n in range(2)
+            for reply in (AIMessage(content="", tool_calls=[_tool_call("search", f"s{n}", query="aapl")]), AIMessage(content=f"news answer {n}"))
+        ])
+        supervisor_model = ScriptedChatModel(replies=[
+            reply
+            for n in range(2)
+            for reply in (AIMessage(content="", tool_calls=[_tool_call("transfer_to_news_agent", f"h{n}")]), AIMessage(content=f"final answer {n}"))
+        ])
+        compactor = HistoryCompactor(max_tokens=4000)
+        graph = create_supervisor(
+            [create_react_agent(news_model, [search], name="news_agent")],
+            model=supervisor_model,
+            prompt=compactor.prompt("You are a supervisor."),
+            add_handoff_back_messages=True,
+            output_mode="full_history",
+        ).compile(checkpointer=MemorySaver())
+        config = {"configurable": {"thread_id": "t1"}}
+
+        for n in range(2):
+            result = graph.invoke({"messages": [HumanMessage(content=f"question {n}")]}, config)
+
+        assert result["messages"][-1].content == "final answer 1"
+        last_prompt = supervisor_model.prompts[-1]
+        assert isinstance(last_prompt[0], SystemMessage)
+        assert [message.content for message in last_prompt[1:3]] == ["question 0", "news answer 0"]
+        assert not any(isinstance(message, ToolMessage) and message.name.startswith("transfer_") for message in last_prompt)
+        assert sum(isinstance(message, ToolMessage) for message in last_prompt) == 1
+        assert compactor.stats()["calls"] == 4
+        assert compactor.stats()["tokens_saved"] > 500
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
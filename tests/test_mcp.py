@@ -0,0 +1,480 @@
+"""Unit tests for the MCP application modules."""
+import asyncio
+import math
+import os
+import random
+import socket
+import statistics
+import sys
+import threading
+import time
+from typing import Dict
+import pytest
+import httpx
+import uvicorn
+from mcp.server.fastmcp import FastMCP
+
+# The MCP app is run from its own directory and imports its modules by bare name
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mcp"))
+
+import improved_math_server as math_server  # noqa: E402
+import improved_weather_server as weather_server  # noqa: E402
+import mcp_pool  # noqa: E402
+from mcp_pool import MCPConnectionPool  # noqa: E402
+from weather_providers import CachedWeatherProvider, FixtureWeatherProvider, WeatherAPIProvider  # noqa: E402
+
+
+def _build_server() -> FastMCP:
+    server = FastMCP("Test")
+
+    @server.tool()
+    def add(a: float, b: float) -> float:
+        """Add two numbers"""
+        return a + b
+
+    @server.prompt()
+    def system_prompt() -> str:
+        """System prompt"""
+        return "Use the tools."
+
+    return server
+
+
+class LocalMCPServer:
+    """A FastMCP app served over streamable HTTP on a local port, restartable in place."""
+
+    def __init__(self, mcp_server: FastMCP):
+        self.mcp_server = mcp_server
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}/mcp"
+
+    def start(self):
+        # A fresh FastMCP instance has no sessions, like a restarted process
+        app = FastMCP(self.mcp_server.name)
+        app._tool_manager = self.mcp_server._tool_manager
+        app._prompt_manager = self.mcp_server._prompt_manager
+        self.uvicorn = uvicorn.Server(uvicorn.Config(app.streamable_http_app(), host="127.0.0.1", port=self.port, log_level="error"))
+        self.thread = threading.Thread(target=self.uvicorn.run, daemon=True)
+        self.thread.start()
+        while not self.uvicorn.started:
+            time.sleep(0.02)
+
+    def stop(self):
+        self.uvicorn.should_exit = self.uvicorn.force_exit = True
+        self.thread.join(5)
+
+
+@pytest.fixture
+def mcp_server():
+    server = LocalMCPServer(_build_server())
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def silent_server():
+    """A port that accepts connections but never answers, like a hung server."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(16)
+    yield f"http://127.0.0.1:{sock.getsockname()[1]}/mcp"
+    sock.close()
+
+
+@pytest.fixture
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/mcp"
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def factory(connections: Dict[str, str], **kwargs) -> MCPConnectionPool:
+        pool = MCPConnectionPool({name: {"url": url, "transport": "streamable_http"} for name, url in connections.items()}, **kwargs)
+        pools.append(pool)
+        return pool
+
+    yield factory
+    for pool in pools:
+        pool.close()
+
+
+async def _session_start(pool: MCPConnectionPool):
+    tools = await pool.get_tools()
+    prompt = await pool.get_prompt("math", "system_prompt")
+    return tools, prompt
+
+
+class TestMCPConnectionPool:
+    """Test cases for the shared MCP connection pool."""
+
+    def test_sessions_share_listings_and_connection(self, mcp_server, make_pool):
+        """Test each Streamlit-style event loop reuses one session and the cached listings."""
+        pool = make_pool({"math": mcp_server.url})
+
+        first_tools, first_prompt = asyncio.run(_session_start(pool))
+        second_tools, second_prompt = asyncio.run(_session_start(pool))
+
+        assert [tool.name for tool in first_tools] == ["add"]
+        assert second_tools == first_tools
+        assert second_prompt[0].content == "Use the tools."
+        assert asyncio.run(second_tools[0].ainvoke({"a": 2, "b": 3})) == "5.0"
+        stats = pool.stats()
+        assert stats["connects"] == 1
+        assert stats["listings"] == 2
+        assert stats["listing_cache_hits"] == 2
+
+    def test_refresh_detects_listing_changes(self, mcp_server, make_pool):
+        """Test expired listings are re-listed, and only real changes bump the version."""
+        pool = make_pool({"math": mcp_server.url}, refresh_seconds=0)
+
+        asyncio.run(pool.get_tools())
+        asyncio.run(pool.get_tools())
+        assert pool.version == 1
+
+        @mcp_server.mcp_server.tool()
+        def multiply(a: float, b: float) -> float:
+            """Multiply two numbers"""
+            return a * b
+
+        tools = asyncio.run(pool.get_tools())
+        assert sorted(tool.name for tool in tools) == ["add", "multiply"]
+        assert pool.version == 2
+        assert pool.stats()["connects"] == 1
+
+    def test_reconnects_after_server_restart(self, mcp_server, make_pool, monkeypatch):
+        """Test a tool call on a session the server forgot is retried on a new session."""
+        monkeypatch.setattr(mcp_pool, "PING_TIMEOUT", 0.5)
+        pool = make_pool({"math": mcp_server.url}, call_timeout=1)
+        tools = asyncio.run(pool.get_tools())
+
+        mcp_server.stop()
+        mcp_server.start()
+
+        assert asyncio.run(tools[0].ainvoke({"a": 1, "b": 1})) == "2.0"
+        assert pool.stats()["reconnects"] == 1
+        assert pool.stats()["connects"] == 2
+
+    def test_discovery_skips_unavailable_servers(self, mcp_server, silent_server, closed_port, make_pool):
+        """Test hung and dead servers are discovered concurrently, time out and are reported."""
+        pool = make_pool(
+            {"math": mcp_server.url, "hung": silent_server, "hung_too": silent_server, "dead": closed_port},
+            discovery_timeout=0.5,
+        )
+
+        start = time.perf_counter()
+        tools = asyncio.run(pool.get_tools())
+        elapsed = time.perf_counter() - start
+
+        assert [tool.name for tool in tools] == ["add"]
+        assert elapsed < 1.5
+        health = pool.health()
+        assert health["math"]["status"] == "ok" and health["math"]["tools"] == 1
+        assert health["hung"]["status"] == health["hung_too"]["status"] == "timeout"
+        assert health["dead"]["status"] == "error"
+        assert "ConnectError" in health["dead"]["error"]
+
+    def test_failed_server_not_retried_until_backoff(self, mcp_server, silent_server, make_pool):
+        """Test a server that timed out is skipped by later discoveries within the retry window."""
+        pool = make_pool({"math": mcp_server.url, "hung": silent_server}, discovery_timeout=0.5, retry_seconds=60)
+        asyncio.run(pool.get_tools())
+
+        start = time.perf_counter()
+        tools = asyncio.run(pool.get_tools())
+
+        assert time.perf_counter() - start < 0.3
+        assert len(tools) == 1
+        assert pool.health()["hung"]["retry_in_s"] > 0
+        with pytest.raises(ConnectionError):
+            asyncio.run(pool.get_prompt("hung", "system_prompt"))
+
+    def test_pool_closed_only_when_no_session_holds_it(self, closed_port):
+        """Test a session switching configuration leaves the old pool open for the sessions still on it."""
+        old = {"math": {"url": closed_port, "transport": "streamable_http"}}
+        new = {"math": {"url": closed_port, "transport": "streamable_http", "discovery_timeout": 1}}
+        try:
+            shared = mcp_pool.get_mcp_pool(old, "a")
+            assert mcp_pool.get_mcp_pool(old, "b") is shared
+            assert mcp_pool.get_mcp_pool(old, "a") is shared
+
+            moved = mcp_pool.get_mcp_pool(new, "a")
+            assert moved is not shared
+            assert not shared._loop.is_closed()
+
+            assert mcp_pool.get_mcp_pool(new, "b") is moved
+            assert shared._loop.is_closed()
+        finally:
+            mcp_pool.release_mcp_pool("a")
+            mcp_pool.release_mcp_pool("b")
+        assert moved._loop.is_closed()
+
+
+class TestMathStatistics:
+    """Test cases for the math server's vectorized statistics tools."""
+
+    def test_statistics_match_python_reference(self):
+        """Test the one-call summary matches the statistics module."""
+        rng = random.Random(3)
+        numbers = [rng.uniform(-50, 50) for _ in range(1001)]
+
+        summary = math_server.calculate_statistics(numbers, percentiles=[10, 50, 90])
+
+        assert summary["count"] == 1001
+        assert summary["mean"] == pytest.approx(statistics.fmean(numbers))
+        assert summary["median"] == pytest.approx(statistics.median(numbers))
+        assert summary["std"] == pytest.approx(statistics.stdev(numbers))
+        assert summary["variance"] == pytest.approx(statistics.variance(numbers))
+        deciles = statistics.quantiles(numbers, n=10, method="inclusive")
+        assert summary["percentiles"]["p10"] == pytest.approx(deciles[0])
+        assert summary["percentiles"]["p90"] == pytest.approx(deciles[-1])
+        assert math_server.calculate_std(numbers, sample=False) == pytest.approx(statistics.pstdev(numbers))
+
+    def test_rolling_and_correlation(self):
+        """Test rolling windows and Pearson/Spearman correlation, including ties."""
+        assert math_server.rolling_statistics([1, 2, 3, 4, 5], 3) == [2.0, 3.0, 4.0]
+        assert math_server.rolling_statistics([1, 5, 2, 8], 2, "max") == [5.0, 5.0, 8.0]
+        assert math_server.calculate_correlation([1, 2, 3], [2, 4, 6]) == pytest.approx(1.0)
+        # Monotonic but not linear: Spearman is exactly 1, Pearson is not
+        x, y = [1, 2, 3, 4, 5], [1, 4, 9, 16, 100]
+        assert math_server.calculate_correlation(x, y, method="spearman") == pytest.approx(1.0)
+        assert math_server.calculate_correlation(x, y) < 1.0
+        # Tied values share their average rank
+        assert math_server.calculate_correlation([1, 2, 2, 3], [1, 2, 2, 3], method="spearman") == pytest.approx(1.0)
+
+    def test_rejects_invalid_input(self):
+        """Test empty, non-finite and mismatched inputs raise clear errors."""
+        with pytest.raises(ValueError, match="empty"):
+            math_server.calculate_mean([])
+        with pytest.raises(ValueError, match="NaN"):
+            math_server.calculate_median([1.0, float("nan")])
+        with pytest.raises(ValueError, match="between 0 and 100"):
+            math_server.calculate_percentiles([1, 2], [150])
+        with pytest.raises(ValueError, match="Window"):
+            math_server.rolling_statistics([1, 2], 3)
+        with pytest.raises(ValueError, match="same length"):
+            math_server.calculate_correlation([1, 2], [1, 2, 3])
+
+    def test_benchmark_paths_agree(self):
+        """Test the benchmark's scalar and vectorized paths give the same answers."""
+        from scripts.benchmark_math_stats import run_benchmark
+
+        (row,) = run_benchmark([500], repeat=1)
+
+        assert row["scalar_calls"] == 4 and row["vectorized_calls"] == 1
+        assert row["vectorized_s"] > 0
+
+
+class TestMathEvaluate:
+    """Test cases for the math server's expression evaluator."""
+
+    def test_whole_expression_in_one_call(self):
+        """Test a multi-step question is answered by a single MCP tool call."""
+        content = asyncio.run(math_server.mcp.call_tool("evaluate", {"expression": "(25*47)+sqrt(144)/3"}))
+
+        assert float(content[0].text) == pytest.approx(1179.0)
+
+    def test_functions_constants_and_batches(self):
+        """Test server functions, constants and a list of expressions with per-item errors."""
+        results = math_server.evaluate(expressions=[
+            "2^10", "sin(30, degrees=True)", "log(e)", "factorial(5) / 4", "mean([1, 2, 3]) + pi", "1/0",
+        ])
+
+        assert [item.get("result") for item in results[:5]] == pytest.approx([1024, 0.5, 1.0, 30.0, 2 + math.pi])
+        assert results[5] == {"expression": "1/0", "error": "Division by zero"}
+        with pytest.raises(ValueError, match="exactly one"):
+            math_server.evaluate()
+
+    @pytest.mark.parametrize("expression", [
+        "__import__('os').system('echo hi')",
+        "(1).__class__",
+        "[x for x in range(10)]",
+        "lambda: 1",
+        "open('/etc/passwd')",
+        "'a' * 10",
+        "[1] * 10**9",
+        "9**9**9",
+        "(10**1000)**10",
+        "factorial(10**6)",
+        "power(power(10, 1000), 1000)",
+        "power(power(10, 10000), 10000)",
+        "multiply(factorial(1000), factorial(1000))",
+        "power(2, 20000)",
+        "power(base=10, exponent=power(10, 4) * 2)",
+        "factorial(n=10**5)",
+    ])
+    def test_rejects_unsafe_or_unbounded_expressions(self, expression):
+        """Test code, attribute access, strings and huge computations are refused."""
+        with pytest.raises(ValueError):
+            math_server.evaluate(expression)
+
+
+@pytest.fixture
+def weather_fixture(monkeypatch):
+    """The weather server backed by a fresh cache over a fixture provider with 0.2s latency."""
+    provider = FixtureWeatherProvider(delay=0.2)
+    service = CachedWeatherProvider(provider, ttl=60)
+    monkeypatch.setattr(weather_server, "weather_service", service)
+    return provider, service
+
+
+class TestWeatherService:
+    """Test cases for the weather server's cached provider layer."""
+
+    def test_concurrent_requests_share_one_fetch(self, weather_fixture):
+        """Test a burst of lookups for one city costs one upstream fetch, then hits the cache."""
+        provider, service = weather_fixture
+
+        async def burst():
+            return await asyncio.gather(*(weather_server.get_weather(" New  York ") for _ in range(10)))
+
+        reports = asyncio.run(burst())
+        asyncio.run(weather_server.get_weather("new york"))
+
+        assert len(set(reports)) == 1 and "22°C" in reports[0]
+        assert provider.fetches == 1
+        assert service.stats() == {
+            "provider": "fixture", "cached_cities": 1, "hits": 1, "misses": 1, "coalesced": 9, "evictions": 0,
+        }
+
+    def test_summary_fetches_cities_concurrently(self, weather_fixture):
+        """Test the multi-city summary takes one provider latency, not one per city."""
+        provider, _ = weather_fixture
+
+        start = time.perf_counter()
+        summary = asyncio.run(weather_server.get_weather_summary(["London", "Tokyo", "Paris", "Sydney", "Atlantis"]))
+
+        assert time.perf_counter() - start < 0.5
+        assert provider.fetches == 5
+        assert "📍 Tokyo: 28°C, Partly Cloudy" in summary
+        assert "📍 Atlantis: Weather data not available" in summary
+
+    def test_summary_concurrency_is_capped(self, weather_fixture, monkeypatch):
+        """Test a long city list keeps at most SUMMARY_CONCURRENCY lookups in flight."""
+        provider, _ = weather_fixture
+        monkeypatch.setattr(weather_server, "SUMMARY_CONCURRENCY", 2)
+        in_flight = peak = 0
+        fetch = provider.fetch
+
+        async def counting_fetch(city):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            try:
+                return await fetch(city)
+            finally:
+                in_flight -= 1
+
+        monkeypatch.setattr(provider, "fetch", counting_fetch)
+        summary = asyncio.run(weather_server.get_weather_summary(["London", "Tokyo", "Paris", "Sydney", "Atlantis"]))
+
+        assert peak == 2
+        assert provider.fetches == 5
+        assert "📍 Sydney:" in summary
+
+    def test_fetch_from_another_loop_keeps_its_inflight_entry(self):
+        """Test a fetch finishing on one loop does not drop the in-flight fetch another loop started."""
+        provider = FixtureWeatherProvider(delay=0.2)
+        service = CachedWeatherProvider(provider, ttl=0)
+        started = threading.Event()
+        replaced = threading.Event()
+        first_done = threading.Event()
+
+        async def first():
+            task = asyncio.ensure_future(service.fetch("paris"))
+            await asyncio.sleep(0.05)
+            started.set()
+            replaced.wait(1)
+            weather = await task
+            first_done.set()
+            return weather
+
+        async def second():
+            started.wait(1)
+            task = asyncio.ensure_future(service.fetch("paris"))
+            await asyncio.sleep(0)
+            replaced.set()
+            first_done.wait(1)
+            # The first loop's fetch has finished; the second's must still be tracked
+            assert service._inflight.get("paris") is not None
+            return await task
+
+        results = {}
+        threads = [
+            threading.Thread(target=lambda: results.update(first=asyncio.run(first()))),
+            threading.Thread(target=lambda: results.update(second=asyncio.run(second()))),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results["first"]["temp"] == results["second"]["temp"]
+        assert "paris" not in service._inflight
+
+    def test_expired_entries_and_errors(self, monkeypatch):
+        """Test entries are refetched after the TTL and failures reach every waiter without being cached."""
+        provider = FixtureWeatherProvider()
+        service = CachedWeatherProvider(provider, ttl=0)
+        asyncio.run(service.fetch("paris"))
+        asyncio.run(service.fetch("paris"))
+        assert provider.fetches == 2
+
+        async def failing_fetch(city):
+            await asyncio.sleep(0.05)
+            raise httpx.ConnectError("upstream down")
+
+        monkeypatch.setattr(provider, "fetch", failing_fetch)
+        monkeypatch.setattr(weather_server, "weather_service", CachedWeatherProvider(provider))
+        summary = asyncio.run(weather_server.get_weather_summary(["Paris", "Paris"]))
+        assert summary.count("temporarily unavailable") == 2
+        assert weather_server.weather_service.stats()["cached_cities"] == 0
+
+    def test_cache_is_bounded(self):
+        """Test the least recently used city is evicted at the cap and expired entries are pruned on insert."""
+        provider = FixtureWeatherProvider()
+        service = CachedWeatherProvider(provider, ttl=60, max_entries=2)
+
+        async def lookups(*cities):
+            for city in cities:
+                await service.fetch(city)
+
+        asyncio.run(lookups("paris", "london", "paris", "tokyo"))
+        assert list(service._cache) == ["paris", "tokyo"]
+        assert service.stats()["evictions"] == 1
+
+        service = CachedWeatherProvider(provider, ttl=0)
+        asyncio.run(lookups("sydney", "new york"))
+        assert list(service._cache) == ["new york"]
+
+    def test_weatherapi_provider_parses_responses(self):
+        """Test weatherapi.com conditions are mapped to the server's format and unknown cities to None."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert request.url.params["key"] == "test-key"
+            if request.url.params["q"] == "atlantis":
+                return httpx.Response(400, json={"error": {"code": 1006, "message": "No matching location found."}})
+            return httpx.Response(200, json={"current": {
+                "temp_c": 21.6, "humidity": 40, "wind_mph": 7.4, "condition": {"text": "Overcast"},
+            }})
+
+        async def lookups():
+            provider = WeatherAPIProvider("test-key", client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+            try:
+                return await provider.fetch("oslo"), await provider.fetch("atlantis")
+            finally:
+                await provider.aclose()
+
+        oslo, atlantis = asyncio.run(lookups())
+
+        assert oslo == {"temp": 22, "condition": "Overcast", "humidity": 40, "wind": "7 mph"}
+        assert atlantis is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -1,12 +1,19 @@
 """Unit tests for tools."""
 import pytest
 from unittest.mock import Mock, patch
-from tools.enhanced_fundamental_tool import enhanced_fundamental_analysis
+from tools.enhanced_fundamental_tool import enhanced_fundamental_analysis, fundamental_cache
+from tools import news_tool
 from core.exceptions import ToolExecutionError
 
 class TestEnhancedFundamentalTool:
     """Test cases for enhanced fundamental analysis tool."""
     
+    def setup_method(self):
+        fundamental_cache.clear()
+    
+    def teardown_method(self):
+        fundamental_cache.clear()
+    
     @patch('tools.enhanced_fundamental_tool.yf.Ticker')
     def test_successful_analysis(self, mock_ticker):
         """Test successful fundamental analysis."""
@@ -28,6 +35,21 @@ class TestEnhancedFundamentalTool:
         assert "Test Company" in result
         assert "Technology" in result
     
+    @patch('tools.enhanced_fundamental_tool.yf.Ticker')
+    def test_repeated_symbol_served_from_cache(self, mock_ticker):
+        """Test a second analysis of the same symbol does not refetch."""
+        mock_ticker.return_value.info = {"longName": "Test Company"}
+        mock_ticker.return_value.financials = Mock()
+        
+        first = enhanced_fundamental_analysis("aapl")
+        second = enhanced_fundamental_analysis("AAPL")
+        
+        assert first == second
+        mock_ticker.assert_called_once_with("AAPL")
+        stats = fundamental_cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+    
     @patch('tools.enhanced_fundamental_tool.yf.Ticker')
     def test_analysis_failure(self, mock_ticker):
         """Test analysis failure handling."""
@@ -35,6 +57,38 @@ class TestEnhancedFundamentalTool:
         
         with pytest.raises(ToolExecutionError):
             enhanced_fundamental_analysis("INVALID")
+        assert fundamental_cache.stats()["entries"] == 0
+
+class TestFakeNewsSearch:
+    """Test cases for the fake news search tool."""
+    
+    def setup_method(self):
+        news_tool.fake_news_chain = None
+    
+    def teardown_method(self):
+        news_tool.fake_news_chain = None
+    
+    @patch('tools.news_tool.create_retrieval_chain')
+    @patch('tools.news_tool.create_stuff_documents_chain')
+    @patch('tools.news_tool.pull_prompt')
+    @patch('tools.news_tool.create_chat_model')
+    @patch('tools.news_tool.create_embeddings')
+    @patch('tools.news_tool.load_or_build_index')
+    def test_chain_built_once(self, mock_index, mock_embeddings, mock_llm, mock_prompt, mock_stuff, mock_retrieval):
+        """Test the index and chain are set up once and reused across calls."""
+        mock_retrieval.return_value.invoke.return_value = {
+            "input": "q", "context": [], "answer": "Dynatrace acquires the moon"
+        }
+        
+        first = news_tool.fake_news_search.invoke("latest news")
+        second = news_tool.fake_news_search.invoke("more news")
+        
+        assert first == second == "Dynatrace acquires the moon"
+        mock_index.assert_called_once()
+        assert mock_index.call_args[0][0] == "fake_news"
+        assert mock_llm.call_count == 1
+        assert mock_prompt.call_count == 1
+        assert mock_retrieval.return_value.invoke.call_count == 2
 
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
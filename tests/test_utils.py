@@ -0,0 +1,281 @@
+"""Unit tests for utilities."""
+import asyncio
+import pytest
+from langchain_core.messages import ToolMessage
+from langchain_core.messages.ai import AIMessageChunk
+from utils import utils as utils_module
+from utils.utils import astream_graph, BudgetExceeded, HistoryView, QueryBudget, RenderBuffer, StreamMetrics
+
+
+class FakeGraph:
+    """Minimal stand-in for a compiled graph in "messages" stream mode."""
+
+    def __init__(self, chunks, delay: float = 0.0):
+        self.chunks = chunks
+        self.delay = delay
+        self.closed = False
+
+    async def astream(self, inputs, config=None, stream_mode="messages", **kwargs):
+        try:
+            for node, text in self.chunks:
+                await asyncio.sleep(self.delay)
+                yield AIMessageChunk(content=text), {"langgraph_node": node}
+        finally:
+            self.closed = True
+
+    def stream(self, *args, **kwargs):
+        raise AssertionError("astream_graph must not use the synchronous stream")
+
+
+class TestAstreamGraph:
+    """Test cases for astream_graph."""
+
+    @pytest.mark.asyncio
+    async def test_messages_mode_streams_asynchronously(self):
+        """Test chunks are delivered to the callback via graph.astream."""
+        graph = FakeGraph([("supervisor", "Hello"), ("supervisor", " world")])
+        received = []
+
+        result = await astream_graph(
+            graph, {"messages": []}, callback=lambda m: received.append(m["content"].content)
+        )
+
+        assert received == ["Hello", " world"]
+        assert result["node"] == "supervisor"
+        assert graph.closed
+
+    @pytest.mark.asyncio
+    async def test_timeout_cancels_stream(self):
+        """Test asyncio.wait_for fires on time and closes the graph stream."""
+        graph = FakeGraph([("supervisor", "token")] * 100, delay=0.05)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(
+                astream_graph(graph, {"messages": []}, callback=lambda m: None),
+                timeout=0.2,
+            )
+
+        assert loop.time() - start < 1.0
+        assert graph.closed
+
+    @pytest.mark.asyncio
+    async def test_concurrent_sessions_share_loop(self):
+        """Test two streams interleave instead of serializing each other."""
+        order = []
+        graph_a = FakeGraph([("a", "1"), ("a", "2")], delay=0.01)
+        graph_b = FakeGraph([("b", "1"), ("b", "2")], delay=0.01)
+
+        await asyncio.gather(
+            astream_graph(graph_a, {}, callback=lambda m: order.append(m["node"])),
+            astream_graph(graph_b, {}, callback=lambda m: order.append(m["node"])),
+        )
+
+        assert order[:2] in (["a", "b"], ["b", "a"])
+
+    @pytest.mark.asyncio
+    async def test_token_budget_cancels_run(self):
+        """Test crossing the token budget stops the stream at once and reports the partial counts."""
+        graph = FakeGraph([("agent", "token")] * 100)
+        received = []
+
+        with pytest.raises(BudgetExceeded) as exc_info:
+            await astream_graph(graph, {}, callback=received.append, budget=QueryBudget(max_tokens=5, max_seconds=0))
+
+        assert exc_info.value.budget == "token"
+        assert exc_info.value.used == 6
+        assert exc_info.value.metrics["nodes"]["agent"]["output_tokens"] == 6
+        assert len(received) == 5
+        assert graph.closed
+
+    @pytest.mark.asyncio
+    async def test_wall_clock_budget_cancels_stalled_run(self):
+        """Test the wall-clock budget fires while the graph is waiting between chunks."""
+        graph = FakeGraph([("agent", "token")] * 3, delay=10)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        with pytest.raises(BudgetExceeded, match="wall-clock"):
+            await astream_graph(graph, {}, callback=lambda m: None, budget=QueryBudget(max_tokens=0, max_seconds=0.2))
+
+        assert loop.time() - start < 1.0
+        assert graph.closed
+
+
+class FakeClock:
+    """Manually advanced clock for deterministic throttling tests."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRenderBuffer:
+    """Test cases for RenderBuffer."""
+
+    def test_coalesces_chunks_within_interval(self):
+        """Test chunks arriving inside one interval share a single frame."""
+        frames = []
+        clock = FakeClock()
+        buffer = RenderBuffer(frames.append, interval_ms=50, max_chunks=100, clock=clock)
+
+        for token in ["a", "b", "c", "d"]:
+            buffer.append(token)
+            clock.now += 0.01
+
+        assert frames == ["a"]
+        clock.now += 0.05
+        buffer.append("e")
+        assert frames == ["a", "abcde"]
+
+    def test_max_chunks_forces_frame(self):
+        """Test a frame is sent once max_chunks are pending."""
+        frames = []
+        buffer = RenderBuffer(frames.append, interval_ms=10_000, max_chunks=3, clock=FakeClock())
+
+        for token in "abcdefg":
+            buffer.append(token)
+
+        assert frames == ["a", "abcd", "abcdefg"]
+
+    def test_flush_renders_pending_text(self):
+        """Test flush sends the tail and reports frame metrics."""
+        frames = []
+        buffer = RenderBuffer(frames.append, interval_ms=10_000, max_chunks=100, clock=FakeClock())
+
+        for token in ["Hello", ",", " world"]:
+            buffer.append(token)
+
+        assert buffer.flush() == "Hello, world"
+        assert frames[-1] == "Hello, world"
+        assert buffer.stats() == {"chunks_received": 3, "frames_sent": 2}
+        buffer.flush()
+        assert buffer.frames_sent == 2
+
+    def test_flush_exports_counts_once(self, monkeypatch):
+        """Test flush exports chunk and frame counts without counting them again on a repeat flush."""
+        exported = {"chunks": 0, "frames": 0}
+        monkeypatch.setattr(utils_module.render_chunk_counter, "add", lambda n: exported.update(chunks=exported["chunks"] + n))
+        monkeypatch.setattr(utils_module.render_frame_counter, "add", lambda n: exported.update(frames=exported["frames"] + n))
+        buffer = RenderBuffer(lambda text: None, interval_ms=10_000, max_chunks=100, clock=FakeClock())
+
+        for token in ["a", "b", "c"]:
+            buffer.append(token)
+        buffer.flush()
+        buffer.flush()
+
+        assert exported == {"chunks": 3, "frames": 2}
+
+
+def _conversation(turns):
+    history = []
+    for turn in range(turns):
+        history.append({"role": "user", "content": f"question {turn}"})
+        history.append({"role": "assistant", "content": f"answer {turn}"})
+        if turn % 2:
+            history.append({"role": "assistant_tool", "content": f'{{"turn": {turn}}}'})
+    return history
+
+
+class TestHistoryView:
+    """Test cases for HistoryView."""
+
+    def test_renders_newest_turns_and_loads_older(self):
+        """Test only the last page of turns is drawn until older pages are loaded."""
+        history = _conversation(200)
+        view = HistoryView(page_size=20)
+        drawn, load_older = [], []
+
+        view.render(history, drawn.append, load_older.append)
+
+        assert load_older == [180]
+        assert len(drawn) == 40
+        assert drawn[0]["markdown"] == "question 180"
+        assert drawn[-1] == {"role": "assistant", "markdown": "answer 199", "tool": '{"turn": 199}'}
+
+        view.load_older()
+        drawn.clear()
+        view.render(history, drawn.append, load_older.append)
+        assert load_older[-1] == 160 and len(drawn) == 80
+        assert view.stats()["rendered_turns"] == 40
+
+    def test_formats_each_message_once(self):
+        """Test reruns reuse cached markdown and only format appended messages."""
+        formatted = []
+        view = HistoryView(page_size=5, format_tool=lambda content: formatted.append(content) or f"`{content}`")
+        history = _conversation(10)
+
+        view.render(history, lambda block: None, lambda hidden: None)
+        view.render(history, lambda block: None, lambda hidden: None)
+        history.extend(_conversation(2)[-3:])
+        view.render(history, lambda block: None, lambda hidden: None)
+
+        assert view.stats()["formatted_messages"] == len(history)
+        assert len(formatted) == 6
+        assert view.stats()["turns"] == 11
+        assert view.stats()["renders"] == 3
+
+    def test_reset_history_starts_over(self):
+        """Test a replaced history is regrouped and the window shrinks back to one page."""
+        view = HistoryView(page_size=2)
+        view.turns(_conversation(6))
+        view.load_older()
+
+        hidden, turns = view.window([{"role": "assistant_tool", "content": "orphan"}, {"role": "user", "content": "hi"}])
+
+        assert hidden == 0
+        assert turns == [[{"role": "user", "markdown": "hi", "tool": None}]]
+        assert view.visible_turns == 2
+
+
+class TestStreamMetrics:
+    """Test cases for StreamMetrics."""
+
+    def _meta(self, namespace):
+        return {"langgraph_node": namespace.split("|")[-1], "langgraph_checkpoint_ns": "|".join(f"{part}:1" for part in namespace.split("|"))}
+
+    def test_records_ttft_nodes_tokens_and_tools(self):
+        """Test time is charged to the node whose chunk arrives, and tools and usage are counted."""
+        clock = FakeClock()
+        metrics = StreamMetrics("supervisor", clock=clock)
+
+        clock.now = 0.5
+        metrics.record(self._meta("supervisor|agent"), AIMessageChunk(content="", tool_call_chunks=[]))
+        clock.now = 0.6
+        metrics.record(self._meta("supervisor|tools"), ToolMessage(content="ok", name="transfer_to_news_agent", tool_call_id="1"))
+        clock.now = 1.0
+        metrics.record(self._meta("news_agent|tools"), ToolMessage(content="[]", name="tavily_search", tool_call_id="2"))
+        clock.now = 1.5
+        metrics.record(self._meta("news_agent|agent"), AIMessageChunk(content="Hello"))
+        clock.now = 1.6
+        metrics.record(self._meta("news_agent|agent"), AIMessageChunk(content="", usage_metadata={"input_tokens": 30, "output_tokens": 5, "total_tokens": 35}))
+        clock.now = 2.0
+        summary = metrics.finish()
+
+        assert summary["ttft_s"] == 1.5
+        assert summary["duration_s"] == 2.0
+        assert (summary["tool_calls"], summary["handoffs"]) == (1, 1)
+        assert summary["agents"] == ["news_agent", "supervisor"]
+        assert summary["nodes"]["supervisor.agent"]["wall_s"] == 0.5
+        assert summary["nodes"]["news_agent.agent"]["wall_s"] == pytest.approx(0.6)
+        assert summary["nodes"]["news_agent.agent"]["output_tokens"] == 5
+        assert summary["nodes"]["news_agent.tools"]["tool_calls"] == 1
+        assert metrics.total_tokens() == 35
+
+    @pytest.mark.asyncio
+    async def test_astream_graph_returns_metrics(self):
+        """Test astream_graph fills the metrics and returns the summary, counting chunks without usage data."""
+        graph = FakeGraph([("supervisor", "Hello"), ("supervisor", " world")], delay=0.01)
+        metrics = StreamMetrics("supervisor")
+
+        result = await astream_graph(graph, {"messages": []}, callback=lambda m: None, metrics=metrics)
+
+        assert result["metrics"]["ttft_s"] > 0
+        assert result["metrics"]["nodes"]["supervisor"]["output_tokens"] == 2
+        assert metrics.duration is not None
+
+if __name__ == "__main__":
+    pytest.main([__file__])
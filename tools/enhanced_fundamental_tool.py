@@ -1,13 +1,23 @@
 """Enhanced fundamental analysis tool with comprehensive metrics."""
+import os
+from concurrent.futures import ThreadPoolExecutor
 import yfinance as yf
 from langchain_core.tools import tool
 from typing import Dict, Any, Optional
 import pandas as pd
 from core.exceptions import ToolExecutionError
 from core.logging_config import setup_logging
+from core.ttl_cache import TTLCache
 
 logger = setup_logging()
 
+# Reports are cached per symbol; set FUNDAMENTAL_CACHE_DIR to keep them across restarts
+fundamental_cache = TTLCache(
+    ttl_seconds=float(os.getenv("FUNDAMENTAL_CACHE_TTL", "900")),
+    cache_dir=os.getenv("FUNDAMENTAL_CACHE_DIR") or None,
+)
+_fetch_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="yfinance-fetch")
+
 @tool
 def enhanced_fundamental_analysis(symbol: str) -> str:
     """
@@ -19,32 +29,43 @@ def enhanced_fundamental_analysis(symbol: str) -> str:
     Returns:
         Detailed fundamental analysis report
     """
+    symbol = symbol.strip().upper()
     try:
-        ticker = yf.Ticker(symbol)
-        
-        # Get financial data
-        info = ticker.info
-        financials = ticker.financials
-        balance_sheet = ticker.balance_sheet
-        cash_flow = ticker.cashflow
-        
-        # Calculate key metrics
-        analysis = {
-            "company_info": _get_company_info(info),
-            "financial_metrics": _calculate_financial_metrics(info, financials),
-            "valuation_metrics": _calculate_valuation_metrics(info),
-            "growth_metrics": _calculate_growth_metrics(financials),
-            "financial_health": _assess_financial_health(balance_sheet, cash_flow),
-            "profitability": _analyze_profitability(financials),
-            "efficiency_ratios": _calculate_efficiency_ratios(info, financials, balance_sheet)
-        }
-        
-        return _format_analysis_report(symbol, analysis)
-        
+        return fundamental_cache.get_or_compute(symbol, lambda: _analyze(symbol))
     except Exception as e:
         logger.error(f"Fundamental analysis failed for {symbol}: {str(e)}")
         raise ToolExecutionError(f"Fundamental analysis failed: {str(e)}")
 
+def _fetch_financial_data(symbol: str) -> Dict[str, Any]:
+    """Fetch info and the three statements concurrently."""
+    ticker = yf.Ticker(symbol)
+    futures = {
+        attr: _fetch_pool.submit(getattr, ticker, attr)
+        for attr in ("info", "financials", "balance_sheet", "cashflow")
+    }
+    return {attr: future.result() for attr, future in futures.items()}
+
+def _analyze(symbol: str) -> str:
+    """Build the report from freshly fetched data."""
+    data = _fetch_financial_data(symbol)
+    info = data["info"]
+    financials = data["financials"]
+    balance_sheet = data["balance_sheet"]
+    cash_flow = data["cashflow"]
+    
+    # Calculate key metrics
+    analysis = {
+        "company_info": _get_company_info(info),
+        "financial_metrics": _calculate_financial_metrics(info, financials),
+        "valuation_metrics": _calculate_valuation_metrics(info),
+        "growth_metrics": _calculate_growth_metrics(financials),
+        "financial_health": _assess_financial_health(balance_sheet, cash_flow),
+        "profitability": _analyze_profitability(financials),
+        "efficiency_ratios": _calculate_efficiency_ratios(info, financials, balance_sheet)
+    }
+    
+    return _format_analysis_report(symbol, analysis)
+
 def _get_company_info(info: Dict) -> Dict[str, Any]:
     """Extract basic company information."""
     return {
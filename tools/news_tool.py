@@ -1,15 +1,13 @@
 import os
+import threading
 from dotenv import load_dotenv
 from langchain_tavily import TavilySearch
-from langchain_text_splitters import CharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings, OpenAI, ChatOpenAI
 from langchain.chains.retrieval import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.vectorstores import InMemoryVectorStore
-from langchain import hub
 from langchain_core.tools import tool
-import requests
-from langchain_tavily import TavilySearch
+from core.http_clients import create_chat_model, create_embeddings, get_requests_session
+from core.index_store import load_or_build_index
+from core.prompt_cache import pull_prompt
 
 load_dotenv()
 
@@ -19,23 +17,38 @@ def news_search() -> TavilySearch:
   return my_news_search
 
 
+FAKE_NEWS_FILE = os.path.join(os.getcwd(), 'fake_news.txt')
+fake_news_chain = None
+fake_news_chain_lock = threading.Lock()
+
+
+def get_fake_news_chain():
+  """Build the fake news retrieval chain once, on first use.
+
+  The index is the same persisted "fake_news" corpus the humorous news agent
+  loads, so both share one in-process FAISS store and one on-disk cache.
+  """
+  global fake_news_chain
+  if fake_news_chain is None:
+    with fake_news_chain_lock:
+      if fake_news_chain is None:
+        vectorstore = load_or_build_index("fake_news", FAKE_NEWS_FILE, create_embeddings())
+        llm = create_chat_model("gpt-3.5-turbo")
+        retrieval_qa_chat_prompt = pull_prompt("langchain-ai/retrieval-qa-chat")
+        combine_docs_chain = create_stuff_documents_chain(llm, retrieval_qa_chat_prompt)
+        fake_news_chain = create_retrieval_chain(retriever=vectorstore.as_retriever(), combine_docs_chain=combine_docs_chain)
+  return fake_news_chain
+
+
 @tool
 def fake_news_search(tool_input: str) -> str:
   """News tools to get fake news data."""
-  load_dotenv()
-  embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-  llm = ChatOpenAI()
-  vectorstore = InMemoryVectorStore(embedding=embeddings)
-  retrieval_qa_chat_prompt = hub.pull("langchain-ai/retrieval-qa-chat")
-  combine_docs_chain = create_stuff_documents_chain(llm, retrieval_qa_chat_prompt)
-  retrieval_chain = create_retrieval_chain(retriever=vectorstore.as_retriever(), combine_docs_chain=combine_docs_chain)
-  # return retrieval_chain
-  result = retrieval_chain.invoke(input={"input": tool_input})
-  return "\n\n".join(doc for doc in result)
+  result = get_fake_news_chain().invoke(input={"input": tool_input})
+  return result["answer"]
 
 def weather_lookup(location: str) -> str:
   """Find the weather of a location."""
-  r = requests.get(
+  r = get_requests_session().get(
       'https://api.weatherapi.com/v1/current.json?q=' + location + '&key=redacted')
   return r.json()
 
@@ -2,6 +2,7 @@
 import streamlit as st
 from typing import List, Dict, Any, Optional
 from core.session_manager import SessionManager
+from utils.utils import HistoryView
 
 def render_sidebar() -> Dict[str, Any]:
     """Render sidebar with configuration options."""
@@ -64,26 +65,34 @@ def render_sidebar() -> Dict[str, Any]:
             "recursion_limit": recursion_limit
         }
 
+def _format_tool_details(content: str) -> str:
+    return f"```json\n{content}\n```"
+
 def render_chat_history():
-    """Render chat history with improved formatting."""
+    """Render the newest turns of the chat history, with a button to load older ones."""
     if not st.session_state.get("history"):
         st.info("💡 Start by asking about a stock analysis, latest news, or fundamental analysis!")
         return
     
-    for i, message in enumerate(st.session_state.history):
-        if message["role"] == "user":
-            with st.chat_message("user", avatar="🧑‍💻"):
-                st.markdown(message["content"])
-        
-        elif message["role"] == "assistant":
-            with st.chat_message("assistant", avatar="🤖"):
-                st.markdown(message["content"])
-                
-                # Check for tool information
-                if (i + 1 < len(st.session_state.history) and 
-                    st.session_state.history[i + 1]["role"] == "assistant_tool"):
-                    with st.expander("🔧 Tool Details", expanded=False):
-                        st.code(st.session_state.history[i + 1]["content"], language="json")
+    if "history_view" not in st.session_state:
+        st.session_state.history_view = HistoryView(format_tool=_format_tool_details)
+    view = st.session_state.history_view
+    
+    def draw_block(block: Dict[str, Any]):
+        with st.chat_message(block["role"], avatar="🧑‍💻" if block["role"] == "user" else "🤖"):
+            st.markdown(block["markdown"])
+            
+            # Check for tool information
+            if block["tool"] is not None:
+                with st.expander("🔧 Tool Details", expanded=False):
+                    st.markdown(block["tool"])
+    
+    def draw_load_older(hidden: int):
+        st.button(f"⬆️ Load older messages ({hidden} more turns)", on_click=view.load_older, use_container_width=True)
+    
+    view.render(st.session_state.history, draw_block, draw_load_older)
+    stats = view.stats()
+    st.caption(f"Rendered {stats['rendered_turns']} of {stats['turns']} turns in {stats['last_render_ms']:.1f} ms")
 
 def render_example_queries():
     """Render example queries for users."""
@@ -126,6 +135,33 @@ def render_metrics_dashboard(metrics: Optional[Dict[str, Any]] = None):
     with col4:
         st.metric("Success Rate", f"{metrics.get('success_rate', 0):.1%}")
 
+    col5, col6 = st.columns(2)
+
+    with col5:
+        ttft = metrics.get('ttft')
+        st.metric("Time to First Token", f"{ttft:.2f}s" if ttft is not None else "–")
+
+    with col6:
+        st.metric("Tokens (in / out)", f"{metrics.get('input_tokens', 0)} / {metrics.get('output_tokens', 0)}")
+
+    nodes = metrics.get('nodes')
+    if nodes:
+        with st.expander("⏱️ Per-node Breakdown", expanded=False):
+            st.dataframe(
+                [
+                    {
+                        "Node": label,
+                        "Agent": node["agent"],
+                        "Wall Time (s)": round(node["wall_s"], 3),
+                        "Output Tokens": node["output_tokens"],
+                        "Tool Calls": node["tool_calls"],
+                    }
+                    for label, node in sorted(nodes.items(), key=lambda item: item[1]["wall_s"], reverse=True)
+                ],
+                use_container_width=True,
+                hide_index=True,
+            )
+
 def render_error_message(error: str, details: Optional[str] = None):
     """Render error message with details."""
     st.error(f"❌ {error}")
@@ -1,23 +1,394 @@
 from typing import Any, Dict, List, Callable, Optional
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.messages.ai import AIMessageChunk
+from langchain_core.messages.tool import ToolMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph.state import CompiledStateGraph
-from agents.supervisor_agent import supervisor_agent
+from opentelemetry import context, trace
+from opentelemetry.metrics import get_meter
+import asyncio
+import os
+import time
 import uuid
 
+tracer = trace.get_tracer(__name__)
+meter = get_meter(__name__)
+ttft_histogram = meter.create_histogram("graph.time_to_first_token", unit="s", description="Time to the first streamed text token")
+node_duration_histogram = meter.create_histogram("graph.node.duration", unit="s", description="Wall time per graph node and run")
+token_counter = meter.create_counter("graph.node.tokens", description="LLM tokens per graph node")
+tool_call_counter = meter.create_counter("graph.node.tool_calls", description="Tool calls per graph node")
+budget_exceeded_counter = meter.create_counter("graph.budget_exceeded", description="Graph runs cancelled by a per-query budget")
+render_chunk_counter = meter.create_counter("render.chunks", description="Streamed text chunks received by render buffers")
+render_frame_counter = meter.create_counter("render.frames", description="Placeholder re-renders sent by render buffers")
+
 
 def random_uuid():
     return str(uuid.uuid4())
 
 
+class RenderBuffer:
+    """
+    Coalesces streamed chunks into throttled re-renders of a placeholder.
+
+    Keeps a running string rather than re-joining every chunk, and only calls
+    ``render`` once per frame: when ``interval_ms`` has elapsed since the last
+    frame or ``max_chunks`` chunks are pending. Call ``flush`` on completion;
+    it also exports the chunk and frame counts as OpenTelemetry counters.
+
+    Args:
+        render (Callable[[str], Any]): Draws the full accumulated text
+        interval_ms (int, optional): Minimum time between frames. Defaults to RENDER_INTERVAL_MS or 50
+        max_chunks (int, optional): Pending chunks that force a frame. Defaults to RENDER_MAX_CHUNKS or 20
+    """
+
+    def __init__(
+        self,
+        render: Callable[[str], Any],
+        interval_ms: Optional[int] = None,
+        max_chunks: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if interval_ms is None:
+            interval_ms = int(os.getenv("RENDER_INTERVAL_MS", "50"))
+        if max_chunks is None:
+            max_chunks = int(os.getenv("RENDER_MAX_CHUNKS", "20"))
+        self.render = render
+        self.interval = interval_ms / 1000
+        self.max_chunks = max(max_chunks, 1)
+        self.clock = clock
+        self.text = ""
+        self.chunks_received = 0
+        self.frames_sent = 0
+        self._pending = 0
+        self._last_frame = None
+        self._exported = (0, 0)
+
+    def append(self, chunk: str):
+        self.text += chunk
+        self.chunks_received += 1
+        self._pending += 1
+        now = self.clock()
+        if (
+            self._last_frame is None
+            or self._pending >= self.max_chunks
+            or now - self._last_frame >= self.interval
+        ):
+            self._send_frame(now)
+
+    def flush(self) -> str:
+        """Render any pending chunks and return the full text."""
+        if self._pending:
+            self._send_frame(self.clock())
+        # Export only what arrived since the last flush, so repeated flushes don't double count
+        chunks, frames = self._exported
+        render_chunk_counter.add(self.chunks_received - chunks)
+        render_frame_counter.add(self.frames_sent - frames)
+        self._exported = (self.chunks_received, self.frames_sent)
+        return self.text
+
+    def stats(self) -> Dict[str, int]:
+        return {"chunks_received": self.chunks_received, "frames_sent": self.frames_sent}
+
+    def _send_frame(self, now: float):
+        self.render(self.text)
+        self.frames_sent += 1
+        self._pending = 0
+        self._last_frame = now
+
+
+class HistoryView:
+    """
+    Windowed view of a chat history that is re-rendered on every Streamlit rerun.
+
+    Messages are grouped into turns: a user message and the replies up to the
+    next one, with each "assistant_tool" entry attached to the assistant
+    message before it. The history is append-only, so grouping is incremental
+    and each message's markdown is formatted once and cached; a rerun only
+    formats what was added since the last one. ``render`` draws the newest
+    ``page_size`` turns and ``load_older`` reveals another page.
+
+    Args:
+        page_size (int, optional): Turns shown at first and per "load older". Defaults to HISTORY_PAGE_SIZE or 20
+        format_tool (Callable[[str], str], optional): Markdown for tool call details. Defaults to the content as is
+    """
+
+    def __init__(
+        self,
+        page_size: Optional[int] = None,
+        format_tool: Optional[Callable[[str], str]] = None,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        if page_size is None:
+            page_size = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
+        self.page_size = max(page_size, 1)
+        self.format_tool = format_tool or (lambda content: content)
+        self.clock = clock
+        self.visible_turns = self.page_size
+        self.formatted_messages = 0
+        self.renders = 0
+        self.last_render_s = 0.0
+        self.total_render_s = 0.0
+        self.last_rendered_turns = 0
+        self._history: Optional[List[Dict[str, Any]]] = None
+        self._processed = 0
+        self._turns: List[List[Dict[str, Any]]] = []
+
+    def load_older(self):
+        """Show one more page of older turns (usable as a button ``on_click``)."""
+        self.visible_turns += self.page_size
+
+    def turns(self, history: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """All turns of ``history``, each a list of blocks with "role", "markdown" and "tool"."""
+        if history is not self._history or len(history) < self._processed:
+            # A new or truncated history (e.g. a session reset) starts over
+            self._history = history
+            self._processed = 0
+            self._turns = []
+            self.visible_turns = self.page_size
+        for message in history[self._processed:]:
+            self._add(message)
+        self._processed = len(history)
+        return self._turns
+
+    def window(self, history: List[Dict[str, Any]]):
+        """The number of hidden older turns and the visible newest turns."""
+        turns = self.turns(history)
+        hidden = max(len(turns) - self.visible_turns, 0)
+        return hidden, turns[hidden:]
+
+    def render(
+        self,
+        history: List[Dict[str, Any]],
+        draw_block: Callable[[Dict[str, Any]], Any],
+        draw_load_older: Callable[[int], Any],
+    ):
+        """Draw the visible turns, preceded by a "load older" control when turns are hidden, and time it."""
+        start = self.clock()
+        hidden, turns = self.window(history)
+        if hidden:
+            draw_load_older(hidden)
+        for turn in turns:
+            for block in turn:
+                draw_block(block)
+        self.last_render_s = self.clock() - start
+        self.total_render_s += self.last_render_s
+        self.renders += 1
+        self.last_rendered_turns = len(turns)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "turns": len(self._turns),
+            "rendered_turns": self.last_rendered_turns,
+            "formatted_messages": self.formatted_messages,
+            "renders": self.renders,
+            "last_render_ms": self.last_render_s * 1000,
+            "avg_render_ms": self.total_render_s / self.renders * 1000 if self.renders else 0.0,
+        }
+
+    def _add(self, message: Dict[str, Any]):
+        role = message["role"]
+        if role == "assistant_tool":
+            # Tool details belong to the assistant message right before them
+            last = self._turns[-1][-1] if self._turns else None
+            if last is not None and last["role"] == "assistant" and last["tool"] is None:
+                last["tool"] = self.format_tool(message["content"])
+                self.formatted_messages += 1
+            return
+        if role not in ("user", "assistant"):
+            return
+        block = {"role": role, "markdown": str(message["content"]), "tool": None}
+        self.formatted_messages += 1
+        if role == "user" or not self._turns:
+            self._turns.append([block])
+        else:
+            self._turns[-1].append(block)
+
+
+def _has_text(message: Any) -> bool:
+    content = getattr(message, "content", None)
+    if isinstance(content, str):
+        return bool(content)
+    return isinstance(content, list) and any(
+        isinstance(part, dict) and part.get("type") == "text" and part.get("text") for part in content
+    )
+
+
+class StreamMetrics:
+    """
+    Time-to-first-token, per-node wall time, tokens and tool calls of one stream.
+
+    Nodes are labelled by their namespace path without task ids, e.g.
+    "supervisor.agent" or "news_agent.tools", and attributed to the agent at
+    the top of that path. Each chunk is charged the time since the previous
+    chunk, so a node's wall time includes waiting for its first token.
+    Token counts come from ``usage_metadata`` when the model reports it and
+    otherwise count streamed text chunks as output tokens. Models that do not
+    stream (e.g. the stock analysis fan-out branches) arrive as whole
+    messages once their node finishes; their reported usage is counted too.
+    """
+
+    def __init__(self, graph_name: str = "graph", clock: Callable[[], float] = time.perf_counter):
+        self.graph_name = graph_name
+        self.clock = clock
+        self.start = clock()
+        self.ttft: Optional[float] = None
+        self.duration: Optional[float] = None
+        self.tool_calls = 0
+        self.handoffs = 0
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self._last = self.start
+
+    def record(self, metadata: Dict[str, Any], message: Any):
+        now = self.clock()
+        label, agent = self._label(metadata)
+        node = self.nodes.setdefault(label, {
+            "agent": agent, "wall_s": 0.0, "chunks": 0,
+            "input_tokens": 0, "output_tokens": 0, "usage_reported": False, "tool_calls": 0,
+        })
+        node["wall_s"] += now - self._last
+        self._last = now
+
+        if isinstance(message, AIMessage):
+            if isinstance(message, AIMessageChunk) and _has_text(message):
+                node["chunks"] += 1
+                if self.ttft is None:
+                    self.ttft = now - self.start
+            if message.usage_metadata:
+                node["usage_reported"] = True
+                node["input_tokens"] += message.usage_metadata.get("input_tokens", 0)
+                node["output_tokens"] += message.usage_metadata.get("output_tokens", 0)
+        elif isinstance(message, ToolMessage):
+            if (message.name or "").startswith("transfer_"):
+                self.handoffs += 1
+            else:
+                self.tool_calls += 1
+                node["tool_calls"] += 1
+
+    def total_tokens(self) -> int:
+        """Input plus output tokens so far, counted like ``summary`` does."""
+        return sum(
+            node["input_tokens"] + (node["output_tokens"] if node["usage_reported"] else node["chunks"])
+            for node in self.nodes.values()
+        )
+
+    def finish(self) -> Dict[str, Any]:
+        """Stop the clock, export the counts to OpenTelemetry and return the summary."""
+        if self.duration is None:
+            self.duration = self.clock() - self.start
+            self._export()
+        return self.summary()
+
+    def summary(self) -> Dict[str, Any]:
+        nodes = {
+            label: {
+                "agent": node["agent"],
+                "wall_s": node["wall_s"],
+                "input_tokens": node["input_tokens"],
+                "output_tokens": node["output_tokens"] if node["usage_reported"] else node["chunks"],
+                "tool_calls": node["tool_calls"],
+            }
+            for label, node in self.nodes.items()
+        }
+        return {
+            "ttft_s": self.ttft,
+            "duration_s": self.duration if self.duration is not None else self.clock() - self.start,
+            "tool_calls": self.tool_calls,
+            "handoffs": self.handoffs,
+            "agents": sorted({node["agent"] for node in nodes.values()}),
+            "input_tokens": sum(node["input_tokens"] for node in nodes.values()),
+            "output_tokens": sum(node["output_tokens"] for node in nodes.values()),
+            "nodes": nodes,
+        }
+
+    def _label(self, metadata: Dict[str, Any]):
+        namespace = metadata.get("langgraph_checkpoint_ns") or ""
+        path = [segment.split(":")[0] for segment in namespace.split("|") if segment]
+        if not path:
+            path = [metadata.get("langgraph_node", "unknown")]
+        return ".".join(path), path[0] if len(path) > 1 else self.graph_name
+
+    def _export(self):
+        summary = self.summary()
+        span = trace.get_current_span()
+        span.set_attribute("graph.duration_s", summary["duration_s"])
+        span.set_attribute("graph.tool_calls", summary["tool_calls"])
+        span.set_attribute("graph.handoffs", summary["handoffs"])
+        span.set_attribute("graph.input_tokens", summary["input_tokens"])
+        span.set_attribute("graph.output_tokens", summary["output_tokens"])
+        span.set_attribute("graph.agents", summary["agents"])
+        if summary["ttft_s"] is not None:
+            span.set_attribute("graph.ttft_s", summary["ttft_s"])
+            ttft_histogram.record(summary["ttft_s"], {"graph": self.graph_name})
+        for label, node in summary["nodes"].items():
+            attributes = {"graph": self.graph_name, "node": label, "agent": node["agent"]}
+            span.set_attribute(f"graph.node.{label}.wall_s", node["wall_s"])
+            span.set_attribute(f"graph.node.{label}.output_tokens", node["output_tokens"])
+            node_duration_histogram.record(node["wall_s"], attributes)
+            token_counter.add(node["input_tokens"], {**attributes, "direction": "input"})
+            token_counter.add(node["output_tokens"], {**attributes, "direction": "output"})
+            if node["tool_calls"]:
+                tool_call_counter.add(node["tool_calls"], attributes)
+
+
+class BudgetExceeded(Exception):
+    """A query went over its QueryBudget; the graph run was cancelled.
+
+    ``metrics`` holds the StreamMetrics summary up to the cancellation.
+    """
+
+    def __init__(self, budget: str, limit: float, used: float, metrics: Dict[str, Any]):
+        self.budget = budget
+        self.limit = limit
+        self.used = used
+        self.metrics = metrics
+        super().__init__(f"Query exceeded its {budget} budget ({used:g} of {limit:g})")
+
+
+class QueryBudget:
+    """
+    Token and wall-clock limits for one graph run.
+
+    ``astream_graph`` checks the token budget after every streamed chunk and
+    runs the graph under the wall-clock deadline; going over either cancels
+    the run and raises BudgetExceeded. Tokens are input plus output tokens
+    across all nodes, from the models' usage metadata. A limit of None or 0
+    is no limit.
+
+    Args:
+        max_tokens (int, optional): Defaults to QUERY_MAX_TOKENS or 100000
+        max_seconds (float, optional): Defaults to QUERY_MAX_SECONDS or no limit
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, max_seconds: Optional[float] = None):
+        if max_tokens is None:
+            max_tokens = int(os.getenv("QUERY_MAX_TOKENS", "100000"))
+        if max_seconds is None:
+            max_seconds = float(os.getenv("QUERY_MAX_SECONDS", "0"))
+        self.max_tokens = max_tokens or None
+        self.max_seconds = max_seconds or None
+
+    def check(self, metrics: StreamMetrics):
+        if self.max_tokens is not None:
+            used = metrics.total_tokens()
+            if used > self.max_tokens:
+                raise self.exceeded("token", self.max_tokens, used, metrics)
+
+    def exceeded(self, budget: str, limit: float, used: float, metrics: StreamMetrics) -> BudgetExceeded:
+        budget_exceeded_counter.add(1, {"graph": metrics.graph_name, "budget": budget})
+        trace.get_current_span().set_attribute("graph.budget_exceeded", budget)
+        return BudgetExceeded(budget, limit, used, metrics.summary())
+
+
 async def astream_graph(
-    graph: supervisor_agent,
+    graph: CompiledStateGraph,
     inputs: dict,
     config: Optional[RunnableConfig] = None,
     node_names: List[str] = [],
     callback: Optional[Callable] = None,
     stream_mode: str = "messages",
     include_subgraphs: bool = False,
+    metrics: Optional[StreamMetrics] = None,
+    budget: Optional[QueryBudget] = None,
 ) -> Dict[str, Any]:
     """
     LangGraph.
@@ -31,9 +402,16 @@ async def astream_graph(
             {"node": str, "content": Any}
         stream_mode (str, optional):("messages" "updates"). "messages"
         include_subgraphs (bool, optional):False
+        metrics (Optional[StreamMetrics], optional): Filled in while streaming
+            ("messages" mode), so callers keep partial numbers after a timeout
+        budget (Optional[QueryBudget], optional): Token and wall-clock limits
+            ("messages" mode); BudgetExceeded is raised once one is crossed
 
     Returns:
-        Dict[str, Any]:
+        Dict[str, Any]: The last chunk, plus the metrics summary under "metrics"
+
+    Raises:
+        BudgetExceeded: The run was cancelled by ``budget``
     """
     config = config or {}
     final_result = {}
@@ -44,41 +422,74 @@ async def astream_graph(
     prev_node = ""
 
     if stream_mode == "messages":
-        for chunk_msg, metadata in graph.stream(
-            inputs, config, stream_mode=stream_mode
-        ):
-            curr_node = metadata["langgraph_node"]
-            final_result = {
-                "node": curr_node,
-                "content": chunk_msg,
-                "metadata": metadata,
-            }
+        # Use the async stream so LLM tokens and tool calls never block the
+        # event loop; this is what lets asyncio.wait_for() enforce timeouts.
+        if metrics is None:
+            metrics = StreamMetrics(getattr(graph, "name", None) or "graph")
+        span = tracer.start_span("astream_graph", attributes={"graph.name": metrics.graph_name})
+        token = context.attach(trace.set_span_in_context(span))
+        stream = graph.astream(inputs, config, stream_mode=stream_mode)
+        # Set when wait_for cancels consume() at the deadline, not when the graph raises TimeoutError itself
+        cancelled = False
+
+        async def consume():
+            nonlocal final_result, prev_node, cancelled
+            try:
+                async for chunk_msg, metadata in stream:
+                    metrics.record(metadata, chunk_msg)
+                    if budget is not None:
+                        budget.check(metrics)
+                    curr_node = metadata["langgraph_node"]
+                    final_result = {
+                        "node": curr_node,
+                        "content": chunk_msg,
+                        "metadata": metadata,
+                    }
 
-            if not node_names or curr_node in node_names:
+                    if not node_names or curr_node in node_names:
 
-                if callback:
-                    result = callback({"node": curr_node, "content": chunk_msg})
-                    if hasattr(result, "__await__"):
-                        await result
-                else:
-                    if curr_node != prev_node:
-                        print("\n" + "=" * 50)
-                        print(f"🔄 Node: \033[1;36m{curr_node}\033[0m 🔄")
-                        print("- " * 25)
-
-                    if hasattr(chunk_msg, "content"):
-                        # 리스트 형태의 content (Anthropic/Claude 스타일)
-                        if isinstance(chunk_msg.content, list):
-                            for item in chunk_msg.content:
-                                if isinstance(item, dict) and "text" in item:
-                                    print(item["text"], end="", flush=True)
-                        # content
-                        elif isinstance(chunk_msg.content, str):
-                            print(chunk_msg.content, end="", flush=True)
-                    else:
-                        print(chunk_msg, end="", flush=True)
-
-                prev_node = curr_node
+                        if callback:
+                            result = callback({"node": curr_node, "content": chunk_msg})
+                            if hasattr(result, "__await__"):
+                                await result
+                        else:
+                            if curr_node != prev_node:
+                                print("\n" + "=" * 50)
+                                print(f"🔄 Node: \033[1;36m{curr_node}\033[0m 🔄")
+                                print("- " * 25)
+
+                            if hasattr(chunk_msg, "content"):
+                                # 리스트 형태의 content (Anthropic/Claude 스타일)
+                                if isinstance(chunk_msg.content, list):
+                                    for item in chunk_msg.content:
+                                        if isinstance(item, dict) and "text" in item:
+                                            print(item["text"], end="", flush=True)
+                                # content
+                                elif isinstance(chunk_msg.content, str):
+                                    print(chunk_msg.content, end="", flush=True)
+                            else:
+                                print(chunk_msg, end="", flush=True)
+
+                        prev_node = curr_node
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+
+        try:
+            # The wall-clock budget cancels the run even while no chunks arrive (e.g. a slow tool)
+            await asyncio.wait_for(consume(), budget.max_seconds if budget is not None else None)
+        except asyncio.TimeoutError:
+            if not cancelled:
+                raise
+            raise budget.exceeded("wall-clock", budget.max_seconds, metrics.clock() - metrics.start, metrics) from None
+        finally:
+            # Close the stream explicitly so a cancelled caller (e.g. a timeout)
+            # tears down the in-flight graph run instead of leaving it behind.
+            await stream.aclose()
+            metrics.finish()
+            context.detach(token)
+            span.end()
+        final_result["metrics"] = metrics.summary()
 
     elif stream_mode == "updates":
 
@@ -296,3 +707,40 @@ async def ainvoke_graph(
             final_result = {"content": node_chunks}
 
     return final_result
+
+
+def _thread_config(thread_id: str) -> RunnableConfig:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+async def thread_has_history(graph: CompiledStateGraph, thread_id: str) -> bool:
+    """Whether ``thread_id`` already has turns in ``graph``'s conversation memory (False without a checkpointer)."""
+    if getattr(graph, "checkpointer", None) is None:
+        return False
+    state = await graph.aget_state(_thread_config(thread_id))
+    return bool(state.values.get("messages"))
+
+
+async def append_turn(
+    graph: CompiledStateGraph,
+    thread_id: str,
+    question: str,
+    answer: str,
+    name: Optional[str] = None,
+    as_node: str = "supervisor",
+) -> bool:
+    """
+    Record a turn answered outside ``graph`` in its conversation memory.
+
+    Cache hits and directly routed queries never run the supervisor, so
+    without this the next supervisor turn would not see them. Returns False
+    when the graph has no checkpointer.
+    """
+    if getattr(graph, "checkpointer", None) is None:
+        return False
+    await graph.aupdate_state(
+        _thread_config(thread_id),
+        {"messages": [HumanMessage(content=question), AIMessage(content=answer, name=name)]},
+        as_node=as_node,
+    )
+    return True